@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chat Record Modules for Continuous Learning
+
+加载 chat-record skill 目录中的共享模块（prompt_budget、claude_runner、hook_metrics 等），
+未部署 chat-record 时返回 None，由调用方回退到简单实现
+"""
+
+import importlib
+import sys
+from contextlib import nullcontext
+from pathlib import Path
+
+
+def chat_record_dirs():
+    """chat-record skill 目录的候选位置"""
+    script_path = Path(__file__).resolve()
+    return [
+        # 部署位置: .claude/skills/chat-record（与 .claude/skills/continuous-learning 同级）
+        script_path.parents[2] / 'chat-record',
+        # 从项目根目录运行: .claude/skills/chat-record
+        Path.cwd().absolute() / '.claude' / 'skills' / 'chat-record',
+        # 源码位置: chat-record/skills/chat-record
+        script_path.parents[5] / 'chat-record' / 'skills' / 'chat-record',
+    ]
+
+
+def load_chat_record_module(name):
+    """加载 chat-record skill 目录中的共享模块，不可用时返回 None"""
+    for skill_dir in chat_record_dirs():
+        if skill_dir.exists() and str(skill_dir) not in sys.path:
+            sys.path.insert(0, str(skill_dir))
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+class _NullMetrics:
+    """hook_metrics 模块不可用时的空实现"""
+
+    enabled = False
+
+    def span(self, name):
+        return nullcontext()
+
+    def add_bytes(self, direction, count):
+        pass
+
+    def count_error(self, count=1):
+        pass
+
+    def set_event(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+
+def create_metrics(hook, project_root):
+    """创建耗时与 I/O 统计（通过 CCSCAFFOLD_HOOK_METRICS 开启）"""
+    hook_metrics = load_chat_record_module('hook_metrics')
+    if hook_metrics is None:
+        return _NullMetrics()
+    return hook_metrics.HookMetrics(hook, project_root)
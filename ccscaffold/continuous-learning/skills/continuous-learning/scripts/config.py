@@ -7,7 +7,7 @@ Configuration Management for Continuous Learning
 """
 
 import json
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -20,7 +20,40 @@ class Config:
     conversation_file: str = ".claude/conversations/conversation.txt"
     skills_output_dir: str = ".claude/skills/learn"
     state_file: str = ".claude/skills/continuous-learning/state.json"
+    # 状态存储：json 或 sqlite（使用 state_file 同名的 .db 文件），更新按间隔或退出时批量写入
+    state_backend: str = "json"
+    state_flush_interval: float = 5.0
     keywords: Dict[str, List[str]] = None
+    # 语义聚类（MinHash/LSH）：在整个对话历史中查找反复出现的问题
+    clustering: bool = False
+    clustering_threshold: float = 0.25
+    clustering_ngram_size: int = 2
+    # 跨会话复现记录（默认关闭）：问题在多个会话中累计出现达到 retry_threshold 次即生成技能；
+    # 单个会话内至少出现 session_min_occurrences 次才计入，避免零散的一次性消息被记为问题
+    recurrence_tracking: bool = False
+    recurrence_file: str = ".claude/skills/continuous-learning/recurrence.json"
+    session_min_occurrences: int = 2
+    # 批量生成：多个问题打包进一次模型调用
+    batch_generation: bool = True
+    # 单次提示词的 token 预算（估算值），对话片段按与问题的相关度在预算内选取
+    prompt_budget: int = 8000
+    # 重试与熔断：调用出错时退避重试，连续失败后暂停调用，失败的问题下次运行时重试
+    retry_max_attempts: int = 2
+    retry_base_delay: float = 2.0
+    circuit_failure_threshold: int = 3
+    circuit_cooldown: int = 1800
+    retry_file: str = ".claude/skills/continuous-learning/retry.json"
+    # 单次运行中调用 claude -p（含重试等待）的总秒数，须低于 Stop hook 给持续学习的 70 秒时限
+    generation_time_budget: int = 50
+    # 技能去重：保存时与已有技能比较 SimHash 指纹，汉明距离不超过阈值的合并到已有技能
+    skill_dedupe: bool = True
+    skill_dedupe_distance: int = 12
+    # 技能淘汰：超过数量或字节数上限时按 lru/lfu 把冷门技能归档到压缩包，0 表示不限制
+    skill_max_count: int = 100
+    skill_max_bytes: int = 0
+    skill_max_idle_days: int = 0
+    skill_eviction_policy: str = "lru"
+    skill_archive_file: str = ".claude/skills/continuous-learning/archive.zip"
 
     def __post_init__(self):
         if self.keywords is None:
@@ -35,7 +68,9 @@ class Config:
         if config_file.exists():
             with open(config_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                return cls(**data)
+                # 忽略未知的键（如 config.example.json 中的 "_" 开头说明项）
+                known = {f.name for f in fields(cls)}
+                return cls(**{key: value for key, value in data.items() if key in known})
         return cls()
 
     def save(self, config_file: Path):
@@ -45,12 +80,16 @@ class Config:
             json.dump(self.__dict__, f, ensure_ascii=False, indent=2)
 
     @classmethod
-    def from_args(cls, args: Optional[dict] = None) -> 'Config':
-        """从命令行参数创建配置"""
+    def from_args(cls, args: Optional[dict] = None, base: Optional['Config'] = None) -> 'Config':
+        """从命令行参数创建配置
+
+        Args:
+            args: 命令行参数
+            base: 基础配置（如从配置文件加载的配置），命令行参数覆盖其中的值
+        """
+        config = base if base is not None else cls()
         if args is None:
-            return cls()
-
-        config = cls()
+            return config
 
         if 'max_conversations' in args and args['max_conversations'] is not None:
             config.max_conversations = int(args['max_conversations'])
@@ -58,6 +97,9 @@ class Config:
         if 'conversation_file' in args and args['conversation_file'] is not None:
             config.conversation_file = args['conversation_file']
 
+        if args.get('clustering'):
+            config.clustering = True
+
         return config
 
 
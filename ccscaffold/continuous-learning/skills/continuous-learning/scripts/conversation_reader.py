@@ -8,7 +8,7 @@ Conversation Reader for Continuous Learning
 
 from pathlib import Path
 from typing import List, Optional
-from models import ConversationEntry
+from models import TIMESTAMP_LENGTH, ConversationBuffer, ConversationEntry
 
 
 class ConversationReader:
@@ -18,11 +18,12 @@ class ConversationReader:
         self.file_path = file_path
         self.max_lines = max_lines
 
-    def read_latest(self, from_line: int = 0) -> List[ConversationEntry]:
+    def read_latest(self, from_line: int = 0, analyzed_at: str = '') -> List[ConversationEntry]:
         """读取最新的对话条目
 
         Args:
             from_line: 从第几行开始读取（用于增量读取）
+            analyzed_at: 上次分析的时间（ISO 格式），对话文件在此之后被清空时忽略 from_line
 
         Returns:
             对话条目列表
@@ -31,25 +32,36 @@ class ConversationReader:
             print(f"错误: 对话文件不存在: {self.file_path}")
             return []
 
-        with open(self.file_path, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
+        # 整个文件读入一次作为共享缓冲区，条目只记录偏移，不复制消息内容
+        buffer = ConversationBuffer.open(self.file_path)
+        size = len(buffer)
 
-        total_lines = len(all_lines)
+        # 会话总结在每次 Stop 后清空对话文件：第一条消息晚于上次分析的时间，说明文件是清空后重新写入的
+        if from_line > 0 and analyzed_at:
+            first = ConversationEntry.parse(buffer, 0, buffer.line(0, buffer.line_end(0)), 1)
+            if first is not None and first.timestamp > analyzed_at[:TIMESTAMP_LENGTH].replace('T', ' '):
+                print("对话文件在上次分析后已被清空，从头读取")
+                from_line = 0
 
-        # 从上次处理的行数开始读取
         if from_line > 0:
-            print(f"从第 {from_line} 行开始读取 (共 {total_lines} 行)")
-            lines_to_read = all_lines[from_line:]
+            print(f"从第 {from_line} 行开始读取")
         else:
-            print(f"读取完整对话文件 (共 {total_lines} 行)")
-            lines_to_read = all_lines
+            print("读取完整对话文件")
 
         # 限制读取的条数，支持多行消息
         entries = []
         current_entry = None
-        for i, line in enumerate(lines_to_read):
-            # 尝试解析为新消息
-            entry = ConversationEntry.from_line(line, from_line + i + 1)
+        offset = 0
+        line_number = 0
+        while offset < size:
+            line_start, offset = offset, buffer.line_end(offset)
+            line_number += 1
+            # 跳过上次已处理的行
+            if line_number <= from_line:
+                continue
+            line = buffer.line(line_start, offset)
+            # 尝试解析为新消息（非时间戳开头的行在前缀检查阶段即被排除）
+            entry = ConversationEntry.parse(buffer, line_start, line, line_number)
             if entry:
                 # 如果有当前消息，先保存
                 if current_entry:
@@ -58,12 +70,9 @@ class ConversationReader:
                     if len(entries) >= self.max_lines:
                         break
                 current_entry = entry
-            elif current_entry and line.strip():
-                # 如果不是新消息但有内容，且当前有消息，则作为续行
-                # 检查是否是续行（以空格开头）
-                if line.startswith(' ') or line.startswith('\t'):
-                    # 追加到当前消息内容
-                    current_entry.content += ' ' + line.strip()
+            elif current_entry and line[:1] in (b' ', b'\t') and line.strip():
+                # 以空白开头的非空行作为当前消息的续行
+                current_entry.extend_to(offset)
 
         # 保存最后一条消息
         if current_entry and len(entries) < self.max_lines:
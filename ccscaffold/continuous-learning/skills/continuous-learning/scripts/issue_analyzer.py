@@ -9,17 +9,21 @@ Issue Analyzer for Continuous Learning
 import re
 from typing import List, Set, Dict
 from models import ConversationEntry, IssuePattern
+from issue_clustering import IssueClusterer
 
 
 class IssueAnalyzer:
     """问题分析器"""
 
-    def __init__(self, retry_threshold: int = 3, keywords: Dict[str, List[str]] = None):
+    def __init__(self, retry_threshold: int = 3, keywords: Dict[str, List[str]] = None,
+                 clusterer: IssueClusterer = None):
         self.retry_threshold = retry_threshold
         self.keywords = keywords or {
             "retry": ["修复", "修正", "解决", "还是不行", "还是有问题", "继续", "再试", "失败", "错误"],
             "issues": ["问题", "bug", "错误", "失败", "不正确"]
         }
+        # 提供聚类器时在整个历史中按语义相似度聚类，否则只比较前 10 条消息
+        self.clusterer = clusterer
 
     def analyze(self, entries: List[ConversationEntry]) -> List[IssuePattern]:
         """分析对话条目，检测反复问题
@@ -40,6 +44,9 @@ class IssueAnalyzer:
             print("没有找到用户消息")
             return []
 
+        if self.clusterer is not None:
+            return self._analyze_clusters(user_messages)
+
         # 检测反复问题的模式
         issue_patterns = []
 
@@ -47,9 +54,14 @@ class IssueAnalyzer:
         retry_keywords = set(self.keywords.get("retry", []))
         issue_keywords = set(self.keywords.get("issues", []))
 
+        # 消息内容按需解码，只缓存向前比较窗口内的内容
+        recent_contents = {}
+
         # 分析每个用户消息，查找反复提及的问题
         for i, msg in enumerate(user_messages):
             content = msg.content
+            recent_contents[i] = content
+            recent_contents.pop(i - 11, None)
 
             # 检查是否包含重试关键词
             has_retry = any(keyword in content for keyword in retry_keywords)
@@ -64,9 +76,9 @@ class IssueAnalyzer:
                 first_line = msg.line_number
                 last_line = msg.line_number
 
-                for j in range(i - 1, max(0, i - 10), -1):
+                for j in range(i - 1, max(-1, i - 11), -1):
                     prev_msg = user_messages[j]
-                    if self._is_similar_issue(content, prev_msg.content):
+                    if self._is_similar_issue(content, recent_contents[j]):
                         related_count += 1
                         first_line = min(first_line, prev_msg.line_number)
                     else:
@@ -74,13 +86,8 @@ class IssueAnalyzer:
 
                 # 如果达到阈值，创建问题模式
                 if related_count >= self.retry_threshold:
-                    # 收集所有相关的用户消息
-                    related_messages = []
-                    for j in range(i, max(0, i - related_count), -1):
-                        related_messages.insert(0, {
-                            'line': user_messages[j].line_number,
-                            'content': user_messages[j].content
-                        })
+                    # 收集所有相关的用户消息（引用条目，不复制内容）
+                    related_messages = user_messages[i - related_count + 1:i + 1]
 
                     # 检查是否已存在相似的模式
                     is_duplicate = False
@@ -91,7 +98,7 @@ class IssueAnalyzer:
                             pattern.last_line = max(pattern.last_line, last_line)
                             # 添加新的消息（如果还没有）
                             for new_msg in related_messages:
-                                if not any(m['line'] == new_msg['line'] for m in pattern.user_messages):
+                                if not any(m.line_number == new_msg.line_number for m in pattern.user_messages):
                                     pattern.user_messages.append(new_msg)
                             is_duplicate = True
                             break
@@ -109,6 +116,54 @@ class IssueAnalyzer:
 
         return issue_patterns
 
+    def _analyze_clusters(self, user_messages: List[ConversationEntry]) -> List[IssuePattern]:
+        """聚类方式：对全部问题相关消息聚类，聚类大小达到阈值即为反复问题"""
+        retry_keywords = set(self.keywords.get("retry", []))
+        issue_keywords = set(self.keywords.get("issues", []))
+        all_keywords = retry_keywords | issue_keywords
+
+        # 只聚类包含问题或重试关键词的消息，去掉关键词后按问题描述本身比较
+        candidates = []
+        texts = []
+        has_retry_issue = []
+        for msg in user_messages:
+            content = msg.content
+            has_retry = any(keyword in content for keyword in retry_keywords)
+            has_issue = any(keyword in content for keyword in issue_keywords)
+            if not (has_retry or has_issue):
+                continue
+            candidates.append(msg)
+            texts.append(self._strip_keywords(content, all_keywords))
+            has_retry_issue.append(has_retry and has_issue)
+
+        issue_patterns = []
+        for cluster in self.clusterer.cluster(texts):
+            if len(cluster) < self.retry_threshold:
+                continue
+            # 聚类中至少有一条消息明确要求重新修复
+            retry_indexes = [index for index in cluster if has_retry_issue[index]]
+            if not retry_indexes:
+                continue
+
+            messages = [candidates[index] for index in cluster]
+            latest = candidates[retry_indexes[-1]].content
+            issue_patterns.append(IssuePattern(
+                topic=self._extract_topic(latest, retry_keywords),
+                occurrences=len(messages),
+                first_line=messages[0].line_number,
+                last_line=messages[-1].line_number,
+                keywords=self._extract_keywords(latest),
+                user_messages=messages
+            ))
+
+        return issue_patterns
+
+    def _strip_keywords(self, content: str, keywords: Set[str]) -> str:
+        """移除关键词，只保留问题描述"""
+        for keyword in sorted(keywords, key=len, reverse=True):
+            content = content.replace(keyword, ' ')
+        return content
+
     def _extract_topic(self, content: str, retry_keywords: Set[str]) -> str:
         """提取问题主题（移除重试关键词）"""
         topic = content
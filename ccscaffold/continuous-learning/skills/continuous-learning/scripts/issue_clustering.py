@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Issue Clustering for Continuous Learning
+
+基于 MinHash/LSH 的消息聚类 - 在整个对话历史中找出描述同一问题的消息
+- 文本切分为字符 n-gram（默认二元组，接近中文词长），中英文混合文本无需分词
+- MinHash 签名 + LSH 分桶生成候选对，只有候选对才计算相似度，整体接近线性
+- 候选对用 n-gram 集合计算精确的 Jaccard 相似度，避免短消息上 MinHash 估计的误差
+- 纯离线计算，不调用模型
+"""
+
+import re
+import zlib
+from typing import Dict, List, Sequence, Set, Tuple
+
+
+# 默认参数
+DEFAULT_NUM_PERM = 64
+DEFAULT_NGRAM_SIZE = 2
+DEFAULT_THRESHOLD = 0.25
+
+# 梅森素数，作为哈希函数的模数
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# 聚类前忽略的空白和标点
+_NOISE_PATTERN = re.compile(r'[\s\W_]+', re.UNICODE)
+
+
+def char_ngrams(text: str, n: int = DEFAULT_NGRAM_SIZE) -> Set[str]:
+    """把文本切分为字符 n-gram
+
+    先转小写并去掉空白和标点；文本短于 n 时整体作为一个 n-gram。
+    """
+    normalized = _NOISE_PATTERN.sub('', text.lower())
+    if not normalized:
+        return set()
+    if len(normalized) <= n:
+        return {normalized}
+    return {normalized[i:i + n] for i in range(len(normalized) - n + 1)}
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """选择 LSH 的分段数和每段行数
+
+    候选阈值约为 (1/bands)^(1/rows)，取不高于目标阈值中最接近的组合，
+    宁可多产生候选对，由签名相似度再过滤。
+    """
+    best = (num_perm, 1)
+    best_gap = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        candidate_threshold = (1.0 / bands) ** (1.0 / rows)
+        if candidate_threshold > threshold:
+            continue
+        gap = threshold - candidate_threshold
+        if best_gap is None or gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+
+class MinHasher:
+    """MinHash 签名计算"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        self.num_perm = num_perm
+        # 固定种子生成哈希参数，同一份数据每次得到相同的签名
+        state = seed
+        self._params = []
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            a = (state >> 3) % (_MERSENNE_PRIME - 1) + 1
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            b = (state >> 3) % _MERSENNE_PRIME
+            self._params.append((a, b))
+
+    def signature(self, shingles: Set[str]) -> Tuple[int, ...]:
+        """计算 n-gram 集合的签名，空集合返回空签名"""
+        if not shingles:
+            return ()
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._params
+        )
+
+
+def jaccard(set1: Set[str], set2: Set[str]) -> float:
+    """Jaccard 相似度"""
+    if not set1 or not set2:
+        return 0.0
+    return len(set1 & set2) / len(set1 | set2)
+
+
+class _UnionFind:
+    """合并候选对得到聚类"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+class IssueClusterer:
+    """消息聚类器
+
+    Args:
+        threshold: n-gram 的 Jaccard 相似度达到该值的消息视为同一问题
+        ngram_size: 字符 n-gram 长度
+        num_perm: MinHash 签名长度，越长估计越准、计算越慢
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, ngram_size: int = DEFAULT_NGRAM_SIZE,
+                 num_perm: int = DEFAULT_NUM_PERM):
+        self.threshold = threshold
+        self.ngram_size = ngram_size
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+    def cluster(self, texts: Sequence[str]) -> List[List[int]]:
+        """对文本聚类
+
+        Args:
+            texts: 待聚类的文本
+
+        Returns:
+            聚类列表，每个聚类为文本下标（升序），按第一个下标排序；
+            没有相似文本的单条文本也单独成为一个聚类
+        """
+        shingles = [char_ngrams(text, self.ngram_size) for text in texts]
+        signatures = [self.hasher.signature(grams) for grams in shingles]
+        union_find = _UnionFind(len(texts))
+
+        # 每段签名相同的文本落入同一个桶，桶内的文本构成候选对
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        for index, signature in enumerate(signatures):
+            if not signature:
+                continue
+            for band in range(self.bands):
+                key = (band, signature[band * self.rows:(band + 1) * self.rows])
+                buckets.setdefault(key, []).append(index)
+
+        # 只比较同桶的候选对；已在同一聚类中的文本不再重复比较
+        checked = set()
+        for members in buckets.values():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) in checked or union_find.find(a) == union_find.find(b):
+                        continue
+                    checked.add((a, b))
+                    if jaccard(shingles[a], shingles[b]) >= self.threshold:
+                        union_find.union(a, b)
+
+        clusters: Dict[int, List[int]] = {}
+        for index in range(len(texts)):
+            clusters.setdefault(union_find.find(index), []).append(index)
+        return sorted(clusters.values(), key=lambda members: members[0])
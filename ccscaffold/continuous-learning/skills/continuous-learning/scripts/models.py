@@ -6,60 +6,202 @@ Data Models for Continuous Learning
 持续学习功能的数据模型定义
 """
 
+import sys
 from dataclasses import dataclass, field
 from typing import Optional, List, Dict, Set
 from pathlib import Path
 
 
-@dataclass
+# 对话行时间戳 "YYYY-MM-DD HH:MM:SS" 的固定长度
+TIMESTAMP_LENGTH = 19
+
+
+def has_timestamp_prefix(line: bytes) -> bool:
+    """检查行首是否为固定宽度的时间戳（只做字节比较，不使用正则）
+
+    先比较分隔符位置，续行通常在第一次比较时即被排除；
+    切片比较在行过短时返回空串，不会抛出 IndexError。
+    """
+    return (
+        line[4:5] == b'-' and line[7:8] == b'-' and line[10:11] == b' '
+        and line[13:14] == b':' and line[16:17] == b':'
+        and line[:TIMESTAMP_LENGTH].replace(b'-', b'').replace(b':', b'').replace(b' ', b'').isdigit()
+        and len(line) > TIMESTAMP_LENGTH
+    )
+
+
+class ConversationBuffer:
+    """对话日志的共享缓冲区
+
+    文件一次性读入为 bytes 快照，所有对话条目只保存在缓冲区中的偏移和长度，内容按需解码。
+    不使用 mmap：chat-record 会原地截断对话文件（会话结束清空、超过大小上限重置），
+    映射的页面被截断后再访问会触发 SIGBUS 使进程崩溃。
+    """
+
+    __slots__ = ('data', 'view')
+
+    def __init__(self, data):
+        self.data = data
+        self.view = memoryview(data)
+
+    @classmethod
+    def open(cls, file_path: Path) -> 'ConversationBuffer':
+        """读取对话文件"""
+        with open(file_path, 'rb') as f:
+            return cls(f.read())
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def line_end(self, offset: int) -> int:
+        """返回从 offset 开始的一行的结束位置（含换行符）"""
+        end = self.data.find(b'\n', offset)
+        return len(self.view) if end == -1 else end + 1
+
+    def line(self, offset: int, end: int) -> bytes:
+        """复制一行用于解析"""
+        return self.view[offset:end].tobytes()
+
+    def text(self, offset: int, length: int) -> str:
+        """解码指定区间的文本"""
+        return str(self.view[offset:offset + length], 'utf-8', 'replace')
+
+
 class ConversationEntry:
-    """对话条目"""
-    timestamp: str
-    sender: str
-    content: str
-    line_number: int
+    """对话条目
+
+    使用 __slots__ 减少每个条目的内存占用，sender 使用驻留字符串，
+    同一角色的所有条目共享同一个字符串对象。消息内容不复制，
+    只记录在共享缓冲区中的偏移和长度，访问 content 时才解码。
+    """
+
+    __slots__ = ('timestamp', 'sender', 'line_number', 'buffer', 'offset', 'length')
+
+    def __init__(self, timestamp: str, sender: str, line_number: int,
+                 buffer: ConversationBuffer, offset: int, length: int):
+        self.timestamp = timestamp
+        self.sender = sender
+        self.line_number = line_number
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+
+    @property
+    def content(self) -> str:
+        """消息内容，首行与以空白开头的续行以空格拼接"""
+        lines = self.buffer.text(self.offset, self.length).split('\n')
+        parts = [lines[0].strip()]
+        for line in lines[1:]:
+            if line[:1] in (' ', '\t'):
+                stripped = line.strip()
+                if stripped:
+                    parts.append(stripped)
+        return ' '.join(parts)
+
+    def extend_to(self, end: int):
+        """将续行纳入消息范围"""
+        self.length = end - self.offset
+
+    def __repr__(self) -> str:
+        return (f"ConversationEntry(timestamp={self.timestamp!r}, sender={self.sender!r}, "
+                f"content={self.content!r}, line_number={self.line_number!r})")
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.timestamp, self.sender, self.content, self.line_number) == \
+            (other.timestamp, other.sender, other.content, other.line_number)
+
+    @classmethod
+    def parse(cls, buffer: ConversationBuffer, offset: int, line: bytes,
+              line_number: int) -> Optional['ConversationEntry']:
+        """解析缓冲区中 offset 处的一行
+
+        格式: "YYYY-MM-DD HH:MM:SS role> content"。先用字节比较检查时间戳前缀，
+        续行（以空白或其他字符开头）在这一步即被排除，无需进入完整解析。
+        """
+        if not has_timestamp_prefix(line):
+            return None
+
+        # 时间戳后至少一个空白，然后是 "role>"（UTF-8 多字节字符中不会出现 '>'）
+        if not line[TIMESTAMP_LENGTH:TIMESTAMP_LENGTH + 1].isspace():
+            return None
+        marker = line.find(b'>', TIMESTAMP_LENGTH)
+        if marker == -1:
+            return None
+        role = line[TIMESTAMP_LENGTH:marker].lstrip().decode('utf-8', 'replace')
+        if not role or not role.replace('_', 'a').isalnum():
+            return None
+
+        if not line[marker + 1:].strip():
+            return None
+
+        return cls(
+            timestamp=line[:TIMESTAMP_LENGTH].decode('ascii'),
+            sender=sys.intern(role),
+            line_number=line_number,
+            buffer=buffer,
+            offset=offset + marker + 1,
+            length=len(line) - marker - 1
+        )
 
     @classmethod
     def from_line(cls, line: str, line_number: int) -> Optional['ConversationEntry']:
         """从单行文本解析对话条目"""
-        import re
-        pattern = r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s+(\w+)>\s*(.+)$'
-        match = re.match(pattern, line.strip())
-        if match:
-            return cls(
-                timestamp=match.group(1),
-                sender=match.group(2),
-                content=match.group(3),
-                line_number=line_number
-            )
-        return None
+        data = line.encode('utf-8')
+        return cls.parse(ConversationBuffer(data), 0, data, line_number)
 
 
-@dataclass
 class IssuePattern:
-    """问题模式"""
-    topic: str
-    occurrences: int
-    first_line: int
-    last_line: int
-    keywords: Set[str] = field(default_factory=set)
-    user_messages: List[Dict] = field(default_factory=list)
+    """问题模式
+
+    user_messages 直接引用对话条目，不复制消息内容；tools 是修复过程中工具调用的摘要。
+    """
+
+    __slots__ = ('topic', 'occurrences', 'first_line', 'last_line', 'keywords', 'user_messages', 'tools')
+
+    def __init__(self, topic: str, occurrences: int, first_line: int, last_line: int,
+                 keywords: Optional[Set[str]] = None,
+                 user_messages: Optional[List[ConversationEntry]] = None, tools: str = ''):
+        self.topic = topic
+        self.occurrences = occurrences
+        self.first_line = first_line
+        self.last_line = last_line
+        self.keywords = keywords if keywords is not None else set()
+        self.user_messages = user_messages if user_messages is not None else []
+        self.tools = tools
+
+    def __repr__(self) -> str:
+        return (f"IssuePattern(topic={self.topic!r}, occurrences={self.occurrences!r}, "
+                f"first_line={self.first_line!r}, last_line={self.last_line!r})")
 
     def meets_threshold(self, threshold: int = 3) -> bool:
         """检查是否达到反复问题阈值"""
         return self.occurrences >= threshold
 
+    def message_snippets(self) -> List[str]:
+        """解码相关用户消息内容，用于构建提示词"""
+        return [msg.content for msg in self.user_messages]
+
 
-@dataclass
 class LearnedSkill:
     """学习技能"""
-    name: str
-    description: str
-    issue_topic: str
-    retry_count: int
-    generated_at: str
-    content: str
-    file_path: Optional[Path] = None
+
+    __slots__ = ('name', 'description', 'issue_topic', 'retry_count',
+                 'generated_at', 'content', 'file_path')
+
+    def __init__(self, name: str, description: str, issue_topic: str, retry_count: int,
+                 generated_at: str, content: str, file_path: Optional[Path] = None):
+        self.name = name
+        self.description = description
+        self.issue_topic = issue_topic
+        self.retry_count = retry_count
+        self.generated_at = generated_at
+        self.content = content
+        self.file_path = file_path
+
+    def __repr__(self) -> str:
+        return f"LearnedSkill(name={self.name!r}, issue_topic={self.issue_topic!r})"
 
     @classmethod
     def create(cls, pattern: IssuePattern, content: str) -> 'LearnedSkill':
@@ -94,66 +236,8 @@ def sanitize_topic(topic: str) -> str:
 
 @dataclass
 class ConversationState:
-    """单个对话文件的状态"""
+    """单个对话文件的处理状态，由 state_store.StateStore 持久化"""
     last_line: int = 0
     skills_generated: List[Dict] = field(default_factory=list)
     first_analyzed: str = ""
     last_analyzed: str = ""
-
-
-@dataclass
-class State:
-    """全局状态"""
-    conversations: Dict[str, ConversationState] = field(default_factory=dict)
-
-    def load(self, state_file: Path) -> 'State':
-        """从文件加载状态"""
-        if state_file.exists():
-            import json
-            with open(state_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for conv_name, conv_state in data.items():
-                    self.conversations[conv_name] = ConversationState(**conv_state)
-        return self
-
-    def save(self, state_file: Path):
-        """保存状态到文件"""
-        import json
-        from datetime import datetime
-        state_file.parent.mkdir(parents=True, exist_ok=True)
-        data = {
-            name: {
-                'last_line': state.last_line,
-                'skills_generated': state.skills_generated,
-                'first_analyzed': state.first_analyzed,
-                'last_analyzed': state.last_analyzed
-            }
-            for name, state in self.conversations.items()
-        }
-        with open(state_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
-    def get_last_line(self, conversation_file: str) -> int:
-        """获取对话文件上次处理的行数"""
-        if conversation_file in self.conversations:
-            return self.conversations[conversation_file].last_line
-        return 0
-
-    def update_last_line(self, conversation_file: str, line: int, skill_name: str):
-        """更新已处理的行数"""
-        from datetime import datetime
-        if conversation_file not in self.conversations:
-            self.conversations[conversation_file] = ConversationState()
-
-        state = self.conversations[conversation_file]
-        state.last_line = line
-        state.last_analyzed = datetime.now().isoformat()
-
-        if not state.first_analyzed:
-            state.first_analyzed = state.last_analyzed
-
-        state.skills_generated.append({
-            'name': skill_name,
-            'generated_at': datetime.now().isoformat(),
-            'processed_line': line
-        })
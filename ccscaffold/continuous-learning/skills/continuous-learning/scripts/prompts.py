@@ -136,3 +136,80 @@ def build_skill_content(
         retry_threshold=retry_threshold,
         keywords=keywords
     )
+
+
+# 批量生成技能：多个问题打包进一次调用，输出按分隔行拆分为多个技能文件
+SKILL_BEGIN_MARKER = "<<<SKILL {index}>>>"
+SKILL_END_MARKER = "<<<END SKILL {index}>>>"
+
+BATCH_SKILL_PROMPT_TEMPLATE = """# 角色设定
+你是一个具备持续学习能力的 AI 助手，专门分析 Claude Code 对话记录，从反复出现的错误中学习并生成修复技能。
+
+# 任务目标
+下面有 {count} 个相互独立的问题，每个问题都被用户反复要求修复。请为每个问题分别生成一个结构化的技能文件。
+
+{sections}
+# 输出要求
+
+## 1. 多技能输出格式（必须严格遵守）
+每个技能文件用分隔行包裹，编号与问题编号一致，分隔行独占一行，分隔行以外不要输出任何内容：
+
+{begin_example}
+（问题 1 的技能文件内容）
+{end_example}
+
+## 2. 每个技能文件的结构
+- 以 YAML frontmatter 开始，包含 name（fix-简洁英文名，如 fix-weekend-display）、description（自动生成的修复技能 - 问题主题）、version: 1.0.0、tags: [auto-generated, fix-pattern, retry-反复次数]、generated_at: {generated_at}
+- 然后是 Markdown 正文，依次包含：# 标题、## 生成时间、## 问题概述、## 触发点识别、## 问题分析、## 修复规律总结、## 修复流程建议、## 最佳实践、## 避免陷阱、## 对话记录参考
+- 以 *此技能由 Continuous Learning 自动生成* 结尾
+- 不要使用代码块包裹技能文件内容
+
+## 3. 内容要求
+- 每个技能只基于对应问题的对话片段，不编造信息，不混用其他问题的内容
+- 提供具体可操作的步骤，提炼可复用的规律，使用清晰的标题和列表
+
+请开始生成 {count} 个技能文件：
+"""
+
+BATCH_PATTERN_SECTION_TEMPLATE = """# 问题 {index}
+
+## 问题主题
+{topic}
+
+## 反复次数
+{occurrences} 次
+
+## 关键词
+{keywords}
+
+## 修复过程中的工具调用
+{tools}
+
+## 对话片段（按时间顺序）
+{conversation}
+
+"""
+
+
+def build_batch_pattern_section(index: int, topic: str, occurrences: int, keywords: str,
+                                tools: str, conversation: str) -> str:
+    """构建批量提示词中单个问题的部分"""
+    return BATCH_PATTERN_SECTION_TEMPLATE.format(
+        index=index,
+        topic=topic,
+        occurrences=occurrences,
+        keywords=keywords,
+        tools=tools or '无记录',
+        conversation=conversation
+    )
+
+
+def build_batch_skill_prompt(sections: list, generated_at: str) -> str:
+    """构建批量生成技能的提示词"""
+    return BATCH_SKILL_PROMPT_TEMPLATE.format(
+        count=len(sections),
+        sections=''.join(sections),
+        begin_example=SKILL_BEGIN_MARKER.format(index=1),
+        end_example=SKILL_END_MARKER.format(index=1),
+        generated_at=generated_at
+    )
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recurrence Store for Continuous Learning
+
+跨会话问题复现记录 - 按主题指纹累计每个问题在各个会话中出现的次数
+- 新问题按 n-gram 相似度匹配已有记录，匹配不到时以主题指纹新建记录
+- 同一会话每次分析新内容时累加出现次数；按本次分析的起始位置识别重复分析，不会重复累计
+- 保存最近的几条相关消息，生成技能时作为跨会话的上下文
+- 累计次数达到阈值（且自上次生成技能后又新增足够次数）时触发技能生成
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from issue_clustering import DEFAULT_NGRAM_SIZE, DEFAULT_THRESHOLD, char_ngrams, jaccard
+from models import IssuePattern
+
+
+# 每条记录保留的会话数，更早的会话只保留累计次数
+MAX_SESSIONS = 50
+# 每条记录保留的相关消息数和单条消息长度
+MAX_SAMPLES = 6
+MAX_SAMPLE_LENGTH = 300
+# 最多保留的记录数，超过时淘汰最久未出现的记录
+MAX_RECORDS = 500
+
+
+def topic_fingerprint(grams: Iterable[str]) -> str:
+    """由主题的 n-gram 集合计算指纹"""
+    digest = hashlib.sha1('\n'.join(sorted(grams)).encode('utf-8')).hexdigest()
+    return digest[:16]
+
+
+class RecurrenceRecord:
+    """单个问题的复现记录"""
+
+    __slots__ = ('fingerprint', 'topic', 'sessions', 'runs', 'archived_count', 'first_seen',
+                 'last_seen', 'last_skill', 'last_skill_count', 'samples', 'grams')
+
+    def __init__(self, fingerprint: str, topic: str, sessions: Optional[Dict[str, int]] = None,
+                 archived_count: int = 0, first_seen: str = '', last_seen: str = '',
+                 last_skill: str = '', last_skill_count: int = 0,
+                 samples: Optional[List[str]] = None, runs: Optional[Dict[str, List]] = None):
+        self.fingerprint = fingerprint
+        self.topic = topic
+        self.sessions = sessions if sessions is not None else {}
+        # 每个会话最近一次计入的分析: [起始位置, 该次分析的出现次数]
+        self.runs = runs if runs is not None else {}
+        self.archived_count = archived_count
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.last_skill = last_skill
+        self.last_skill_count = last_skill_count
+        self.samples = samples if samples is not None else []
+        self.grams = set()
+
+    def __repr__(self) -> str:
+        return (f"RecurrenceRecord(topic={self.topic!r}, count={self.count!r}, "
+                f"sessions={len(self.sessions)!r})")
+
+    @property
+    def count(self) -> int:
+        """累计出现次数"""
+        return self.archived_count + sum(self.sessions.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            'topic': self.topic,
+            'sessions': self.sessions,
+            'runs': self.runs,
+            'archived_count': self.archived_count,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'last_skill': self.last_skill,
+            'last_skill_count': self.last_skill_count,
+            'samples': self.samples
+        }
+
+
+class RecurrenceStore:
+    """跨会话问题复现记录
+
+    Args:
+        store_file: 记录文件路径
+        match_threshold: 主题 n-gram 的 Jaccard 相似度达到该值视为同一问题
+        ngram_size: 字符 n-gram 长度
+        ignore_words: 比较主题前移除的词（如重试、问题关键词）
+    """
+
+    def __init__(self, store_file: Path, match_threshold: float = DEFAULT_THRESHOLD,
+                 ngram_size: int = DEFAULT_NGRAM_SIZE, ignore_words: Iterable[str] = ()):
+        self.store_file = store_file
+        self.match_threshold = match_threshold
+        self.ngram_size = ngram_size
+        self.ignore_words = sorted(set(ignore_words), key=len, reverse=True)
+        self.records = self._load()
+
+    def _grams(self, topic: str):
+        for word in self.ignore_words:
+            topic = topic.replace(word, ' ')
+        return char_ngrams(topic, self.ngram_size)
+
+    def _load(self) -> Dict[str, RecurrenceRecord]:
+        """加载记录文件"""
+        if not self.store_file.exists():
+            return {}
+        try:
+            with open(self.store_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"警告: 无法加载复现记录: {e}")
+            return {}
+
+        records = {}
+        for fingerprint, item in data.items():
+            record = RecurrenceRecord(fingerprint, **item)
+            record.grams = self._grams(record.topic)
+            records[fingerprint] = record
+        return records
+
+    def save(self):
+        """保存记录（先写临时文件再替换）"""
+        try:
+            self.store_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.store_file.with_name(self.store_file.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({fp: record.to_dict() for fp, record in self.records.items()},
+                          f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.store_file)
+        except Exception as e:
+            print(f"警告: 无法保存复现记录: {e}")
+
+    def match(self, topic: str) -> Optional[RecurrenceRecord]:
+        """查找与主题最相似的记录"""
+        grams = self._grams(topic)
+        best, best_score = None, 0.0
+        for record in self.records.values():
+            score = jaccard(grams, record.grams)
+            if score > best_score:
+                best, best_score = record, score
+        if best is not None and best_score >= self.match_threshold:
+            return best
+        return None
+
+    def record(self, pattern: IssuePattern, session_id: str, run_key: str = '') -> RecurrenceRecord:
+        """记录一次问题出现
+
+        同一会话的每次分析只包含上次之后的新内容，出现次数累加到该会话；
+        起始位置与该会话上次计入的分析相同时视为重复分析，只补上多出的次数。
+
+        Args:
+            pattern: 本次分析检测到的问题模式
+            session_id: 会话标识
+            run_key: 本次分析的起始位置
+
+        Returns:
+            更新后的记录
+        """
+        now = datetime.now().isoformat()
+        record = self.match(pattern.topic)
+        if record is None:
+            grams = self._grams(pattern.topic)
+            record = RecurrenceRecord(topic_fingerprint(grams), pattern.topic, first_seen=now)
+            record.grams = grams
+            self.records[record.fingerprint] = record
+
+        if session_id in record.sessions:
+            last_key, last_count = record.runs.get(session_id, (None, 0))
+            if last_key == run_key:
+                added = max(0, pattern.occurrences - last_count)
+                record.runs[session_id] = [run_key, last_count + added]
+            else:
+                added = pattern.occurrences
+                record.runs[session_id] = [run_key, added]
+            record.sessions[session_id] += added
+        else:
+            record.sessions[session_id] = pattern.occurrences
+            record.runs[session_id] = [run_key, pattern.occurrences]
+            # 会话数超过上限时，最早的会话并入累计次数
+            while len(record.sessions) > MAX_SESSIONS:
+                oldest = next(iter(record.sessions))
+                record.archived_count += record.sessions.pop(oldest)
+                record.runs.pop(oldest, None)
+        record.last_seen = now
+
+        for snippet in pattern.message_snippets():
+            snippet = snippet[:MAX_SAMPLE_LENGTH]
+            if snippet in record.samples:
+                record.samples.remove(snippet)
+            record.samples.append(snippet)
+        del record.samples[:-MAX_SAMPLES]
+
+        self._evict()
+        return record
+
+    def _evict(self):
+        """记录数超过上限时淘汰最久未出现的记录"""
+        if len(self.records) <= MAX_RECORDS:
+            return
+        by_last_seen = sorted(self.records.values(), key=lambda record: record.last_seen)
+        for record in by_last_seen[:len(self.records) - MAX_RECORDS]:
+            del self.records[record.fingerprint]
+
+    def is_due(self, record: RecurrenceRecord, threshold: int) -> bool:
+        """是否应为该问题生成技能
+
+        累计次数达到阈值，且自上次生成技能后又新增了至少 threshold 次。
+        """
+        return record.count >= threshold and record.count - record.last_skill_count >= threshold
+
+    def mark_skill(self, record: RecurrenceRecord, skill_name: str):
+        """记录为该问题生成的技能"""
+        record.last_skill = skill_name
+        record.last_skill_count = record.count
+
+    def get_summary(self) -> Dict[str, int]:
+        """获取记录摘要"""
+        return {
+            'total_issues': len(self.records),
+            'recurring_issues': sum(1 for record in self.records.values() if len(record.sessions) > 1)
+        }
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retry Policy for Continuous Learning
+
+技能生成调用的重试策略
+- 指数退避 + 随机抖动：调用失败后等待 [0, min(max_delay, base_delay * 2^n)] 秒再重试
+- 熔断器：连续失败达到阈值后暂停调用，冷却时间过后放行一次试探调用，成功则恢复
+- 待重试队列：生成失败的问题保存下来，下次运行时优先重试，不必等到重新扫描对话
+- 熔断状态和待重试队列保存在同一个文件中，跨运行生效
+"""
+
+import json
+import os
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from models import IssuePattern
+
+
+# 默认参数
+DEFAULT_MAX_ATTEMPTS = 2
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 1800
+# 待重试的问题最多重试的运行次数，超过后丢弃
+MAX_PENDING_ATTEMPTS = 5
+# 待重试队列的最大长度，超过时丢弃最早加入的问题
+MAX_PENDING = 50
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RetryPolicy:
+    """指数退避重试策略
+
+    Args:
+        max_attempts: 单次运行中每个调用的最大尝试次数（含首次）
+        base_delay: 第一次重试的最大等待秒数
+        max_delay: 单次等待的上限
+        sleep: 等待函数，测试时可替换
+    """
+
+    def __init__(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY, sleep: Callable[[float], None] = time.sleep):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    def backoff(self, retry: int) -> float:
+        """第 retry 次重试前的等待秒数（从 1 开始），取 0 到上限之间的随机值"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (retry - 1))))
+
+    def wait(self, retry: int) -> float:
+        """等待第 retry 次重试，返回实际等待的秒数"""
+        delay = self.backoff(retry)
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+
+class CircuitBreaker:
+    """熔断器
+
+    Args:
+        state: 持久化的熔断状态，原地更新
+        failure_threshold: 连续失败多少次后熔断
+        cooldown: 熔断后多少秒放行试探调用
+    """
+
+    def __init__(self, state: Dict, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 cooldown: float = DEFAULT_COOLDOWN):
+        self.state = state
+        self.state.setdefault('status', CLOSED)
+        self.state.setdefault('failures', 0)
+        self.state.setdefault('opened_at', 0.0)
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+
+    @property
+    def status(self) -> str:
+        return self.state['status']
+
+    def allow(self) -> bool:
+        """是否允许调用；熔断冷却结束后进入半开状态，允许试探调用"""
+        if self.status == OPEN:
+            if time.time() - self.state['opened_at'] < self.cooldown:
+                return False
+            self.state['status'] = HALF_OPEN
+        return True
+
+    def remaining(self) -> int:
+        """距离冷却结束的秒数"""
+        if self.status != OPEN:
+            return 0
+        return max(0, int(self.state['opened_at'] + self.cooldown - time.time()))
+
+    def record_success(self):
+        self.state.update(status=CLOSED, failures=0, opened_at=0.0)
+
+    def record_failure(self):
+        self.state['failures'] += 1
+        # 半开状态的试探调用失败时立即重新熔断
+        if self.status == HALF_OPEN or self.state['failures'] >= self.failure_threshold:
+            self.state.update(status=OPEN, opened_at=time.time())
+
+
+class PendingQueue:
+    """生成失败、等待下次运行重试的问题
+
+    Args:
+        items: 持久化的队列，原地更新
+    """
+
+    def __init__(self, items: List[Dict]):
+        self.items = items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, pattern: IssuePattern, snippets: List[str], fingerprint: str = '', attempts: int = 0):
+        """加入问题，已在队列中的同一问题替换为最新的内容
+
+        Args:
+            pattern: 问题模式
+            snippets: 生成技能使用的对话片段
+            fingerprint: 跨会话复现记录的指纹，重试成功后用于关联记录
+            attempts: 已重试的运行次数
+        """
+        self.remove(pattern.topic)
+        if attempts >= MAX_PENDING_ATTEMPTS:
+            print(f"问题 \"{pattern.topic[:50]}\" 已重试 {attempts} 次，不再重试")
+            return
+        self.items.append({
+            'topic': pattern.topic,
+            'occurrences': pattern.occurrences,
+            'first_line': pattern.first_line,
+            'last_line': pattern.last_line,
+            'keywords': sorted(pattern.keywords),
+            'snippets': list(snippets),
+            'tools': pattern.tools,
+            'fingerprint': fingerprint,
+            'attempts': attempts,
+            'queued_at': datetime.now().isoformat()
+        })
+        del self.items[:-MAX_PENDING]
+
+    def remove(self, topic: str):
+        """移除问题（生成成功后调用）"""
+        self.items[:] = [item for item in self.items if item['topic'] != topic]
+
+    def take(self) -> List[Tuple[IssuePattern, List[str], str, int]]:
+        """取出全部问题
+
+        Returns:
+            (问题模式, 对话片段, 复现记录指纹, 已重试次数) 列表
+        """
+        taken = []
+        for item in self.items:
+            pattern = IssuePattern(
+                topic=item['topic'],
+                occurrences=item['occurrences'],
+                first_line=item['first_line'],
+                last_line=item['last_line'],
+                keywords=set(item['keywords']),
+                tools=item.get('tools', '')
+            )
+            taken.append((pattern, item['snippets'], item['fingerprint'], item['attempts']))
+        self.items.clear()
+        return taken
+
+
+class RetryStore:
+    """熔断状态和待重试队列的持久化
+
+    Args:
+        store_file: 状态文件路径
+        failure_threshold: 熔断的连续失败次数
+        cooldown: 熔断冷却秒数
+    """
+
+    def __init__(self, store_file: Path, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 cooldown: float = DEFAULT_COOLDOWN):
+        self.store_file = store_file
+        data = self._load()
+        self.breaker = CircuitBreaker(data.get('breaker', {}), failure_threshold, cooldown)
+        self.pending = PendingQueue(data.get('pending', []))
+
+    def _load(self) -> Dict:
+        if not self.store_file.exists():
+            return {}
+        try:
+            with open(self.store_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"警告: 无法加载重试状态: {e}")
+            return {}
+
+    def save(self):
+        """保存状态（先写临时文件再替换）"""
+        try:
+            self.store_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.store_file.with_name(self.store_file.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'breaker': self.breaker.state, 'pending': self.pending.items},
+                          f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.store_file)
+        except Exception as e:
+            print(f"警告: 无法保存重试状态: {e}")
@@ -12,6 +12,12 @@ import json
 import subprocess
 from pathlib import Path
 
+from chat_record_modules import create_metrics, load_chat_record_module
+
+
+# summary_skills.py 的运行时限（秒），低于 hook_dispatcher 给持续学习的 75 秒；
+# summary_skills.py 调用 claude -p 的总时间受 generation_time_budget（默认 50 秒）限制，能在此时限内结束
+LEARN_TIMEOUT = 70
 
 def get_project_root() -> Path:
     """获取项目根目录"""
@@ -34,54 +40,96 @@ def get_python_command() -> str:
     return 'python3.9'
 
 
+def parse_hook_data(raw_data):
+    """解析 stdin 的 hook 数据，只按需解码用到的字段（Stop 事件只需要 hook_event_name）"""
+    hook_payload = load_chat_record_module('hook_payload')
+    if hook_payload is None:
+        return json.loads(raw_data)
+    return hook_payload.LazyPayload(raw_data)
+
+
 def main():
     """主函数"""
+    metrics = create_metrics('session_end_hook', get_project_root())
+    try:
+        run(metrics)
+    finally:
+        metrics.flush()
+    sys.exit(0)
+
+
+def handle_hook(data):
+    """处理已解析的 hook 数据（hook_dispatcher 在同一进程内直接调用）"""
+    metrics = create_metrics('session_end_hook', get_project_root())
+    try:
+        process_event(data, metrics)
+    finally:
+        metrics.flush()
+
+
+def run(metrics):
+    """读取 hook 数据并处理"""
     # 从环境变量或 stdin 读取 hook 数据
     hook_data = None
 
-    # 尝试从环境变量读取
-    if "CLAUDE_HOOK_DATA" in os.environ:
-        try:
-            hook_data = json.loads(os.environ["CLAUDE_HOOK_DATA"])
-        except:
-            pass
+    with metrics.span('parse'):
+        # 尝试从环境变量读取
+        if "CLAUDE_HOOK_DATA" in os.environ:
+            try:
+                hook_data = json.loads(os.environ["CLAUDE_HOOK_DATA"])
+            except:
+                pass
 
-    # 如果环境变量没有，尝试从 stdin 读取
-    if not hook_data:
-        try:
-            data = sys.stdin.read()
-            if data:
-                hook_data = json.loads(data)
-        except:
-            pass
+        # 如果环境变量没有，尝试从 stdin 读取
+        if hook_data is None:
+            try:
+                data = sys.stdin.buffer.read()
+                metrics.add_bytes('read', len(data))
+                if data:
+                    hook_data = parse_hook_data(data)
+            except:
+                pass
 
-    if not hook_data:
-        sys.exit(0)
+    if hook_data is None:
+        return
 
+    process_event(hook_data, metrics)
+
+
+def process_event(hook_data, metrics):
+    """处理 Stop 事件：运行持续学习分析"""
     # 检查是否是 Stop 事件（会话结束）
     hook_event_name = hook_data.get("hook_event_name", "")
+    metrics.set_event(hook_event_name)
 
     if hook_event_name != "Stop":
-        sys.exit(0)
+        return
 
     project_root = get_project_root()
-    python_cmd = get_python_command()
+    with metrics.span('detect_python'):
+        python_cmd = get_python_command()
 
     # 持续学习脚本路径
     script_path = project_root / '.claude' / 'skills' / 'continuous-learning' / 'scripts' / 'summary_skills.py'
 
     if not script_path.exists():
-        sys.exit(0)
+        return
 
     # 运行持续学习分析
     try:
-        result = subprocess.run(
-            [python_cmd, str(script_path)],
-            capture_output=True,
-            text=True,
-            timeout=60,
-            cwd=project_root
-        )
+        with metrics.span('learn'):
+            command = [python_cmd, str(script_path)]
+            # 会话标识用于跨会话累计问题出现次数
+            session_id = hook_data.get("session_id")
+            if session_id:
+                command += ['--session-id', str(session_id)]
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                timeout=LEARN_TIMEOUT,
+                cwd=project_root
+            )
 
         # 输出结果到 stderr（不影响正常输出）
         if result.stdout:
@@ -93,13 +141,16 @@ def main():
         if result.returncode != 0 and result.stderr:
             sys.stderr.write(f"\n持续学习执行错误: {result.stderr}\n")
 
+        if result.returncode != 0:
+            metrics.count_error()
+
     except subprocess.TimeoutExpired:
+        metrics.count_error()
         sys.stderr.write("\n持续学习分析超时，已跳过\n")
     except Exception as e:
+        metrics.count_error()
         sys.stderr.write(f"\n持续学习执行失败: {e}\n")
 
-    sys.exit(0)
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Skill Eviction for Continuous Learning
+
+技能目录的容量控制 - 记录技能的使用情况，把冷门技能归档到压缩包
+- 使用记录：新的对话中提到技能名（如调用 Skill 工具、读取技能文件）即视为使用一次，
+  最近使用时间和使用次数写入技能的 frontmatter（last_used、use_count）
+- 使用时间取对话记录中的时间戳，同一段对话重复分析不会重复计数
+- 淘汰策略：lru 按最近使用时间、lfu 按使用次数（含合并次数）淘汰，直到数量和总字节数不超过上限；
+  长期未使用的技能不论是否超限都会淘汰；frontmatter 中 pinned: true 的技能不淘汰
+- 淘汰的技能写入 zip 压缩包后再从技能目录删除，可以随时恢复
+"""
+
+import time
+import zipfile
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from models import ConversationEntry
+from skill_metadata import join_front_matter, parse_int, split_front_matter, write_skill_file
+
+
+POLICY_LRU = 'lru'
+POLICY_LFU = 'lfu'
+
+# 默认上限，0 表示不限制
+DEFAULT_MAX_COUNT = 100
+DEFAULT_MAX_BYTES = 0
+DEFAULT_MAX_IDLE_DAYS = 0
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 技能名中可以出现的字符，提到技能名时前后不能紧接这些字符
+_NAME_CHARS = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_')
+
+
+class SkillInfo:
+    """技能文件的使用情况
+
+    Attributes:
+        path: 技能文件
+        size: 文件字节数
+        last_used: 最近使用时间（时间戳），未使用过时取合并或生成时间，都没有时取文件修改时间
+        hits: 使用次数加合并次数
+        pinned: 是否固定保留
+    """
+
+    __slots__ = ('path', 'size', 'last_used', 'hits', 'pinned')
+
+    def __init__(self, path: Path, size: int, last_used: float, hits: int, pinned: bool):
+        self.path = path
+        self.size = size
+        self.last_used = last_used
+        self.hits = hits
+        self.pinned = pinned
+
+    def __repr__(self) -> str:
+        return (f"SkillInfo(name={self.path.stem!r}, size={self.size!r}, "
+                f"last_used={self.last_used_text!r}, hits={self.hits!r})")
+
+    @property
+    def last_used_text(self) -> str:
+        return datetime.fromtimestamp(self.last_used).strftime(TIME_FORMAT)
+
+    @classmethod
+    def load(cls, path: Path) -> 'SkillInfo':
+        stat = path.stat()
+        meta, _ = split_front_matter(path.read_text(encoding='utf-8'))
+        last_used = None
+        for key in ('last_used', 'updated_at', 'generated_at'):
+            last_used = _parse_time(meta.get(key, ''))
+            if last_used is not None:
+                break
+        return cls(
+            path=path,
+            size=stat.st_size,
+            last_used=last_used if last_used is not None else stat.st_mtime,
+            hits=parse_int(meta.get('use_count', '0')) + parse_int(meta.get('merged_count', '0')),
+            pinned=meta.get('pinned', '').lower() == 'true'
+        )
+
+
+def _parse_time(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        return None
+
+
+def _find_last_mention(data, name: bytes, start: int, end: int) -> int:
+    """在 [start, end) 中查找最后一处完整的技能名，找不到时返回 -1"""
+    while True:
+        position = data.rfind(name, start, end)
+        if position == -1:
+            return -1
+        after = position + len(name)
+        if (position == 0 or data[position - 1] not in _NAME_CHARS) and \
+                (after >= len(data) or data[after] not in _NAME_CHARS):
+            return position
+        end = position + len(name) - 1
+
+
+def record_usage(skills_dir: Path, entries: Sequence[ConversationEntry]) -> List[str]:
+    """记录对话中提到的技能
+
+    在对话的共享缓冲区上直接查找技能名，不解码消息内容；
+    使用时间取最后一次提到技能的对话条目的时间，晚于已记录的时间时才计数。
+
+    Returns:
+        本次记录了使用的技能名
+    """
+    skills_dir = Path(skills_dir)
+    if not entries or not skills_dir.exists():
+        return []
+    buffer = entries[0].buffer
+    offsets = [entry.offset for entry in entries]
+    start, end = offsets[0], entries[-1].offset + entries[-1].length
+
+    used = []
+    for path in sorted(skills_dir.glob('*.md')):
+        position = _find_last_mention(buffer.data, path.stem.encode('utf-8'), start, end)
+        if position == -1:
+            continue
+        timestamp = entries[bisect_right(offsets, position) - 1].timestamp
+        try:
+            meta, body = split_front_matter(path.read_text(encoding='utf-8'))
+            if meta.get('last_used', '') >= timestamp:
+                continue
+            meta['last_used'] = timestamp
+            meta['use_count'] = str(parse_int(meta.get('use_count', '0')) + 1)
+            write_skill_file(path, join_front_matter(meta, body))
+            used.append(path.stem)
+        except Exception as e:
+            print(f"警告: 无法记录技能 {path.name} 的使用: {e}")
+    return used
+
+
+class SkillEvictor:
+    """技能淘汰
+
+    Args:
+        skills_dir: 技能目录
+        archive_file: 归档压缩包
+        max_count: 最多保留的技能数，0 表示不限制
+        max_bytes: 技能文件的总字节数上限，0 表示不限制
+        max_idle_days: 超过多少天未使用的技能直接淘汰，0 表示不限制
+        policy: POLICY_LRU 或 POLICY_LFU
+    """
+
+    def __init__(self, skills_dir: Path, archive_file: Path, max_count: int = DEFAULT_MAX_COUNT,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_idle_days: int = DEFAULT_MAX_IDLE_DAYS,
+                 policy: str = POLICY_LRU):
+        self.skills_dir = Path(skills_dir)
+        self.archive_file = Path(archive_file)
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.max_idle_days = max_idle_days
+        if policy not in (POLICY_LRU, POLICY_LFU):
+            print(f"警告: 未知的淘汰策略 {policy}，使用 {POLICY_LRU}")
+            policy = POLICY_LRU
+        self.policy = policy
+
+    def _coldness(self, info: SkillInfo):
+        """排序键，越小越先淘汰"""
+        if self.policy == POLICY_LFU:
+            return info.hits, info.last_used
+        return info.last_used, info.hits
+
+    def plan(self) -> List[SkillInfo]:
+        """计算需要淘汰的技能，按淘汰顺序排列"""
+        skills = []
+        for path in self.skills_dir.glob('*.md'):
+            try:
+                skills.append(SkillInfo.load(path))
+            except Exception as e:
+                print(f"警告: 无法读取技能 {path.name}: {e}")
+        candidates = sorted((info for info in skills if not info.pinned), key=self._coldness)
+
+        count = len(skills)
+        total = sum(info.size for info in skills)
+        idle_before = time.time() - self.max_idle_days * 86400 if self.max_idle_days > 0 else None
+        evicted = []
+        for info in candidates:
+            over_limit = (self.max_count > 0 and count > self.max_count) or \
+                (self.max_bytes > 0 and total > self.max_bytes)
+            idle = idle_before is not None and info.last_used < idle_before
+            if over_limit or idle:
+                evicted.append(info)
+                count -= 1
+                total -= info.size
+        return evicted
+
+    def evict(self, dry_run: bool = False) -> List[SkillInfo]:
+        """淘汰技能：写入归档后从技能目录删除
+
+        Args:
+            dry_run: 只计算需要淘汰的技能，不修改文件
+        """
+        if not self.skills_dir.exists():
+            return []
+        evicted = self.plan()
+        if not evicted or dry_run:
+            return evicted
+
+        self.archive_file.parent.mkdir(parents=True, exist_ok=True)
+        archived_at = datetime.now().strftime('%Y%m%d%H%M%S')
+        with zipfile.ZipFile(self.archive_file, 'a', zipfile.ZIP_DEFLATED) as archive:
+            for info in evicted:
+                archive.write(info.path, f"{archived_at}/{info.path.name}")
+        # 全部写入归档后再删除，中途失败不会丢失技能
+        for info in evicted:
+            info.path.unlink()
+        return evicted
+
+
+def restore_skill(archive_file: Path, name: str, skills_dir: Path) -> Optional[Path]:
+    """从归档中恢复最近一次归档的同名技能，并记为刚刚使用
+
+    Returns:
+        恢复后的技能文件，归档中没有该技能或技能目录中已存在时返回 None
+    """
+    archive_file = Path(archive_file)
+    file_name = name if name.endswith('.md') else f"{name}.md"
+    target = Path(skills_dir) / file_name
+    if target.exists():
+        print(f"技能已存在: {target}")
+        return None
+    if not archive_file.exists():
+        print(f"归档不存在: {archive_file}")
+        return None
+
+    with zipfile.ZipFile(archive_file) as archive:
+        members = sorted(member for member in archive.namelist() if member.rsplit('/', 1)[-1] == file_name)
+        if not members:
+            print(f"归档中没有技能: {file_name}")
+            return None
+        content = archive.read(members[-1]).decode('utf-8')
+
+    # 记为刚刚使用，避免下次运行时又被淘汰
+    meta, body = split_front_matter(content)
+    meta['last_used'] = datetime.now().strftime(TIME_FORMAT)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    write_skill_file(target, join_front_matter(meta, body))
+    return target
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Skill Fingerprint for Continuous Learning
+
+技能内容指纹与去重 - 用 SimHash 识别近似重复的技能并合并
+- 指纹只取正文：去掉 frontmatter、模板标题、页脚和时间戳，避免所有技能因共同模板而相似
+- 正文切分为字符 n-gram 计算 64 位 SimHash，两个指纹的汉明距离越小内容越接近
+- 按鸽巢原理把指纹分为 max_distance + 1 段建索引，距离不超过阈值的指纹至少有一段相同，
+  查询只比较同段的候选，不必与每个技能比较
+- 合并时保留已有技能的文件和名称，只补充新技能中没有的章节和列表项，并更新 frontmatter
+"""
+
+import hashlib
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from issue_clustering import char_ngrams, jaccard
+from models import LearnedSkill
+from skill_metadata import (
+    bump_version, join_front_matter, merge_list, parse_int, parse_list, split_front_matter,
+    write_skill_file
+)
+
+
+FINGERPRINT_BITS = 64
+# 指纹使用的字符 n-gram 长度；技能正文较长，三元组比二元组区分度更高
+FINGERPRINT_NGRAM_SIZE = 3
+# 默认的最大汉明距离，不超过该距离的技能视为近似重复（约相当于 n-gram 余弦相似度 0.8）
+DEFAULT_MAX_DISTANCE = 12
+# 列表项的 n-gram 相似度达到该值时视为已有内容，合并时不再追加
+ITEM_SIMILARITY = 0.6
+
+GENERATED_FOOTER = '*此技能由 Continuous Learning 自动生成*'
+
+_TIMESTAMP_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?')
+_SECTION_PREFIX = '## '
+_LIST_ITEM_PATTERN = re.compile(r'^(\s*)(?:[-*+]|(\d+)\.)\s+(.*)$')
+
+
+def skill_shingles(content: str, ngram_size: int = FINGERPRINT_NGRAM_SIZE):
+    """技能正文的字符 n-gram 集合，不含模板标题、页脚和时间戳"""
+    _, body = split_front_matter(content)
+    lines = [line for line in body.split('\n')
+             if not line.lstrip().startswith('#') and line.strip() != GENERATED_FOOTER]
+    return char_ngrams(_TIMESTAMP_PATTERN.sub('', '\n'.join(lines)), ngram_size)
+
+
+def simhash(shingles) -> int:
+    """n-gram 集合的 64 位 SimHash，空集合返回 0
+
+    每个 n-gram 哈希为 64 位，按位统计为 1 的个数，超过半数的位在指纹中置 1。
+    按列统计二进制字符串，计数在 C 层完成。
+    """
+    if not shingles:
+        return 0
+    bits = [format(int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'),
+                   '064b') for shingle in shingles]
+    half = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+def content_fingerprint(content: str) -> int:
+    """技能内容的指纹"""
+    return simhash(skill_shingles(content))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def _band_masks(max_distance: int) -> List[Tuple[int, int]]:
+    """把 64 位分为 max_distance + 1 段，返回每段的 (位移, 掩码)"""
+    bands = max_distance + 1
+    masks = []
+    shift = 0
+    for band in range(bands):
+        width = FINGERPRINT_BITS // bands + (1 if band < FINGERPRINT_BITS % bands else 0)
+        masks.append((shift, (1 << width) - 1))
+        shift += width
+    return masks
+
+
+class SkillIndex:
+    """技能指纹索引
+
+    Args:
+        max_distance: 最大汉明距离，不超过该距离的指纹视为近似重复
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = min(max(0, max_distance), FINGERPRINT_BITS // 2 - 1)
+        self._masks = _band_masks(self.max_distance)
+        self.fingerprints: Dict[Path, int] = {}
+        self._buckets: Dict[Tuple[int, int], List[Path]] = {}
+
+    @classmethod
+    def load(cls, skills_dir: Path, max_distance: int = DEFAULT_MAX_DISTANCE) -> 'SkillIndex':
+        """为目录中已有的技能建立索引"""
+        index = cls(max_distance)
+        for path in sorted(Path(skills_dir).glob('*.md')):
+            try:
+                index.add(path, content_fingerprint(path.read_text(encoding='utf-8')))
+            except Exception as e:
+                print(f"警告: 无法读取技能 {path.name}: {e}")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def _keys(self, fingerprint: int):
+        return [(band, (fingerprint >> shift) & mask) for band, (shift, mask) in enumerate(self._masks)]
+
+    def add(self, path: Path, fingerprint: int):
+        self.remove(path)
+        self.fingerprints[path] = fingerprint
+        for key in self._keys(fingerprint):
+            self._buckets.setdefault(key, []).append(path)
+
+    def remove(self, path: Path):
+        fingerprint = self.fingerprints.pop(path, None)
+        if fingerprint is None:
+            return
+        for key in self._keys(fingerprint):
+            self._buckets[key].remove(path)
+
+    def find(self, fingerprint: int) -> Optional[Tuple[Path, int]]:
+        """查找最接近的近似重复技能
+
+        Returns:
+            (技能文件, 汉明距离)，没有近似重复时返回 None
+        """
+        if not fingerprint:
+            return None
+        best = None
+        checked = set()
+        for key in self._keys(fingerprint):
+            for path in self._buckets.get(key, ()):
+                if path in checked:
+                    continue
+                checked.add(path)
+                distance = hamming_distance(fingerprint, self.fingerprints[path])
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (path, distance)
+        return best
+
+
+def _split_sections(body: str) -> Tuple[List[str], List[Tuple[str, List[str]]], List[str]]:
+    """拆分正文
+
+    Returns:
+        (第一个二级标题之前的行, [(二级标题, 章节内容行)], 页脚行)
+    """
+    lines = body.rstrip('\n').split('\n')
+    footer = []
+    if lines and lines[-1].strip() == GENERATED_FOOTER:
+        footer = lines[-2:] if len(lines) > 1 and lines[-2].strip() == '---' else lines[-1:]
+        lines = lines[:-len(footer)]
+
+    preamble: List[str] = []
+    sections: List[Tuple[str, List[str]]] = []
+    for line in lines:
+        if line.startswith(_SECTION_PREFIX):
+            sections.append((line[len(_SECTION_PREFIX):].strip(), []))
+        elif sections:
+            sections[-1][1].append(line)
+        else:
+            preamble.append(line)
+    return preamble, sections, footer
+
+
+def _merge_items(existing: List[str], new: List[str]) -> List[str]:
+    """把新章节中没有的顶层列表项追加到已有章节末尾，有序列表接着已有编号"""
+    known = []
+    last_number = 0
+    for line in existing:
+        match = _LIST_ITEM_PATTERN.match(line)
+        if match:
+            known.append(char_ngrams(match.group(3)))
+            if match.group(2) and not match.group(1):
+                last_number = int(match.group(2))
+
+    added = []
+    for line in new:
+        match = _LIST_ITEM_PATTERN.match(line)
+        if not match or match.group(1):
+            continue
+        grams = char_ngrams(match.group(3))
+        if not grams or any(jaccard(grams, item) >= ITEM_SIMILARITY for item in known):
+            continue
+        known.append(grams)
+        if match.group(2):
+            last_number += 1
+            line = f"{last_number}. {match.group(3)}"
+        added.append(line)
+
+    if not added:
+        return existing
+    while existing and not existing[-1].strip():
+        existing = existing[:-1]
+    return existing + added + ['']
+
+
+def merge_skill_content(existing: str, new: str, new_name: str = '') -> str:
+    """把新技能合并到已有技能
+
+    已有技能的正文和标题保持不变，新技能中没有的章节追加到末尾、没有的列表项追加到对应章节；
+    frontmatter 的修订号加一，记录合并时间、合并次数和被合并的技能名，标签取并集。
+    """
+    meta, body = split_front_matter(existing)
+    new_meta, new_body = split_front_matter(new)
+
+    preamble, sections, footer = _split_sections(body)
+    _, new_sections, _ = _split_sections(new_body)
+    positions = {title: index for index, (title, _) in enumerate(sections)}
+    for title, lines in new_sections:
+        if title in positions:
+            index = positions[title]
+            sections[index] = (title, _merge_items(sections[index][1], lines))
+        else:
+            positions[title] = len(sections)
+            sections.append((title, lines))
+
+    merged_lines = list(preamble)
+    for title, lines in sections:
+        merged_lines.append(_SECTION_PREFIX + title)
+        merged_lines.extend(lines)
+    merged_body = '\n'.join(merged_lines + footer).rstrip('\n') + '\n'
+
+    if not meta:
+        return merged_body
+    meta['version'] = bump_version(meta.get('version', ''))
+    if new_meta.get('tags'):
+        meta['tags'] = merge_list(meta.get('tags', '[]'), parse_list(new_meta['tags']))
+    meta['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    meta['merged_count'] = str(parse_int(meta.get('merged_count', '0')) + 1)
+    if new_name and new_name != meta.get('name'):
+        meta['merged_from'] = merge_list(meta.get('merged_from', '[]'), [new_name])
+    return join_front_matter(meta, merged_body)
+
+
+class SkillDeduplicator:
+    """保存技能时合并近似重复的技能
+
+    Args:
+        skills_dir: 技能目录
+        max_distance: 最大汉明距离
+    """
+
+    def __init__(self, skills_dir: Path, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.skills_dir = Path(skills_dir)
+        self.index = SkillIndex.load(self.skills_dir, max_distance)
+
+    def save(self, skill: LearnedSkill) -> bool:
+        """保存技能；与已有技能近似重复或同名时合并到已有技能
+
+        合并后 skill 的名称、内容和文件路径更新为已有技能的。
+
+        Returns:
+            是否合并到了已有技能
+        """
+        fingerprint = content_fingerprint(skill.content)
+        match = self.index.find(fingerprint)
+        target = self.skills_dir / f"{skill.name}.md"
+        if match is not None:
+            target = match[0]
+            print(f"技能 {skill.name} 与已有技能 {target.stem} 近似重复（指纹距离 {match[1]}），合并到已有技能")
+        elif target.exists():
+            print(f"技能 {skill.name} 与已有技能同名，合并到已有技能")
+        else:
+            skill.save(self.skills_dir)
+            self.index.add(skill.file_path, fingerprint)
+            return False
+
+        merged = merge_skill_content(target.read_text(encoding='utf-8'), skill.content, skill.name)
+        write_skill_file(target, merged)
+        # 索引保留已有技能原来的指纹，多次合并不会让指纹逐渐偏离
+        if target not in self.index.fingerprints:
+            self.index.add(target, content_fingerprint(merged))
+        skill.name = target.stem
+        skill.content = merged
+        skill.file_path = target
+        return True
+
+
+def _generated_at(path: Path) -> str:
+    """技能的生成时间，frontmatter 中没有时使用文件修改时间"""
+    try:
+        meta, _ = split_front_matter(path.read_text(encoding='utf-8'))
+    except Exception:
+        meta = {}
+    return meta.get('generated_at') or datetime.fromtimestamp(path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def dedupe_skills(skills_dir: Path, max_distance: int = DEFAULT_MAX_DISTANCE,
+                  dry_run: bool = False) -> Dict[Path, List[Path]]:
+    """合并目录中已有的近似重复技能
+
+    按生成时间从早到晚处理，每个技能与更早保留下来的技能比较，
+    近似重复时合并到更早的技能并删除自身。
+
+    Args:
+        skills_dir: 技能目录
+        max_distance: 最大汉明距离
+        dry_run: 只列出将要合并的技能，不修改文件
+
+    Returns:
+        {保留的技能文件: [合并进来的技能文件]}
+    """
+    skills_dir = Path(skills_dir)
+    index = SkillIndex(max_distance)
+    groups: Dict[Path, List[Path]] = {}
+    for path in sorted(skills_dir.glob('*.md'), key=_generated_at):
+        try:
+            content = path.read_text(encoding='utf-8')
+        except Exception as e:
+            print(f"警告: 无法读取技能 {path.name}: {e}")
+            continue
+        fingerprint = content_fingerprint(content)
+        match = index.find(fingerprint)
+        if match is None:
+            index.add(path, fingerprint)
+            continue
+
+        target, distance = match
+        groups.setdefault(target, []).append(path)
+        print(f"{path.name} -> {target.name}（指纹距离 {distance}）")
+        if not dry_run:
+            write_skill_file(target, merge_skill_content(target.read_text(encoding='utf-8'), content, path.stem))
+            path.unlink()
+    return groups
@@ -6,35 +6,88 @@ Skill Generator for Continuous Learning
 技能生成器 - 使用 Claude -p 生成学习技能
 """
 
+import re
 import subprocess
 import json
 import tempfile
+import time
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 
+from chat_record_modules import load_chat_record_module
 from models import IssuePattern, LearnedSkill
+from prompts import (
+    SKILL_BEGIN_MARKER, SKILL_END_MARKER, build_batch_pattern_section, build_batch_skill_prompt
+)
+from retry_policy import CircuitBreaker, RetryPolicy
+
+
+# 单次提示词的默认 token 预算（估算值）
+DEFAULT_PROMPT_BUDGET = 8000
+# 单次批量生成的最大问题数，避免单次输出过长
+MAX_BATCH_SIZE = 5
+# 每个问题的对话片段至少保留的 token 数
+MIN_SNIPPET_TOKENS = 100
+# 同时运行的 claude -p 调用数
+MAX_PARALLEL_CALLS = 2
+# claude -p 调用的首字节超时和总超时（秒）
+CLAUDE_FIRST_BYTE_TIMEOUT = 60
+CLAUDE_TIMEOUT = 120
+# 有总时限时，剩余时间少于该秒数不再发起调用
+MIN_CALL_SECONDS = 10
+
+# 单次调用的状态：出错（非零返回码）可在本次运行中重试，超时和未找到命令直接放弃；
+# 超时但保留了部分输出的调用不算失败
+CALL_OK = 'ok'
+CALL_PARTIAL = 'partial'
+CALL_ERROR = 'error'
+CALL_TIMEOUT = 'timeout'
+CALL_NOT_FOUND = 'not_found'
 
 
 class SkillGenerator:
-    """技能生成器"""
-
-    def __init__(self, skills_output_dir: Path):
+    """技能生成器
+
+    Args:
+        skills_output_dir: 技能输出目录
+        prompt_budget: 单次提示词的 token 预算，对话片段按与问题的相关度在预算内选取
+        retry_policy: 调用出错时的重试策略，默认不重试
+        breaker: 熔断器，连续失败后暂停调用，默认不熔断
+        time_budget: 从创建起调用 claude -p（含重试等待）的总秒数，单次调用的超时不超过剩余时间，
+            默认不限制
+    """
+
+    def __init__(self, skills_output_dir: Path, prompt_budget: int = DEFAULT_PROMPT_BUDGET,
+                 retry_policy: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 time_budget: Optional[float] = None):
         self.skills_output_dir = Path(skills_output_dir)
-
-    def generate(self, pattern: IssuePattern, conversation_snippets: List[str]) -> Optional[LearnedSkill]:
+        self.prompt_budget = prompt_budget
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy(max_attempts=1)
+        self.breaker = breaker
+        self.deadline = time.monotonic() + time_budget if time_budget else None
+        # 预算、去重和片段排序由 chat-record 的 prompt_budget 模块提供，不可用时按长度平均截断
+        self._budget = load_chat_record_module('prompt_budget')
+        # 流式调用和超时控制由 chat-record 的 claude_runner 模块提供，不可用时使用 subprocess.run
+        self._runner = load_chat_record_module('claude_runner')
+
+    def generate(self, pattern: IssuePattern, conversation_snippets: List[str],
+                 prompt_budget: Optional[int] = None) -> Optional[LearnedSkill]:
         """使用 claude -p 生成学习技能
 
         Args:
             pattern: 检测到的问题模式
             conversation_snippets: 对话片段列表
+            prompt_budget: 提示词的 token 预算，默认使用构造时的预算
 
         Returns:
             生成的学习技能，如果生成失败则返回 None
         """
         print(f"\n正在使用 Claude AI 生成技能: {pattern.topic}")
 
-        # 构建提示词
+        # 构建提示词，对话片段压缩到预算内
+        budget = (prompt_budget or self.prompt_budget) - self._estimate_tokens(self._build_claude_prompt(pattern, []))
+        conversation_snippets = self._fit_snippets(conversation_snippets, budget, pattern)
         prompt = self._build_claude_prompt(pattern, conversation_snippets)
 
         # 检查现有技能
@@ -47,11 +100,132 @@ class SkillGenerator:
             print("Claude API 返回空内容，生成失败")
             return None
 
+        skill = self._create_skill(pattern, skill_content)
+        print(f"技能生成成功: {skill.name}")
+        return skill
+
+    def generate_batch(self, items: List[Tuple[IssuePattern, List[str]]],
+                       prompt_budget: Optional[int] = None) -> List[Optional[LearnedSkill]]:
+        """批量生成学习技能，多个问题打包进一次 claude -p 调用
+
+        Args:
+            items: (问题模式, 对话片段) 列表
+            prompt_budget: 单次提示词的 token 预算，超出时拆分为多次调用或压缩对话片段，
+                默认使用构造时的预算
+
+        Returns:
+            与 items 顺序一致的技能列表，生成失败的位置为 None
+        """
+        results: List[Optional[LearnedSkill]] = [None] * len(items)
+        prompt_budget = prompt_budget or self.prompt_budget
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        batches = self._plan_batches(items, prompt_budget, generated_at)
+        multi = [batch for batch in batches if len(batch) > 1]
+
+        # 多个批次并行调用；超时时保留已完整输出的技能，缺少的再单独生成
+        if multi:
+            print(f"\n正在使用 Claude AI 批量生成 {sum(len(batch) for batch in multi)} 个技能"
+                  f"（{len(multi)} 次调用）")
+        prompts = [build_batch_skill_prompt([section for _, _, _, section in batch], generated_at)
+                   for batch in multi]
+        outputs = self._call_claude_many(prompts, allow_partial=True)
+
+        for batch, output in zip(multi, outputs):
+            blocks = self._split_batch_output(output) if output else {}
+            for position, (index, pattern, snippets, _) in enumerate(batch, 1):
+                content = blocks.get(position)
+                if content:
+                    results[index] = self._create_skill(pattern, content)
+                    print(f"技能生成成功: {results[index].name}")
+                else:
+                    # 批量输出中缺少该技能时单独生成
+                    print(f"批量输出缺少问题 {position} 的技能，单独生成")
+                    results[index] = self.generate(pattern, snippets, prompt_budget)
+
+        for batch in batches:
+            if len(batch) == 1:
+                index, pattern, snippets, _ = batch[0]
+                results[index] = self.generate(pattern, snippets, prompt_budget)
+
+        return results
+
+    def _plan_batches(self, items: List[Tuple[IssuePattern, List[str]]], prompt_budget: int,
+                      generated_at: str) -> List[List[Tuple[int, IssuePattern, List[str], str]]]:
+        """按提示词预算把问题分组，返回每组的 (下标, 问题模式, 对话片段, 提示词片段)"""
+        overhead = self._estimate_tokens(build_batch_skill_prompt([], generated_at))
+        section_budget = max(prompt_budget - overhead, MIN_SNIPPET_TOKENS)
+
+        batches = []
+        current, current_size = [], 0
+        for index, (pattern, snippets) in enumerate(items):
+            position = len(current) + 1
+            section = self._build_batch_section(position, pattern, snippets, section_budget)
+            size = self._estimate_tokens(section)
+            if current and (current_size + size > section_budget or len(current) >= MAX_BATCH_SIZE):
+                batches.append(current)
+                current, current_size = [], 0
+                section = self._build_batch_section(1, pattern, snippets, section_budget)
+                size = self._estimate_tokens(section)
+            current.append((index, pattern, snippets, section))
+            current_size += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _build_batch_section(self, position: int, pattern: IssuePattern, snippets: List[str],
+                             budget: int) -> str:
+        """构建单个问题的提示词片段，超出预算时压缩对话片段"""
+        keywords = ', '.join(list(pattern.keywords)[:10]) if pattern.keywords else '无'
+        empty = build_batch_pattern_section(position, pattern.topic, pattern.occurrences, keywords,
+                                            pattern.tools, '')
+        snippets = self._fit_snippets(snippets, budget - self._estimate_tokens(empty), pattern)
+        return build_batch_pattern_section(
+            position, pattern.topic, pattern.occurrences, keywords, pattern.tools, self._format_snippets(snippets)
+        )
+
+    def _estimate_tokens(self, text: str) -> int:
+        """估算 token 数，prompt_budget 模块不可用时按 2 个字符 1 个 token 保守估算"""
+        if self._budget is not None:
+            return self._budget.estimate_tokens(text)
+        return len(text) // 2
+
+    def _fit_snippets(self, snippets: List[str], budget: int, pattern: IssuePattern) -> List[str]:
+        """把对话片段压缩到预算内
+
+        去掉近似重复的片段、压缩工具输出，按与问题关键词的相关度选取；
+        prompt_budget 模块不可用时，超出预算则平均截断每个片段。
+        """
+        budget = max(budget, MIN_SNIPPET_TOKENS)
+        if not snippets:
+            return snippets
+        if self._budget is not None:
+            keywords = list(pattern.keywords) + self._extract_topic_keywords(pattern.topic)
+            return self._budget.fit_snippets(snippets, keywords, budget)
+
+        if sum(self._estimate_tokens(snippet) for snippet in snippets) <= budget:
+            return snippets
+        limit = budget * 2 // len(snippets)
+        return [snippet if len(snippet) <= limit else snippet[:limit] + '...(已截断)'
+                for snippet in snippets]
+
+    def _split_batch_output(self, output: str) -> dict:
+        """按分隔行拆分批量输出，返回 {问题编号: 技能内容}"""
+        begin = re.escape(SKILL_BEGIN_MARKER).replace(r'\{index\}', r'(\d+)')
+        end = re.escape(SKILL_END_MARKER).replace(r'\{index\}', r'\1')
+        blocks = {}
+        for match in re.finditer(begin + r'\s*\n(.*?)\n\s*' + end, output, re.DOTALL):
+            content = self._unwrap_markdown_code_block(match.group(2).strip())
+            if content:
+                blocks.setdefault(int(match.group(1)), content)
+        return blocks
+
+    def _create_skill(self, pattern: IssuePattern, skill_content: str) -> LearnedSkill:
+        """由生成的内容创建技能对象"""
         # 从生成的内容中提取技能名称（从 YAML frontmatter）
         skill_name = self._extract_skill_name_from_content(skill_content)
 
-        # 创建技能对象
-        skill = LearnedSkill(
+        return LearnedSkill(
             name=skill_name,
             description=f"自动生成的修复技能 - {pattern.topic}",
             issue_topic=pattern.topic,
@@ -60,16 +234,16 @@ class SkillGenerator:
             content=skill_content
         )
 
-        print(f"技能生成成功: {skill.name}")
-        return skill
+    def _format_snippets(self, conversation_snippets: List[str]) -> str:
+        """格式化对话片段"""
+        if conversation_snippets:
+            return "\n\n".join([f"### 对话片段 {i+1}\n{snippet}" for i, snippet in enumerate(conversation_snippets)])
+        return "（无对话片段）"
 
     def _build_claude_prompt(self, pattern: IssuePattern, conversation_snippets: List[str]) -> str:
         """构建 Claude 提示词"""
         # 构建对话内容
-        if conversation_snippets:
-            conversation_text = "\n\n".join([f"### 对话片段 {i+1}\n{snippet}" for i, snippet in enumerate(conversation_snippets)])
-        else:
-            conversation_text = "（无对话片段）"
+        conversation_text = self._format_snippets(conversation_snippets)
 
         prompt = f"""# 角色设定
 你是一个具备持续学习能力的 AI 助手，专门分析 Claude Code 对话记录，从反复出现的错误中学习并生成修复技能。
@@ -88,6 +262,9 @@ class SkillGenerator:
 ## 关键词
 {', '.join(list(pattern.keywords)[:10]) if pattern.keywords else '无'}
 
+## 修复过程中的工具调用
+{pattern.tools or '无记录'}
+
 ## 对话片段（按时间顺序）
 {conversation_text}
 
@@ -210,8 +387,134 @@ generated_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         chinese_words = re.findall(r'[\u4e00-\u9fff]{2,}', topic)
         return chinese_words[:5] if chinese_words else [topic[:10]]
 
-    def _call_claude_api(self, prompt: str) -> Optional[str]:
-        """调用 claude -p API"""
+    def _call_claude_api(self, prompt: str, allow_partial: bool = False) -> Optional[str]:
+        """调用 claude -p API
+
+        Args:
+            prompt: 提示词
+            allow_partial: 超时或中断时是否返回已收到的部分输出
+        """
+        return self._call_claude_many([prompt], allow_partial)[0]
+
+    def _call_claude_many(self, prompts: List[str], allow_partial: bool = False) -> List[Optional[str]]:
+        """并行调用 claude -p，返回与 prompts 顺序一致的输出，失败的位置为 None
+
+        调用出错（非零返回码）时按重试策略退避后重试；超时和未找到命令不在本次运行中重试。
+        熔断器打开或剩余时间不足时不再调用。
+        """
+        outputs: List[Optional[str]] = [None] * len(prompts)
+        remaining = list(range(len(prompts)))
+
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            if not remaining:
+                break
+            if self.breaker is not None and not self.breaker.allow():
+                print(f"警告: claude -p 连续调用失败，已暂停调用（{self.breaker.remaining()} 秒后恢复）")
+                break
+            if attempt > 1:
+                delay = self.retry_policy.wait(attempt - 1)
+                print(f"等待 {delay:.1f} 秒后重试 {len(remaining)} 个调用（第 {attempt} 次尝试）")
+            time_left = self._time_left()
+            if time_left is not None and time_left < MIN_CALL_SECONDS:
+                print(f"警告: 剩余时间不足 {MIN_CALL_SECONDS} 秒，{len(remaining)} 个调用留到下次运行")
+                break
+
+            retry = []
+            results = self._call_claude_once([prompts[i] for i in remaining], allow_partial)
+            for index, (output, status) in zip(remaining, results):
+                outputs[index] = output
+                if output is None and status == CALL_ERROR:
+                    retry.append(index)
+            self._record_round([status for _, status in results])
+            remaining = retry
+
+        return outputs
+
+    def _record_round(self, statuses: List[str]):
+        """按轮次更新熔断器
+
+        一轮并行调用至多记一次失败：有调用成功时记为成功，全部失败时记一次失败，
+        只有保留了部分输出的超时时不记录。
+        """
+        if self.breaker is None:
+            return
+        if CALL_OK in statuses:
+            self.breaker.record_success()
+        elif any(status != CALL_PARTIAL for status in statuses):
+            self.breaker.record_failure()
+
+    def _time_left(self) -> Optional[float]:
+        """距离总时限的秒数，不限制时返回 None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def _call_timeout(self) -> float:
+        """单次调用的超时：不超过 CLAUDE_TIMEOUT 和剩余时间"""
+        time_left = self._time_left()
+        return CLAUDE_TIMEOUT if time_left is None else max(min(CLAUDE_TIMEOUT, time_left), 1)
+
+    def _call_claude_once(self, prompts: List[str], allow_partial: bool) -> List[Tuple[Optional[str], str]]:
+        """调用一轮 claude -p，返回每个提示词的 (输出, 调用状态)"""
+        if self._runner is None:
+            results = []
+            for prompt in prompts:
+                time_left = self._time_left()
+                if time_left is not None and time_left < MIN_CALL_SECONDS:
+                    print("警告: 剩余时间不足，跳过调用")
+                    results.append((None, CALL_TIMEOUT))
+                else:
+                    results.append(self._call_claude_subprocess(prompt))
+            return results
+
+        timeout = self._call_timeout()
+        try:
+            results = self._runner.run_claude_many(
+                prompts,
+                MAX_PARALLEL_CALLS,
+                first_byte_timeout=min(CLAUDE_FIRST_BYTE_TIMEOUT, timeout),
+                total_timeout=timeout
+            )
+        except Exception as e:
+            print(f"错误: Claude API 调用失败: {e}")
+            return [(None, CALL_ERROR)] * len(prompts)
+        return [self._handle_claude_result(result, allow_partial) for result in results]
+
+    def _handle_claude_result(self, result, allow_partial: bool) -> Tuple[Optional[str], str]:
+        """处理 claude_runner 的调用结果，返回 (输出, 调用状态)"""
+        runner = self._runner
+        output = result.output.strip()
+
+        if result.status == runner.STATUS_NOT_FOUND:
+            print("错误: 未找到 claude 命令，请确保 Claude Code CLI 已安装")
+            return None, CALL_NOT_FOUND
+        if result.status == runner.STATUS_FIRST_BYTE_TIMEOUT:
+            print("错误: Claude API 在首字节超时内无响应")
+            return None, CALL_TIMEOUT
+        if result.status == runner.STATUS_ERROR:
+            print(f"Claude API 调用失败 (返回码 {result.returncode})")
+            if result.stderr:
+                print(f"stderr: {result.stderr}")
+            return None, CALL_ERROR
+        if not result.ok:
+            print(f"错误: Claude API 调用{'超时' if result.status == runner.STATUS_TIMEOUT else '被中断'}")
+            if not (allow_partial and output):
+                return None, CALL_TIMEOUT
+            print(f"保留已收到的 {len(output)} 字符部分输出")
+            return output, CALL_PARTIAL
+
+        if not output:
+            print("Claude API 返回空内容")
+            if result.stderr:
+                print(f"stderr: {result.stderr}")
+            return None, CALL_OK
+
+        print(f"Claude API 返回 {len(output)} 字符")
+        # 去除可能的 markdown 代码块包装
+        return self._unwrap_markdown_code_block(output), CALL_OK
+
+    def _call_claude_subprocess(self, prompt: str) -> Tuple[Optional[str], str]:
+        """claude_runner 不可用时，阻塞调用 claude -p，返回 (输出, 调用状态)"""
         try:
             # 使用管道直接传递提示词
             result = subprocess.run(
@@ -219,7 +522,7 @@ generated_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                 input=prompt,
                 capture_output=True,
                 text=True,
-                timeout=120  # 2 分钟超时
+                timeout=self._call_timeout()
             )
 
             if result.returncode == 0:
@@ -230,27 +533,27 @@ generated_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                     # 去除可能的 markdown 代码块包装
                     output = self._unwrap_markdown_code_block(output)
 
-                    return output
+                    return output, CALL_OK
                 else:
                     print("Claude API 返回空内容")
                     if result.stderr:
                         print(f"stderr: {result.stderr}")
-                    return None
+                    return None, CALL_OK
             else:
                 print(f"Claude API 调用失败 (返回码 {result.returncode})")
                 if result.stderr:
                     print(f"stderr: {result.stderr}")
-                return None
+                return None, CALL_ERROR
 
         except subprocess.TimeoutExpired:
             print("错误: Claude API 调用超时")
-            return None
+            return None, CALL_TIMEOUT
         except FileNotFoundError:
             print("错误: 未找到 claude 命令，请确保 Claude Code CLI 已安装")
-            return None
+            return None, CALL_NOT_FOUND
         except Exception as e:
             print(f"错误: Claude API 调用失败: {e}")
-            return None
+            return None, CALL_ERROR
 
     def _unwrap_markdown_code_block(self, content: str) -> str:
         """去除 markdown 代码块包装"""
@@ -288,96 +591,3 @@ generated_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         if len(topic) > 50:
             return topic[:50] + "..."
         return topic
-
-    def _sanitize_topic(self, topic: str) -> str:
-        """清理主题字符串，用作文件名"""
-        import re
-        # 只保留字母、数字、中文和连字符
-        sanitized = re.sub(r'[^\w\u4e00-\u9fff-]', '-', topic)
-        # 移除连续的连字符
-        sanitized = re.sub(r'-+', '-', sanitized)
-        # 移除首尾连字符
-        sanitized = sanitized.strip('-')
-        return sanitized[:50]
-        """生成技能内容（简化版本）"""
-        generated_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        # 提取问题模式
-        problem_pattern = self._extract_problem_pattern(pattern)
-        solution_pattern = self._extract_solution_pattern(pattern)
-        tools_used = self._extract_tools_used(context)
-
-        # 提取对话片段
-        first_attempt = self._get_first_attempt(pattern, context)
-        last_attempt = self._get_last_attempt(pattern, context)
-
-        # 提取关键词
-        keywords = ', '.join(list(pattern.keywords)[:10]) if pattern.keywords else "问题, 修复"
-
-        return build_skill_content(
-            skill_name="fix-" + self._sanitize_topic(pattern.topic),
-            issue_topic=pattern.topic,
-            retry_count=pattern.occurrences,
-            generated_time=generated_time,
-            problem_pattern=problem_pattern,
-            solution_pattern=solution_pattern,
-            tools_used=tools_used,
-            first_attempt=first_attempt,
-            last_attempt=last_attempt,
-            retry_threshold=self.retry_threshold,
-            keywords=keywords
-        )
-
-    def _extract_problem_pattern(self, pattern: IssuePattern) -> str:
-        """提取问题模式"""
-        if pattern.user_messages:
-            return pattern.user_messages[0]['content'][:200]
-        return pattern.topic
-
-    def _extract_solution_pattern(self, pattern: IssuePattern) -> str:
-        """提取解决方案模式"""
-        # 基于问题主题提供通用建议
-        solutions = {
-            "默认": "1. 仔细分析问题根因\n2. 检查相关配置和代码\n3. 采用系统化方法进行修复\n4. 验证修复效果",
-            "数据": "1. 检查数据源和数据格式\n2. 验证数据转换逻辑\n3. 确保数据一致性",
-            "代码": "1. 阅读相关代码\n2. 理解现有实现\n3. 进行有针对性的修改",
-            "配置": "1. 检查配置文件\n2. 验证配置项\n3. 确认配置生效"
-        }
-
-        for key, value in solutions.items():
-            if key in pattern.topic.lower():
-                return value
-
-        return solutions["默认"]
-
-    def _extract_tools_used(self, context: str) -> str:
-        """提取使用的工具"""
-        tools = []
-        if 'Read' in context:
-            tools.append('Read')
-        if 'Edit' in context:
-            tools.append('Edit')
-        if 'Write' in context:
-            tools.append('Write')
-        if 'Bash' in context:
-            tools.append('Bash')
-
-        return ', '.join(tools) if tools else '标准工具'
-
-    def _get_first_attempt(self, pattern: IssuePattern, context: str) -> str:
-        """获取第一次尝试"""
-        if pattern.user_messages:
-            return pattern.user_messages[0]['content']
-        return "未找到首次尝试记录"
-
-    def _get_last_attempt(self, pattern: IssuePattern, context: str) -> str:
-        """获取最后一次尝试"""
-        if pattern.user_messages:
-            return pattern.user_messages[-1]['content']
-        return "未找到最后尝试记录"
-
-    def _sanitize_topic(self, topic: str) -> str:
-        """清理主题字符串"""
-        import re
-        sanitized = re.sub(r'[^\w\u4e00-\u9fff-]', '-', topic)
-        return sanitized[:50]
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Skill Metadata for Continuous Learning
+
+技能文件的 YAML frontmatter 读写
+- 生成的技能以 "---" 包围的 frontmatter 开头，每行一个 "键: 值"
+- 只解析这种单行键值格式（列表写作 [a, b]），不依赖 PyYAML
+- 写回时保持原有键的顺序和未修改的值，新键追加在末尾
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+
+FRONT_MATTER_DELIMITER = '---'
+
+_KEY_PATTERN = re.compile(r'^([A-Za-z_][\w-]*):\s*(.*?)\s*$')
+_VERSION_PATTERN = re.compile(r'^(\d+)\.(\d+)\.(\d+)$')
+
+
+def split_front_matter(content: str) -> Tuple[Dict[str, str], str]:
+    """拆分 frontmatter 和正文
+
+    Returns:
+        (键到原始值的有序字典, 正文)；没有 frontmatter 时字典为空，正文为全部内容
+    """
+    lines = content.split('\n')
+    if not lines or lines[0].strip() != FRONT_MATTER_DELIMITER:
+        return {}, content
+    meta: Dict[str, str] = {}
+    for index, line in enumerate(lines[1:], 1):
+        if line.strip() == FRONT_MATTER_DELIMITER:
+            return meta, '\n'.join(lines[index + 1:]).lstrip('\n')
+        match = _KEY_PATTERN.match(line)
+        if match:
+            meta[match.group(1)] = match.group(2)
+    # 没有结束分隔行，不是 frontmatter
+    return {}, content
+
+
+def join_front_matter(meta: Dict[str, str], body: str) -> str:
+    """由 frontmatter 和正文组成技能文件内容"""
+    if not meta:
+        return body
+    header = '\n'.join(f"{key}: {value}" for key, value in meta.items())
+    return f"{FRONT_MATTER_DELIMITER}\n{header}\n{FRONT_MATTER_DELIMITER}\n\n{body}"
+
+
+def write_skill_file(path: Path, content: str):
+    """写入技能文件（先写临时文件再替换）"""
+    tmp_file = path.with_name(path.name + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_file, path)
+
+
+def parse_list(value: str) -> List[str]:
+    """解析 [a, b] 形式的列表值"""
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        value = value[1:-1]
+    return [item.strip().strip('\'"') for item in value.split(',') if item.strip()]
+
+
+def format_list(items: Iterable[str]) -> str:
+    return '[' + ', '.join(items) + ']'
+
+
+def merge_list(value: str, items: Iterable[str]) -> str:
+    """把 items 中不在列表值里的项追加到末尾"""
+    merged = parse_list(value)
+    for item in items:
+        if item not in merged:
+            merged.append(item)
+    return format_list(merged)
+
+
+def parse_int(value: str, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def bump_version(version: str) -> str:
+    """版本号的修订号加一，无法解析时返回 1.0.1"""
+    match = _VERSION_PATTERN.match(version.strip())
+    if not match:
+        return '1.0.1'
+    major, minor, patch = (int(part) for part in match.groups())
+    return f"{major}.{minor}.{patch + 1}"
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+State Store for Continuous Learning
+
+对话处理状态的持久化 - 记录每个对话文件已处理的行数和生成的技能
+- 批量写入：更新先保存在内存中，距上次写入超过 flush_interval 秒或进程退出时才写入
+- 写入时加文件锁，重新读取文件并合并本进程的更新，并发运行不会互相覆盖
+- JSON 后端先写临时文件再替换，中途退出不会留下半个文件
+- 可选 SQLite 后端，由数据库自身的事务保证一致性；首次使用时导入已有的 JSON 状态
+"""
+
+import atexit
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from models import ConversationState
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，状态文件写入退化为无锁（仍是原子替换）
+    fcntl = None
+
+try:
+    import sqlite3
+except ImportError:
+    # 部分精简的 Python 发行版没有 sqlite3，回退到 JSON 后端
+    sqlite3 = None
+
+
+BACKEND_JSON = 'json'
+BACKEND_SQLITE = 'sqlite'
+
+# 默认的写入间隔（秒），0 表示每次更新都立即写入
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+def _merge(disk: Dict[str, ConversationState], updates: Dict[str, ConversationState],
+           new_skills: Dict[str, List[Dict]]):
+    """把本进程的更新合并到文件中的最新状态
+
+    处理行数和分析时间以本进程为准，生成的技能追加到文件中已有的记录之后。
+    """
+    for name, update in updates.items():
+        state = disk.setdefault(name, ConversationState())
+        state.last_line = update.last_line
+        state.last_analyzed = update.last_analyzed
+        if not state.first_analyzed or (update.first_analyzed and update.first_analyzed < state.first_analyzed):
+            state.first_analyzed = update.first_analyzed
+        state.skills_generated.extend(new_skills.get(name, []))
+
+
+class _JsonBackend:
+    """JSON 文件后端"""
+
+    def __init__(self, state_file: Path):
+        self.state_file = state_file
+        self.lock_file = state_file.with_name(state_file.name + '.lock')
+
+    def load(self) -> Dict[str, ConversationState]:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {name: ConversationState(**state) for name, state in data.items()}
+        except Exception as e:
+            print(f"警告: 无法加载状态文件: {e}")
+            return {}
+
+    def save(self, updates: Dict[str, ConversationState],
+             new_skills: Dict[str, List[Dict]]) -> Dict[str, ConversationState]:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            states = self.load()
+            _merge(states, updates, new_skills)
+
+            tmp_file = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({name: state.__dict__ for name, state in states.items()},
+                          f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_file, self.state_file)
+        return states
+
+
+class _SqliteBackend:
+    """SQLite 后端"""
+
+    def __init__(self, db_file: Path, import_file: Path = None):
+        self.db_file = db_file
+        self.import_file = import_file
+
+    def _connect(self):
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        created = not self.db_file.exists()
+        conn = sqlite3.connect(str(self.db_file), timeout=10)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "name TEXT PRIMARY KEY, last_line INTEGER NOT NULL DEFAULT 0, "
+            "first_analyzed TEXT NOT NULL DEFAULT '', last_analyzed TEXT NOT NULL DEFAULT '')"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS skills ("
+            "conversation TEXT NOT NULL, name TEXT NOT NULL, "
+            "generated_at TEXT NOT NULL, processed_line INTEGER NOT NULL)"
+        )
+        if created and self.import_file is not None and self.import_file.exists():
+            # 首次使用时导入已有的 JSON 状态
+            legacy = _JsonBackend(self.import_file).load()
+            self._write(conn, legacy, {name: state.skills_generated for name, state in legacy.items()})
+            conn.commit()
+        return conn
+
+    def load(self) -> Dict[str, ConversationState]:
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print(f"警告: 无法加载状态数据库: {e}")
+            return {}
+        try:
+            return self._read(conn)
+        finally:
+            conn.close()
+
+    def save(self, updates: Dict[str, ConversationState],
+             new_skills: Dict[str, List[Dict]]) -> Dict[str, ConversationState]:
+        conn = self._connect()
+        try:
+            with conn:
+                self._write(conn, updates, new_skills)
+            return self._read(conn)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _read(conn) -> Dict[str, ConversationState]:
+        states = {}
+        for name, last_line, first_analyzed, last_analyzed in conn.execute(
+                "SELECT name, last_line, first_analyzed, last_analyzed FROM conversations"):
+            states[name] = ConversationState(last_line, [], first_analyzed, last_analyzed)
+        for conversation, name, generated_at, processed_line in conn.execute(
+                "SELECT conversation, name, generated_at, processed_line FROM skills ORDER BY rowid"):
+            if conversation in states:
+                states[conversation].skills_generated.append({
+                    'name': name,
+                    'generated_at': generated_at,
+                    'processed_line': processed_line
+                })
+        return states
+
+    @staticmethod
+    def _write(conn, updates: Dict[str, ConversationState], new_skills: Dict[str, List[Dict]]):
+        for name, state in updates.items():
+            # 旧版本 SQLite 不支持 UPSERT，先插入再更新
+            conn.execute(
+                "INSERT OR IGNORE INTO conversations (name, first_analyzed) VALUES (?, ?)",
+                (name, state.first_analyzed)
+            )
+            conn.execute(
+                "UPDATE conversations SET last_line = ?, last_analyzed = ?, "
+                "first_analyzed = CASE WHEN first_analyzed = '' THEN ? ELSE first_analyzed END "
+                "WHERE name = ?",
+                (state.last_line, state.last_analyzed, state.first_analyzed, name)
+            )
+        conn.executemany(
+            "INSERT INTO skills (conversation, name, generated_at, processed_line) VALUES (?, ?, ?, ?)",
+            [(name, skill['name'], skill['generated_at'], skill['processed_line'])
+             for name, skills in new_skills.items() for skill in skills]
+        )
+
+
+class StateStore:
+    """对话处理状态
+
+    Args:
+        state_file: 状态文件路径；SQLite 后端使用同名的 .db 文件
+        backend: BACKEND_JSON 或 BACKEND_SQLITE
+        flush_interval: 写入间隔（秒），0 表示每次更新都立即写入
+    """
+
+    def __init__(self, state_file: Path, backend: str = BACKEND_JSON,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.state_file = Path(state_file)
+        self.flush_interval = flush_interval
+        if backend == BACKEND_SQLITE and sqlite3 is None:
+            print("警告: 当前 Python 不支持 sqlite3，使用 JSON 状态文件")
+            backend = BACKEND_JSON
+        if backend == BACKEND_SQLITE:
+            self._backend = _SqliteBackend(self.state_file.with_suffix('.db'), self.state_file)
+        else:
+            self._backend = _JsonBackend(self.state_file)
+
+        self.conversations: Dict[str, ConversationState] = self._backend.load()
+        self._dirty = set()
+        self._new_skills: Dict[str, List[Dict]] = {}
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def get_last_line(self, conversation_file_name: str) -> int:
+        """获取指定对话文件上次处理的行数"""
+        state = self.conversations.get(conversation_file_name)
+        return state.last_line if state is not None else 0
+
+    def update(self, conversation_file_name: str, line_number: int, skill_name: str = ''):
+        """更新指定对话文件的处理行数
+
+        Args:
+            conversation_file_name: 对话文件名
+            line_number: 已处理的行数
+            skill_name: 生成的技能名称，没有生成技能时为空
+        """
+        now = datetime.now().isoformat()
+        state = self.conversations.setdefault(conversation_file_name, ConversationState())
+        state.last_line = line_number
+        state.last_analyzed = now
+        if not state.first_analyzed:
+            state.first_analyzed = now
+
+        if skill_name:
+            skill = {'name': skill_name, 'generated_at': now, 'processed_line': line_number}
+            state.skills_generated.append(skill)
+            self._new_skills.setdefault(conversation_file_name, []).append(skill)
+
+        self._dirty.add(conversation_file_name)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """写入尚未保存的更新"""
+        if not self._dirty:
+            return
+        updates = {name: self.conversations[name] for name in self._dirty}
+        try:
+            self.conversations = self._backend.save(updates, self._new_skills)
+            self._dirty.clear()
+            self._new_skills = {}
+        except Exception as e:
+            print(f"警告: 无法保存状态文件: {e}")
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """写入更新并取消退出时的写入"""
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def __enter__(self) -> 'StateStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_summary(self) -> Dict[str, int]:
+        """获取状态摘要"""
+        return {
+            'total_conversations': len(self.conversations),
+            'total_skills': sum(len(state.skills_generated) for state in self.conversations.values())
+        }
@@ -16,12 +16,18 @@ from datetime import datetime
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
-from models import LearnedSkill, sanitize_topic
+from models import IssuePattern, LearnedSkill, sanitize_topic
 from config import get_config, DEFAULT_CONFIG_PATH
 from state_manager import StateManager
 from conversation_reader import ConversationReader
 from issue_analyzer import IssueAnalyzer
+from issue_clustering import IssueClusterer
+from recurrence_store import RecurrenceStore
+from retry_policy import MAX_PENDING_ATTEMPTS, RetryPolicy, RetryStore
+from skill_eviction import SkillEvictor, record_usage, restore_skill
+from skill_fingerprint import SkillDeduplicator, dedupe_skills
 from skill_generator import SkillGenerator
+from tool_usage import scan_range
 
 
 def get_project_root() -> Path:
@@ -56,6 +62,110 @@ def get_python_command() -> str:
     return 'python3.9'
 
 
+def collect_recurring_patterns(store: RecurrenceStore, patterns, session_id: str, run_key: str,
+                               threshold: int):
+    """把本次检测到的问题计入复现记录，返回累计次数达到阈值、需要生成技能的问题
+
+    run_key 是本次分析的起始位置，同一段内容重复分析时不会重复累计。
+
+    Returns:
+        (问题模式, 复现记录) 列表，问题模式使用记录中的主题和累计次数
+    """
+    due = []
+    seen = set()
+    for pattern in patterns:
+        record = store.record(pattern, session_id, run_key)
+        print(f"问题 \"{record.topic[:50]}\" 累计出现 {record.count} 次，涉及 {len(record.sessions)} 个会话")
+        if record.fingerprint in seen or not store.is_due(record, threshold):
+            continue
+        seen.add(record.fingerprint)
+        due.append((IssuePattern(
+            topic=record.topic,
+            occurrences=record.count,
+            first_line=pattern.first_line,
+            last_line=pattern.last_line,
+            keywords=pattern.keywords,
+            user_messages=pattern.user_messages,
+            tools=pattern.tools
+        ), record))
+    store.save()
+    return due
+
+
+def detect_candidates(config, entries, recurrence_store, session_id):
+    """分析新的对话内容，返回需要生成技能的问题
+
+    Returns:
+        (问题模式, 复现记录) 列表，未启用跨会话累计时复现记录为 None
+    """
+    clusterer = None
+    if config.clustering:
+        clusterer = IssueClusterer(config.clustering_threshold, config.clustering_ngram_size)
+
+    threshold = config.retry_threshold
+    if recurrence_store is not None:
+        threshold = min(config.session_min_occurrences, config.retry_threshold)
+
+    analyzer = IssueAnalyzer(threshold, config.keywords, clusterer)
+    patterns = analyzer.analyze(entries)
+
+    print(f"\n检测到 {len(patterns)} 个反复修复模式")
+
+    # 修复过程中的工具调用摘要随问题一起提供给模型
+    for pattern in patterns:
+        pattern.tools = scan_range(entries, pattern.first_line, pattern.last_line).summary()
+
+    if recurrence_store is not None:
+        # 对话文件清空后行号从头开始，起始位置同时包含行号和时间
+        run_key = f"{entries[0].line_number}@{entries[0].timestamp}"
+        return collect_recurring_patterns(
+            recurrence_store, patterns, session_id or entries[0].timestamp, run_key, config.retry_threshold
+        )
+    return [(pattern, None) for pattern in patterns]
+
+
+def run_dedupe(skills_dir: Path, max_distance: int, dry_run: bool) -> int:
+    """合并技能目录中已有的近似重复技能"""
+    if not skills_dir.exists():
+        print(f"技能目录不存在: {skills_dir}")
+        return 0
+    print(f"技能目录: {skills_dir}（最大指纹距离 {max_distance}）")
+    groups = dedupe_skills(skills_dir, max_distance, dry_run)
+    merged = sum(len(paths) for paths in groups.values())
+    if not merged:
+        print("没有近似重复的技能")
+    elif dry_run:
+        print(f"\n{merged} 个技能将合并到 {len(groups)} 个技能（未修改文件）")
+    else:
+        print(f"\n已将 {merged} 个技能合并到 {len(groups)} 个技能")
+    return 0
+
+
+def create_evictor(config, project_root: Path) -> SkillEvictor:
+    return SkillEvictor(
+        project_root / config.skills_output_dir,
+        project_root / config.skill_archive_file,
+        config.skill_max_count,
+        config.skill_max_bytes,
+        config.skill_max_idle_days,
+        config.skill_eviction_policy
+    )
+
+
+def run_eviction(evictor: SkillEvictor, dry_run: bool = False) -> int:
+    """按上限归档冷门技能"""
+    evicted = evictor.evict(dry_run)
+    for info in evicted:
+        print(f"  - {info.path.name}（最近使用 {info.last_used_text}，使用 {info.hits} 次，{info.size} 字节）")
+    if not evicted:
+        print("技能数量和大小未超过上限，无需归档")
+    elif dry_run:
+        print(f"{len(evicted)} 个技能将归档到 {evictor.archive_file}（未修改文件）")
+    else:
+        print(f"已将 {len(evicted)} 个技能归档到 {evictor.archive_file}")
+    return 0
+
+
 def main():
     """主函数"""
     project_root = get_project_root()
@@ -66,13 +176,32 @@ def main():
     parser.add_argument('--conversation-file', type=str, help='对话文件路径')
     parser.add_argument('--max-conversations', type=int, help='读取的最大对话条数')
     parser.add_argument('--config', type=str, help='配置文件路径')
+    parser.add_argument('--clustering', action='store_true', help='在整个对话历史中按语义相似度聚类查找反复问题')
+    parser.add_argument('--session-id', type=str, help='会话标识，用于跨会话累计问题出现次数')
+    parser.add_argument('--dedupe-skills', action='store_true', help='合并技能目录中已有的近似重复技能后退出')
+    parser.add_argument('--evict-skills', action='store_true', help='按配置的上限归档冷门技能后退出')
+    parser.add_argument('--restore-skill', type=str, metavar='NAME', help='从归档中恢复技能后退出')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='与 --dedupe-skills 或 --evict-skills 一起使用，只列出将要合并或归档的技能')
 
     args = parser.parse_args()
 
     # 加载配置
     config_file = Path(args.config) if args.config else DEFAULT_CONFIG_PATH
     config = get_config(config_file)
-    config = config.from_args(vars(args))
+    config = config.from_args(vars(args), config)
+
+    if args.dedupe_skills:
+        return run_dedupe(project_root / config.skills_output_dir, config.skill_dedupe_distance, args.dry_run)
+    if args.evict_skills:
+        return run_eviction(create_evictor(config, project_root), args.dry_run)
+    if args.restore_skill:
+        restored = restore_skill(project_root / config.skill_archive_file, args.restore_skill,
+                                 project_root / config.skills_output_dir)
+        if restored is None:
+            return 1
+        print(f"已恢复技能: {restored}")
+        return 0
 
     # 获取对话文件
     conversation_file = get_conversation_file(args)
@@ -80,7 +209,7 @@ def main():
 
     # 初始化状态管理器
     state_file = project_root / config.state_file
-    state_manager = StateManager(state_file)
+    state_manager = StateManager(state_file, config.state_backend, config.state_flush_interval)
 
     # 显示状态摘要
     summary = state_manager.get_summary()
@@ -92,78 +221,171 @@ def main():
     print("=" * 60)
 
     # 读取对话
-    reader = ConversationReader(conversation_file, config.max_conversations)
+    # 聚类需要在全部未处理的对话中查找相隔较远的同一问题，不受 max_conversations 限制
+    max_entries = sys.maxsize if config.clustering else config.max_conversations
+    reader = ConversationReader(conversation_file, max_entries)
     conversation_name = conversation_file.name
     from_line = state_manager.get_last_processed_line(conversation_name)
 
-    entries = reader.read_latest(from_line)
+    state = state_manager.state.get(conversation_name)
+    entries = reader.read_latest(from_line, state.last_analyzed if state is not None else '')
 
-    if not entries:
+    # 记录新对话中提到的技能，用于淘汰冷门技能
+    output_dir = project_root / config.skills_output_dir
+    used_skills = record_usage(output_dir, entries)
+    if used_skills:
+        print(f"对话中使用了 {len(used_skills)} 个技能: {', '.join(used_skills)}")
+
+    # 上次生成失败的问题
+    retry_store = RetryStore(
+        project_root / config.retry_file,
+        config.circuit_failure_threshold,
+        config.circuit_cooldown
+    )
+    pending = retry_store.pending.take()
+    if pending:
+        print(f"\n待重试队列中有 {len(pending)} 个问题")
+
+    if not entries and not pending:
         print("\n没有新的对话内容需要分析")
         return 0
 
-    # 构建对话上下文
-    context_lines = []
-    for entry in entries:
-        context_lines.append(f"{entry.timestamp} {entry.sender}> {entry.content}")
-    conversation_context = '\n'.join(context_lines)
-
-    # 分析问题
-    analyzer = IssueAnalyzer(config.retry_threshold, config.keywords)
-    patterns = analyzer.analyze(entries)
-
-    print(f"\n检测到 {len(patterns)} 个反复修复模式")
+    recurrence_store = None
+    if config.recurrence_tracking:
+        # 跨会话累计：单个会话内出现较少次数的问题也先记录下来，由累计次数触发技能生成
+        recurrence_store = RecurrenceStore(
+            project_root / config.recurrence_file,
+            config.clustering_threshold,
+            config.clustering_ngram_size,
+            ignore_words=[word for words in config.keywords.values() for word in words]
+        )
+
+    # 需要生成技能的问题: (问题模式, 复现记录)
+    candidates = []
+    last_line = None
+    if entries:
+        candidates = detect_candidates(config, entries, recurrence_store, args.session_id)
+        last_line = reader.get_line_number_of_last_user_message(entries)
+        if recurrence_store is not None:
+            # 新数据已计入复现记录，下次只分析之后的内容
+            state_manager.update_last_processed_line(conversation_name, last_line, '')
+    else:
+        print("\n没有新的对话内容需要分析")
 
-    if not patterns:
+    # (问题模式, 对话片段, 复现记录, 已失败的运行次数)
+    items = []
+    for pattern, record in candidates:
+        # 提取对话片段（此时才解码消息内容）；跨会话累计的问题使用各会话保存的消息
+        snippets = record.samples if record is not None else pattern.message_snippets()
+        items.append((pattern, snippets, record, 0))
+    # 待重试的问题排在后面，与本次检测到的问题重复时以本次为准
+    topics = {pattern.topic for pattern, _ in candidates}
+    for pattern, snippets, fingerprint, attempts in pending:
+        if pattern.topic not in topics:
+            record = recurrence_store.records.get(fingerprint) if recurrence_store is not None else None
+            items.append((pattern, snippets, record, attempts))
+
+    if not items:
         print("\n未检测到需要总结的反复修复模式")
-        print("需要用户反复要求修复同一个问题 >= 3 次")
+        print(f"需要用户反复要求修复同一个问题 >= {config.retry_threshold} 次")
         return 0
 
-    # 生成技能
-    output_dir = project_root / config.skills_output_dir
-    generator = SkillGenerator(output_dir)
-    generated_skills = []
-
-    for i, pattern in enumerate(patterns, 1):
+    for i, (pattern, _, _, attempts) in enumerate(items, 1):
         print(f"\n{'=' * 60}")
-        print(f"模式 {i}/{len(patterns)}")
+        print(f"模式 {i}/{len(items)}" + (f"（第 {attempts + 1} 次重试）" if attempts else ""))
         print(f"{'=' * 60}")
         print(f"问题: {pattern.topic[:100]}")
         print(f"修复次数: {pattern.occurrences}")
 
-        # 提取对话片段
-        conversation_snippets = [msg['content'] for msg in pattern.user_messages]
+    # 连续调用失败时暂停生成，问题留到下次运行
+    if not retry_store.breaker.allow():
+        print(f"\nclaude -p 连续调用失败，暂停生成技能（{retry_store.breaker.remaining()} 秒后恢复）")
+        for pattern, snippets, record, attempts in items:
+            retry_store.pending.add(pattern, snippets, record.fingerprint if record is not None else '', attempts)
+        retry_store.save()
+        print(f"{len(items)} 个问题已加入待重试队列")
+        if candidates and recurrence_store is None:
+            state_manager.update_last_processed_line(conversation_name, last_line, '')
+        return 0
 
-        # 生成技能
-        skill = generator.generate(pattern, conversation_snippets)
+    # 调用 claude -p 之前先把问题写入待重试队列，生成成功后再移除：
+    # 运行超时被 hook 终止时，已计入复现记录、已跳过的对话中的问题不会丢失
+    for pattern, snippets, record, attempts in items:
+        if attempts + 1 < MAX_PENDING_ATTEMPTS:
+            retry_store.pending.add(
+                pattern, snippets, record.fingerprint if record is not None else '', attempts + 1
+            )
+    retry_store.save()
+
+    # 生成技能，调用 claude -p 的总时间限制在 hook 的时限内
+    generator = SkillGenerator(
+        output_dir,
+        config.prompt_budget,
+        RetryPolicy(config.retry_max_attempts, config.retry_base_delay),
+        retry_store.breaker,
+        config.generation_time_budget
+    )
+    deduplicator = SkillDeduplicator(output_dir, config.skill_dedupe_distance) if config.skill_dedupe else None
+    generated_skills = []
 
+    # 生成技能：多个问题时打包进一次调用，减少模型调用次数
+    if config.batch_generation and len(items) > 1:
+        skills = generator.generate_batch([(pattern, snippets) for pattern, snippets, _, _ in items])
+    else:
+        skills = [generator.generate(pattern, snippets) for pattern, snippets, _, _ in items]
+
+    for (pattern, snippets, record, attempts), skill in zip(items, skills):
         if skill:
-            # 保存技能
-            skill_path = skill.save(output_dir)
+            # 保存技能，与已有技能近似重复时合并到已有技能
+            if deduplicator is not None:
+                merged = deduplicator.save(skill)
+            else:
+                skill.save(output_dir)
+                merged = False
+            skill_path = skill.file_path
             generated_skills.append((skill_path, skill.name))
-            print(f"已生成技能: {skill_path}")
+            print(f"{'已合并到技能' if merged else '已生成技能'}: {skill_path}")
+
+            retry_store.pending.remove(pattern.topic)
+            if record is not None:
+                recurrence_store.mark_skill(record, skill.name)
+                recurrence_store.save()
+        else:
+            # 生成失败的问题留在待重试队列，下次运行时优先重试
+            retry_store.pending.add(
+                pattern, snippets, record.fingerprint if record is not None else '', attempts + 1
+            )
 
-    # 更新状态
+    retry_store.save()
+    if len(retry_store.pending):
+        print(f"\n{len(retry_store.pending)} 个问题生成失败，已加入待重试队列")
+
+    # 更新状态：失败的问题已进入待重试队列，不必重新分析这部分对话
+    if candidates and recurrence_store is None:
+        state_manager.update_last_processed_line(conversation_name, last_line, '')
+    processed_line = state_manager.get_last_processed_line(conversation_name)
     if generated_skills:
-        last_line = reader.get_line_number_of_last_user_message(entries)
         for skill_path, skill_name in generated_skills:
             state_manager.update_last_processed_line(
                 conversation_name,
-                last_line,
+                processed_line,
                 skill_name
             )
 
         # 总结
         print(f"\n{'=' * 60}")
         print(f"分析完成! 共生成 {len(generated_skills)} 个技能")
-        print(f"已更新处理位置到第 {last_line} 行")
+        print(f"已更新处理位置到第 {processed_line} 行")
         print(f"{'=' * 60}")
 
         for skill_path, _ in generated_skills:
             print(f"  - {skill_path}")
 
-    return 0
+        # 新技能加入后按上限归档冷门技能
+        print()
+        run_eviction(create_evictor(config, project_root))
 
+    return 0
 
 if __name__ == '__main__':
     sys.exit(main())
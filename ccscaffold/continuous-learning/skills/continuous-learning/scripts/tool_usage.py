@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tool Usage for Continuous Learning
+
+工具调用统计 - 从 chat-record 记录的工具调用中统计使用情况
+- chat-record 的记录格式为 "时间 claude> Tool: 名称"，后接以空白开头的 Input/Output 续行
+- 只按行首的 "Tool:" 标记识别工具调用，一次线性扫描，不对回复内容做回溯匹配
+- 统计每个工具的调用次数、调用顺序，以及输出中带有失败标记的调用
+"""
+
+import re
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from models import ConversationEntry
+
+
+TOOL_PREFIX = 'Tool:'
+
+# 工具输出中的失败标记；不匹配 "is_error": false 之类的字段名
+_FAILURE_WORDS = r'(?<!is_)error|exception|traceback|failed|failure|denied|not found|exit code [1-9]|错误|失败|异常'
+_FAILURE_PATTERN_BYTES = re.compile(_FAILURE_WORDS.encode('utf-8'), re.IGNORECASE)
+
+# 文件操作类工具
+FILE_TOOLS = ('Read', 'Write', 'Edit', 'MultiEdit', 'NotebookEdit', 'Grep', 'Glob')
+
+
+class ToolUsage:
+    """工具调用统计
+
+    Attributes:
+        counts: 每个工具的调用次数
+        sequence: 按时间顺序的工具调用
+        failures: 每个工具输出中带有失败标记的调用次数
+    """
+
+    __slots__ = ('counts', 'sequence', 'failures')
+
+    def __init__(self):
+        self.counts = Counter()
+        self.sequence: List[str] = []
+        self.failures = Counter()
+
+    def __repr__(self) -> str:
+        return f"ToolUsage(counts={dict(self.counts)!r}, failures={dict(self.failures)!r})"
+
+    def __bool__(self) -> bool:
+        return bool(self.sequence)
+
+    def add(self, name: str, failed: bool = False):
+        self.counts[name] += 1
+        self.sequence.append(name)
+        if failed:
+            self.failures[name] += 1
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        return self.counts.most_common(n)
+
+    def transitions(self) -> Counter:
+        """相邻两次调用的工具对出现次数，如 (Edit, Bash)"""
+        return Counter(zip(self.sequence, self.sequence[1:]))
+
+    def file_operations(self) -> List[str]:
+        """按顺序的文件操作类调用"""
+        return [name for name in self.sequence if name in FILE_TOOLS]
+
+    def summary(self, n: int = 5) -> str:
+        """调用次数最多的工具和反复出现的相邻调用，用于提示词；没有调用时返回空字符串"""
+        if not self:
+            return ''
+        text = '、'.join(
+            f"{name} {count} 次" + (f"（{self.failures[name]} 次失败）" if self.failures[name] else '')
+            for name, count in self.most_common(n)
+        )
+        repeated = [f"{first} → {second}" for (first, second), count in self.transitions().most_common(3)
+                    if count > 1]
+        if repeated:
+            text += f"；常见顺序: {', '.join(repeated)}"
+        return text
+
+
+def tool_name(entry: ConversationEntry) -> Optional[str]:
+    """工具调用条目的工具名，不是工具调用时返回 None
+
+    只解码条目的第一行，不解码工具的输入输出。
+    """
+    buffer = entry.buffer
+    end = min(buffer.line_end(entry.offset), entry.offset + entry.length)
+    first_line = buffer.text(entry.offset, end - entry.offset).strip()
+    if not first_line.startswith(TOOL_PREFIX):
+        return None
+    return first_line[len(TOOL_PREFIX):].strip() or None
+
+
+def entry_failed(entry: ConversationEntry) -> bool:
+    """工具调用条目的输出中是否有失败标记
+
+    在共享缓冲区上直接匹配字节，不解码、不复制输出内容。
+    """
+    buffer = entry.buffer
+    start = buffer.data.find(b'Output:', entry.offset, entry.offset + entry.length)
+    if start == -1:
+        return False
+    return _FAILURE_PATTERN_BYTES.search(buffer.view[start:entry.offset + entry.length]) is not None
+
+
+def scan_entries(entries: Iterable[ConversationEntry]) -> ToolUsage:
+    """从对话条目中统计工具调用"""
+    usage = ToolUsage()
+    for entry in entries:
+        if entry.sender == 'user':
+            continue
+        name = tool_name(entry)
+        if name is not None:
+            usage.add(name, entry_failed(entry))
+    return usage
+
+
+def scan_range(entries: Iterable[ConversationEntry], first_line: int, last_line: int) -> ToolUsage:
+    """统计一个问题修复过程中的工具调用
+
+    从第一条相关消息开始，到最后一条相关消息之后的下一条用户消息为止（含最后一次修复的调用）。
+    """
+    selected = []
+    for entry in entries:
+        if entry.line_number < first_line:
+            continue
+        if entry.line_number > last_line and entry.sender == 'user':
+            break
+        selected.append(entry)
+    return scan_entries(selected)
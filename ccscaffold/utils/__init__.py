@@ -29,6 +29,35 @@ from .platform import (
     get_config_directory
 )
 
+from .fileops import (
+    SyncStats,
+    SourceCache,
+    files_identical,
+    sync_file,
+    sync_tree,
+    staged_install,
+    rollback,
+    list_snapshots,
+    latest_snapshot_name,
+    new_snapshot_name
+)
+
+from .settings_merge import (
+    CCSCAFFOLD_HOOK_MARKERS,
+    STOP_HOOK_TIMEOUT,
+    apply_settings,
+    merge_hooks,
+    merge_settings,
+    settings_diff
+)
+
+from .fleet import (
+    FleetResult,
+    expand_targets,
+    run_fleet,
+    print_fleet_report
+)
+
 from .config import (
     Config,
     get_config,
@@ -58,6 +87,30 @@ __all__ = [
     'normalize_path',
     'get_home_directory',
     'get_config_directory',
+    # 文件复制
+    'SyncStats',
+    'SourceCache',
+    'files_identical',
+    'sync_file',
+    'sync_tree',
+    # 暂存安装与回滚
+    'staged_install',
+    'rollback',
+    'list_snapshots',
+    'latest_snapshot_name',
+    'new_snapshot_name',
+    # settings.json 合并
+    'CCSCAFFOLD_HOOK_MARKERS',
+    'STOP_HOOK_TIMEOUT',
+    'apply_settings',
+    'merge_hooks',
+    'merge_settings',
+    'settings_diff',
+    # 批量部署
+    'FleetResult',
+    'expand_targets',
+    'run_fleet',
+    'print_fleet_report',
     # 配置管理
     'Config',
     'get_config',
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-Scaffold 文件复制工具模块
+提供部署和安装脚本共用的目录同步功能：
+- 多线程并行复制文件
+- Linux 下使用 copy_file_range/sendfile 在内核中直接复制，避免用户态缓冲
+- 大小、修改时间或内容哈希一致的文件直接跳过
+- 源目录快照：一次读取并哈希源文件，批量部署到多个目标时复用
+- 暂存安装：先在同级暂存目录中完成同步，再通过重命名切换，旧版本以硬链接快照保留
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+
+# 默认复制线程数，文件复制以 I/O 为主，线程数可以多于 CPU 核数
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# 单次 copy_file_range 调用的最大字节数
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+# 哈希比较时的读取块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 每个安装目录保留的历史版本快照数量
+DEFAULT_KEEP_SNAPSHOTS = 3
+
+# 快照名称格式，同一次安装的所有目录使用相同名称，回滚时按名称整体回退
+SNAPSHOT_NAME_FORMAT = '%Y%m%d-%H%M%S-%f'
+
+# 与 shutil.copytree 的 ignore 参数兼容: ignore(目录, 文件名列表) -> 需要忽略的名称集合
+IgnoreFunc = Callable[[str, List[str]], Iterable[str]]
+
+
+class SyncStats:
+    """目录同步结果统计"""
+
+    def __init__(self):
+        self.copied = 0
+        self.skipped = 0
+        self.removed = 0
+
+    def merge(self, other: 'SyncStats') -> 'SyncStats':
+        """累加另一次同步的结果"""
+        self.copied += other.copied
+        self.skipped += other.skipped
+        self.removed += other.removed
+        return self
+
+    def __str__(self) -> str:
+        return f"复制 {self.copied} 个, 跳过 {self.skipped} 个, 删除 {self.removed} 个"
+
+
+def file_digest(path: Path) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def files_identical(src: Path, dst: Path, src_stat: Optional[os.stat_result] = None) -> bool:
+    """判断目标文件是否与源文件相同
+
+    依次比较大小、修改时间和内容哈希，大小不同或修改时间相同时不读取文件内容。
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    src_stat = src_stat or os.stat(src)
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return True
+    return file_digest(src) == file_digest(dst)
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    """使用 copy_file_range 复制，支持时可在文件系统内直接共享数据块"""
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied == size
+
+
+def copy_file_fast(src: Path, dst: Path) -> None:
+    """复制文件内容和元数据
+
+    Linux 下优先使用 copy_file_range，不支持时（如跨文件系统的旧内核）回退到
+    shutil.copyfile，后者在 Linux 上使用 sendfile、在 macOS 上使用 fcopyfile。
+    先写入临时文件再原子替换，正在运行的 hook 不会读到写了一半的脚本。
+    """
+    tmp_dst = dst.with_name(f".{dst.name}.tmp")
+    copied = False
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(tmp_dst, 'wb') as fdst:
+                copied = _copy_file_range(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size)
+        except OSError:
+            copied = False
+    if not copied:
+        shutil.copyfile(src, tmp_dst)
+    shutil.copystat(src, tmp_dst)
+    os.replace(tmp_dst, dst)
+
+
+def _sync_one(src: Path, dst: Path) -> bool:
+    """同步单个文件，返回是否发生了复制"""
+    src_stat = os.stat(src)
+    if files_identical(src, dst, src_stat):
+        dst_stat = os.stat(dst)
+        if src_stat.st_mtime_ns != dst_stat.st_mtime_ns:
+            # 内容相同但修改时间不同，同步时间以便下次直接跳过；
+            # 暂存目录中的文件与现有安装和快照是硬链接，原地修改元数据会波及它们，改为替换文件
+            if dst_stat.st_nlink > 1:
+                copy_file_fast(src, dst)
+            else:
+                shutil.copystat(src, dst)
+        return False
+    if dst.is_dir():
+        shutil.rmtree(dst)
+    copy_file_fast(src, dst)
+    return True
+
+
+def sync_file(src: Path, dst: Path) -> bool:
+    """复制单个文件，目标已相同时跳过
+
+    Returns:
+        是否发生了复制
+    """
+    src, dst = Path(src), Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    return _sync_one(src, dst)
+
+
+def _collect_files(src: Path, ignore: Optional[IgnoreFunc]) -> Tuple[List[str], List[str]]:
+    """列出源目录下的子目录和文件（相对路径）"""
+    dirs, files = [], []
+    for dirpath, dirnames, filenames in os.walk(src, followlinks=True):
+        rel_dir = os.path.relpath(dirpath, src)
+        rel_dir = '' if rel_dir == '.' else rel_dir
+        if ignore is not None:
+            ignored = set(ignore(dirpath, dirnames + filenames))
+            dirnames[:] = [name for name in dirnames if name not in ignored]
+            filenames = [name for name in filenames if name not in ignored]
+        dirs.extend(os.path.join(rel_dir, name) for name in dirnames)
+        files.extend(os.path.join(rel_dir, name) for name in filenames)
+    return dirs, files
+
+
+def _remove_extra(dst: Path, keep_dirs: Set[str], keep_files: Set[str],
+                  ignore: Optional[IgnoreFunc]) -> int:
+    """删除目标目录中源目录没有的文件和目录，被 ignore 匹配的条目保留"""
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(dst, topdown=True):
+        rel_dir = os.path.relpath(dirpath, dst)
+        rel_dir = '' if rel_dir == '.' else rel_dir
+        ignored = set(ignore(dirpath, dirnames + filenames)) if ignore is not None else set()
+        for name in list(dirnames):
+            rel_path = os.path.join(rel_dir, name)
+            if name in ignored:
+                dirnames.remove(name)
+            elif rel_path not in keep_dirs:
+                path = os.path.join(dirpath, name)
+                if os.path.islink(path):
+                    os.unlink(path)
+                else:
+                    shutil.rmtree(path)
+                dirnames.remove(name)
+                removed += 1
+        for name in filenames:
+            if name not in ignored and os.path.join(rel_dir, name) not in keep_files:
+                os.unlink(os.path.join(dirpath, name))
+                removed += 1
+    return removed
+
+
+def sync_tree(src: Path, dst: Path, ignore: Optional[IgnoreFunc] = None,
+              delete: bool = True, workers: Optional[int] = None) -> SyncStats:
+    """将源目录同步到目标目录，替代 rmtree + copytree
+
+    Args:
+        src: 源目录
+        dst: 目标目录
+        ignore: 与 shutil.copytree 相同的忽略函数，如 shutil.ignore_patterns('__pycache__')；
+            目标目录中被忽略的条目（如运行时生成的 state.json）不会被删除
+        delete: 是否删除目标目录中源目录没有的文件
+        workers: 复制线程数，默认 DEFAULT_WORKERS
+
+    Returns:
+        同步结果统计
+    """
+    src, dst = Path(src), Path(dst)
+    if not src.is_dir():
+        raise FileNotFoundError(f"源目录不存在: {src}")
+    stats = SyncStats()
+    dirs, files = _collect_files(src, ignore)
+
+    if dst.exists() and not dst.is_dir():
+        dst.unlink()
+    if delete and dst.exists():
+        stats.removed = _remove_extra(dst, set(dirs), set(files), ignore)
+
+    # 先串行创建目录，再并行复制文件
+    dst.mkdir(parents=True, exist_ok=True)
+    for rel_dir in dirs:
+        target = dst / rel_dir
+        if target.exists() and not target.is_dir():
+            target.unlink()
+        target.mkdir(exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_WORKERS) as executor:
+        results = executor.map(lambda rel: _sync_one(src / rel, dst / rel), files)
+        for copied in results:
+            if copied:
+                stats.copied += 1
+            else:
+                stats.skipped += 1
+    return stats
+
+
+class FileSnapshot:
+    """单个源文件的快照：内容、哈希和元数据只读取一次"""
+
+    def __init__(self, src: Path):
+        self.src = Path(src)
+        src_stat = os.stat(self.src)
+        with open(self.src, 'rb') as f:
+            self.data = f.read()
+        self.size = len(self.data)
+        self.mtime_ns = src_stat.st_mtime_ns
+        self.mode = src_stat.st_mode & 0o7777
+        self.digest = hashlib.sha256(self.data).hexdigest()
+
+    def sync_to(self, dst: Path) -> bool:
+        """写入目标文件，目标已相同时跳过
+
+        Returns:
+            是否发生了写入
+        """
+        dst = Path(dst)
+        try:
+            dst_stat = os.stat(dst)
+        except OSError:
+            dst_stat = None
+        if dst_stat is not None and dst_stat.st_size == self.size:
+            if dst_stat.st_mtime_ns == self.mtime_ns:
+                return False
+            if file_digest(dst) == self.digest:
+                # 硬链接的文件（暂存目录与现有安装、快照共享）替换而不是原地修改时间
+                if dst_stat.st_nlink > 1:
+                    self._write(dst)
+                else:
+                    os.utime(dst, ns=(self.mtime_ns, self.mtime_ns))
+                return False
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        if dst.is_dir():
+            shutil.rmtree(dst)
+        self._write(dst)
+        return True
+
+    def _write(self, dst: Path) -> None:
+        """先写入临时文件再原子替换目标文件"""
+        tmp_dst = dst.with_name(f".{dst.name}.tmp")
+        with open(tmp_dst, 'wb') as f:
+            f.write(self.data)
+        os.chmod(tmp_dst, self.mode)
+        os.utime(tmp_dst, ns=(self.mtime_ns, self.mtime_ns))
+        os.replace(tmp_dst, dst)
+
+
+class TreeSnapshot:
+    """源目录快照，可同步到任意多个目标目录而不重复读取源文件"""
+
+    def __init__(self, src: Path, ignore: Optional[IgnoreFunc] = None):
+        self.src = Path(src)
+        if not self.src.is_dir():
+            raise FileNotFoundError(f"源目录不存在: {self.src}")
+        self.ignore = ignore
+        self.dirs, rel_files = _collect_files(self.src, ignore)
+        self.files = {rel: FileSnapshot(self.src / rel) for rel in rel_files}
+
+    def sync_to(self, dst: Path, delete: bool = True, workers: Optional[int] = None) -> SyncStats:
+        """同步到目标目录，语义与 sync_tree 相同"""
+        dst = Path(dst)
+        stats = SyncStats()
+        if dst.exists() and not dst.is_dir():
+            dst.unlink()
+        if delete and dst.exists():
+            stats.removed = _remove_extra(dst, set(self.dirs), set(self.files), self.ignore)
+
+        dst.mkdir(parents=True, exist_ok=True)
+        for rel_dir in self.dirs:
+            target = dst / rel_dir
+            if target.exists() and not target.is_dir():
+                target.unlink()
+            target.mkdir(exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=workers or DEFAULT_WORKERS) as executor:
+            results = executor.map(lambda item: item[1].sync_to(dst / item[0]), self.files.items())
+            for copied in results:
+                if copied:
+                    stats.copied += 1
+                else:
+                    stats.skipped += 1
+        return stats
+
+
+class SourceCache:
+    """按路径缓存源快照，批量部署时所有目标共享同一份源数据（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._trees: Dict[Tuple[Path, Optional[IgnoreFunc]], TreeSnapshot] = {}
+        self._files: Dict[Path, FileSnapshot] = {}
+
+    def tree(self, src: Path, ignore: Optional[IgnoreFunc] = None) -> TreeSnapshot:
+        """获取目录快照，首次访问时读取
+
+        ignore 参与缓存键，共享快照时需传入同一个忽略函数对象。
+        """
+        key = (Path(src).resolve(), ignore)
+        with self._lock:
+            if key not in self._trees:
+                self._trees[key] = TreeSnapshot(key[0], ignore)
+            return self._trees[key]
+
+    def file(self, src: Path) -> FileSnapshot:
+        """获取文件快照，首次访问时读取"""
+        key = Path(src).resolve()
+        with self._lock:
+            if key not in self._files:
+                self._files[key] = FileSnapshot(key)
+            return self._files[key]
+
+
+T = TypeVar('T')
+
+
+def get_staging_dir(dst: Path) -> Path:
+    """获取安装目录的暂存目录（同级隐藏目录，保证重命名不跨文件系统）"""
+    dst = Path(dst)
+    return dst.with_name(f".{dst.name}.staging")
+
+
+def get_snapshots_dir(dst: Path) -> Path:
+    """获取安装目录的快照目录"""
+    dst = Path(dst)
+    return dst.with_name(f".{dst.name}.snapshots")
+
+
+def new_snapshot_name() -> str:
+    """生成快照名称，按字典序即时间顺序"""
+    return datetime.now().strftime(SNAPSHOT_NAME_FORMAT)
+
+
+def list_snapshots(dst: Path) -> List[Path]:
+    """列出安装目录的历史快照，按时间从旧到新"""
+    snapshots_dir = get_snapshots_dir(dst)
+    if not snapshots_dir.is_dir():
+        return []
+    return sorted(path for path in snapshots_dir.iterdir() if path.is_dir())
+
+
+def link_tree(src: Path, dst: Path) -> None:
+    """以硬链接复制目录树，不占用额外磁盘空间
+
+    文件系统不支持硬链接时（如 FAT）回退为普通复制。符号链接原样重建。
+    """
+    for dirpath, dirnames, filenames in os.walk(src):
+        target_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in list(dirnames):
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), os.path.join(target_dir, name))
+                dirnames.remove(name)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            target = os.path.join(target_dir, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), target)
+                continue
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+
+
+def _same_tree(a: Path, b: Path) -> bool:
+    """判断两个目录内容是否相同，共享 inode 的文件不读取内容"""
+    dirs_a, files_a = _collect_files(a, None)
+    dirs_b, files_b = _collect_files(b, None)
+    if set(dirs_a) != set(dirs_b) or set(files_a) != set(files_b):
+        return False
+    for rel in files_a:
+        stat_a, stat_b = os.stat(os.path.join(a, rel)), os.stat(os.path.join(b, rel))
+        if (stat_a.st_ino, stat_a.st_dev) == (stat_b.st_ino, stat_b.st_dev):
+            continue
+        if stat_a.st_size != stat_b.st_size:
+            return False
+        if file_digest(Path(a) / rel) != file_digest(Path(b) / rel):
+            return False
+    return True
+
+
+def _remove_path(path: Path) -> None:
+    """删除文件或目录"""
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+def prune_snapshots(dst: Path, keep: int = DEFAULT_KEEP_SNAPSHOTS) -> int:
+    """只保留最近 keep 个快照，返回删除的快照数"""
+    snapshots = list_snapshots(dst)
+    expired = snapshots[:max(0, len(snapshots) - keep)]
+    for snapshot in expired:
+        shutil.rmtree(snapshot)
+    _remove_empty_snapshots_dir(dst)
+    return len(expired)
+
+
+def _remove_empty_snapshots_dir(dst: Path) -> None:
+    snapshots_dir = get_snapshots_dir(dst)
+    if snapshots_dir.is_dir() and not any(snapshots_dir.iterdir()):
+        snapshots_dir.rmdir()
+
+
+def staged_install(dst: Path, populate: Callable[[Path], T],
+                   keep: int = DEFAULT_KEEP_SNAPSHOTS,
+                   snapshot_name: Optional[str] = None) -> T:
+    """事务式安装目录
+
+    1. 以硬链接将当前目录复制到同级暂存目录（不复制文件内容）
+    2. 调用 populate(暂存目录) 完成同步和后处理；写入须先写临时文件再替换，
+       不能原地修改，否则会改动与当前版本共享的文件
+    3. 内容有变化时，把当前目录重命名为快照，再把暂存目录重命名为正式目录
+
+    populate 抛出异常或进程中断时，正式目录保持原样，遗留的暂存目录在下次安装时清理。
+    两次重命名之间目录短暂缺失，但不会出现安装了一半的目录。
+
+    Args:
+        dst: 安装目录
+        populate: 向暂存目录写入新版本的函数，其返回值原样返回
+        keep: 保留的快照数量，0 表示不保留
+        snapshot_name: 快照名称，同一次安装的多个目录应使用相同名称
+
+    Returns:
+        populate 的返回值
+    """
+    dst = Path(dst)
+    staging = get_staging_dir(dst)
+    _remove_path(staging)
+    if dst.is_dir():
+        link_tree(dst, staging)
+    else:
+        _remove_path(dst)
+
+    try:
+        result = populate(staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if dst.is_dir() and _same_tree(staging, dst):
+        # 没有变化，不切换也不产生快照
+        shutil.rmtree(staging)
+        return result
+
+    discarded = None
+    if dst.is_dir():
+        if keep > 0:
+            snapshots_dir = get_snapshots_dir(dst)
+            snapshots_dir.mkdir(exist_ok=True)
+            snapshot = snapshots_dir / (snapshot_name or new_snapshot_name())
+            _remove_path(snapshot)
+            os.replace(dst, snapshot)
+        else:
+            discarded = dst.with_name(f".{dst.name}.old")
+            _remove_path(discarded)
+            os.replace(dst, discarded)
+    os.replace(staging, dst)
+
+    if discarded is not None:
+        shutil.rmtree(discarded, ignore_errors=True)
+    prune_snapshots(dst, keep)
+    return result
+
+
+def rollback(dst: Path, snapshot_name: Optional[str] = None) -> Optional[Path]:
+    """将安装目录回滚到快照，当前版本被丢弃
+
+    回滚只是两次目录重命名，与文件数量无关。
+
+    Args:
+        dst: 安装目录
+        snapshot_name: 快照名称，默认最新的快照
+
+    Returns:
+        使用的快照路径；没有对应快照时返回 None
+    """
+    dst = Path(dst)
+    if snapshot_name is None:
+        snapshots = list_snapshots(dst)
+        if not snapshots:
+            return None
+        snapshot = snapshots[-1]
+    else:
+        snapshot = get_snapshots_dir(dst) / snapshot_name
+        if not snapshot.is_dir():
+            return None
+
+    discarded = get_staging_dir(dst)
+    _remove_path(discarded)
+    if dst.exists() or dst.is_symlink():
+        os.replace(dst, discarded)
+    os.replace(snapshot, dst)
+    _remove_path(discarded)
+    _remove_empty_snapshots_dir(dst)
+    return snapshot
+
+
+def latest_snapshot_name(dsts: Iterable[Path]) -> Optional[str]:
+    """多个安装目录中最近一次安装的快照名称"""
+    names = [snapshots[-1].name for snapshots in map(list_snapshots, dsts) if snapshots]
+    return max(names) if names else None
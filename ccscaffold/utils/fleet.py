@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-Scaffold 批量部署模块
+将同一份源文件并发部署到多个目标项目：
+- 目标支持目录列表、通配符（如 ~/work/*）和 @列表文件（每行一个目录，# 开头为注释）
+- 每个目标在独立线程中部署，输出按目标分别收集，避免多个目标的日志交错
+- 部署结束后汇总每个目标的耗时和结果
+"""
+
+import glob
+import io
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+
+# 默认并发部署的目标数
+DEFAULT_FLEET_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+GLOB_CHARS = '*?['
+
+
+def _read_target_list(list_file: str) -> List[str]:
+    """读取目标列表文件，忽略空行和 # 注释"""
+    with open(os.path.expanduser(list_file), 'r', encoding='utf-8') as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
+def expand_targets(patterns: Iterable[str]) -> List[Path]:
+    """展开目标目录列表
+
+    Args:
+        patterns: 目录路径、通配符或 @列表文件
+
+    Returns:
+        去重后的目标目录（保持给出的顺序），通配符只匹配目录；
+        非通配符的路径原样保留，由部署函数报告目录不存在
+    """
+    targets = []
+    seen = set()
+
+    def add(path: str) -> None:
+        resolved = Path(os.path.expanduser(path)).resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            targets.append(resolved)
+
+    for pattern in patterns:
+        if pattern.startswith('@'):
+            for path in expand_targets(_read_target_list(pattern[1:])):
+                add(str(path))
+        elif any(char in pattern for char in GLOB_CHARS):
+            for path in sorted(glob.glob(os.path.expanduser(pattern))):
+                if os.path.isdir(path):
+                    add(path)
+        else:
+            add(pattern)
+    return targets
+
+
+class FleetResult:
+    """单个目标的部署结果"""
+
+    def __init__(self, target: Path, ok: bool, elapsed: float, error: str = '', output: str = ''):
+        self.target = target
+        self.ok = ok
+        self.elapsed = elapsed
+        self.error = error
+        self.output = output
+
+
+class _ThreadOutput(io.TextIOBase):
+    """按线程收集 stdout 输出，未登记的线程直接写到原始 stdout"""
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def start(self) -> None:
+        self._local.buffer = io.StringIO()
+
+    def stop(self) -> str:
+        buffer = getattr(self._local, 'buffer', None)
+        self._local.buffer = None
+        return buffer.getvalue() if buffer is not None else ''
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            return self._fallback.write(text)
+        return buffer.write(text)
+
+    def flush(self) -> None:
+        self._fallback.flush()
+
+    @property
+    def encoding(self):
+        return getattr(self._fallback, 'encoding', 'utf-8')
+
+
+def run_fleet(targets: List[Path], deploy: Callable[[Path], bool],
+              workers: Optional[int] = None) -> List[FleetResult]:
+    """并发部署到多个目标
+
+    Args:
+        targets: 目标目录列表
+        deploy: 部署函数，接收目标目录，返回是否成功；抛出异常视为失败
+        workers: 并发数，默认 DEFAULT_FLEET_WORKERS
+
+    Returns:
+        与 targets 顺序一致的部署结果
+    """
+    output = _ThreadOutput(sys.stdout)
+
+    def run_one(target: Path) -> FleetResult:
+        output.start()
+        start = time.perf_counter()
+        ok, error = False, ''
+        try:
+            ok = bool(deploy(target))
+            if not ok:
+                error = '部署函数返回失败'
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exc(file=sys.stdout)
+        elapsed = time.perf_counter() - start
+        return FleetResult(target, ok, elapsed, error, output.stop())
+
+    original_stdout = sys.stdout
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=workers or DEFAULT_FLEET_WORKERS) as executor:
+            return list(executor.map(run_one, targets))
+    finally:
+        sys.stdout = original_stdout
+
+
+def print_fleet_report(results: List[FleetResult], show_output: bool = False) -> None:
+    """打印每个目标的耗时和结果，失败目标附带其部署输出
+
+    Args:
+        results: run_fleet 的返回值
+        show_output: 是否同时打印成功目标的部署输出
+    """
+    for result in results:
+        if show_output or not result.ok:
+            print(f"\n----- {result.target} -----")
+            print(result.output.rstrip())
+
+    width = max([len(str(result.target)) for result in results] + [4])
+    print()
+    print(f"{'目标':<{width}}  {'结果':<4}  {'耗时(s)':>8}")
+    for result in results:
+        status = '成功' if result.ok else '失败'
+        line = f"{str(result.target):<{width}}  {status:<4}  {result.elapsed:>8.2f}"
+        if result.error:
+            line += f"  {result.error}"
+        print(line)
+
+    succeeded = sum(1 for result in results if result.ok)
+    total_time = sum(result.elapsed for result in results)
+    print(f"\n共 {len(results)} 个目标: 成功 {succeeded}, 失败 {len(results) - succeeded}, "
+          f"累计耗时 {total_time:.2f}s")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-Scaffold settings.json 合并模块
+以声明式的方式把安装脚本的 hooks 配置合并到已有的 settings.json：
+- hook 条目以 (事件, matcher, command) 为键，重复安装不会追加相同的 hook，
+  已有配置中的重复条目也会被清理（每个重复条目都意味着每次工具调用多启动一个 Python 进程）
+- 命令中包含 owned_markers 的 hook 视为安装脚本管理的条目，合并前先移除，
+  Python 命令或脚本路径变化后不会残留旧条目
+- 其余用户自己的 hooks 和配置项保持不变
+- 支持 dry-run，只输出合并前后的差异，不写入文件
+"""
+
+import copy
+import difflib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# CC-Scaffold 安装的 hook 脚本，命令中包含这些名称的 hook 由安装脚本管理
+CCSCAFFOLD_HOOK_MARKERS = (
+    'hook_dispatcher.py',
+    'chat_recorder.py',
+    'session_end_summary.py',
+    'session_end_continuous_learning.py',
+    'clean_console_log.py',
+)
+
+# Stop 事件 hook_dispatcher 的超时（秒），需覆盖分发器的 DISPATCH_BUDGET（110 秒），
+# 否则 Claude Code 会在处理器跑完前终止分发器；所有安装脚本共用这一取值
+STOP_HOOK_TIMEOUT = 120
+
+HookKey = Tuple[str, str, str]
+
+
+def hook_key(event: str, matcher: Optional[str], hook: Dict[str, Any]) -> HookKey:
+    """hook 条目的稳定键，命令中的连续空白视为一个空格"""
+    command = ' '.join(str(hook.get('command', '')).split())
+    return event, matcher or '', command
+
+
+def is_owned_hook(hook: Dict[str, Any], owned_markers: Iterable[str]) -> bool:
+    """判断 hook 是否由安装脚本管理"""
+    command = str(hook.get('command', ''))
+    return any(marker in command for marker in owned_markers)
+
+
+def _merge_event(event: str, existing_groups: List[Dict[str, Any]], new_groups: List[Dict[str, Any]],
+                 owned_markers: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """合并单个事件的 hook 分组"""
+    seen = set()
+    merged = []
+
+    def add_group(group: Dict[str, Any], drop_owned: bool) -> None:
+        hooks = []
+        for hook in group.get('hooks', []):
+            if drop_owned and is_owned_hook(hook, owned_markers):
+                continue
+            key = hook_key(event, group.get('matcher'), hook)
+            if key in seen:
+                continue
+            seen.add(key)
+            hooks.append(hook)
+        if hooks:
+            result = dict(group)
+            result['hooks'] = hooks
+            merged.append(result)
+
+    # 先保留用户已有的 hook（去掉安装脚本管理的旧条目），再追加新配置
+    for group in existing_groups:
+        add_group(group, drop_owned=True)
+    for group in new_groups:
+        add_group(group, drop_owned=False)
+    return merged
+
+
+def merge_hooks(existing_hooks: Dict[str, Any], new_hooks: Dict[str, Any],
+                owned_markers: Iterable[str] = CCSCAFFOLD_HOOK_MARKERS) -> Dict[str, Any]:
+    """合并 hooks 配置
+
+    Args:
+        existing_hooks: settings.json 中已有的 hooks
+        new_hooks: 安装脚本要写入的 hooks
+        owned_markers: 安装脚本管理的 hook 命令标记
+
+    Returns:
+        合并后的 hooks，事件顺序为已有事件在前、新事件在后
+    """
+    owned_markers = tuple(owned_markers)
+    merged = {}
+    for event in list(existing_hooks) + [e for e in new_hooks if e not in existing_hooks]:
+        groups = _merge_event(event, existing_hooks.get(event, []), new_hooks.get(event, []), owned_markers)
+        if groups:
+            merged[event] = groups
+    return merged
+
+
+def _fill_missing(target: Dict[str, Any], defaults: Dict[str, Any]) -> None:
+    """把 defaults 中缺少的配置项补充到 target，已有的值不覆盖"""
+    for key, value in defaults.items():
+        if key not in target:
+            target[key] = copy.deepcopy(value)
+        elif isinstance(target[key], dict) and isinstance(value, dict):
+            _fill_missing(target[key], value)
+
+
+def merge_settings(existing: Dict[str, Any], updates: Dict[str, Any],
+                   owned_markers: Iterable[str] = CCSCAFFOLD_HOOK_MARKERS) -> Dict[str, Any]:
+    """合并完整的 settings 配置
+
+    hooks 按 merge_hooks 规则合并；其他配置项只补充缺少的键，用户已有的值优先。
+    """
+    merged = copy.deepcopy(existing)
+    defaults = {key: value for key, value in updates.items() if key != 'hooks'}
+    _fill_missing(merged, defaults)
+    if 'hooks' in updates:
+        merged['hooks'] = merge_hooks(existing.get('hooks', {}), updates['hooks'], owned_markers)
+    return merged
+
+
+def render_settings(settings: Dict[str, Any]) -> str:
+    """序列化为 settings.json 文本"""
+    return json.dumps(settings, indent=2, ensure_ascii=False) + '\n'
+
+
+def settings_diff(old_text: str, new_text: str, name: str = 'settings.json') -> str:
+    """生成 unified diff"""
+    return ''.join(difflib.unified_diff(
+        old_text.splitlines(keepends=True),
+        new_text.splitlines(keepends=True),
+        fromfile=f'{name} (当前)',
+        tofile=f'{name} (合并后)'
+    ))
+
+
+def apply_settings(settings_file: Path, updates: Dict[str, Any],
+                   owned_markers: Iterable[str] = CCSCAFFOLD_HOOK_MARKERS,
+                   dry_run: bool = False, base: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
+    """合并配置并写入 settings.json
+
+    Args:
+        settings_file: settings.json 路径，不存在时新建
+        updates: 要合并的配置
+        owned_markers: 安装脚本管理的 hook 命令标记
+        dry_run: 只计算差异，不写入
+        base: 合并的基础配置，默认读取 settings_file
+
+    Returns:
+        (是否有变化, unified diff)
+
+    Raises:
+        ValueError: 已有的 settings.json 不是合法 JSON，此时不会覆盖用户配置
+    """
+    settings_file = Path(settings_file)
+    old_text = settings_file.read_text(encoding='utf-8') if settings_file.exists() else ''
+    if base is None:
+        base = json.loads(old_text) if old_text.strip() else {}
+
+    new_text = render_settings(merge_settings(base, updates, owned_markers))
+    if new_text == old_text:
+        return False, ''
+
+    diff = settings_diff(old_text, new_text, settings_file.name)
+    if not dry_run:
+        settings_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = settings_file.with_name(settings_file.name + '.tmp')
+        tmp_file.write_text(new_text, encoding='utf-8')
+        os.replace(tmp_file, settings_file)
+    return True, diff
@@ -12,19 +12,53 @@ import os
 import sys
 import json
 import subprocess
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 
 
 def get_project_root():
     """获取项目根目录"""
-    # 获取脚本所在目录的父目录（项目根目录）
-    # 脚本位置: .claude/scripts/hooks/chat-record/session_end_summary.py
-    # 需要向上 4 层到达项目根目录
+    # 脚本位置:
+    # - .claude/scripts/hooks/chat-record/session_end_summary.py，向上 4 层到达项目根目录
+    # - .claude-hooks/session_end_summary.py（install_components.py 的安装位置），向上 1 层
     script_dir = Path(__file__).resolve().parent
+    if script_dir.name == '.claude-hooks':
+        return script_dir.parent
     return script_dir.parent.parent.parent.parent
 
 
+# 共享模块位于 chat-record skill 目录；由 hook_dispatcher 调用时该目录已在 sys.path 中
+for _skill_dir in (
+    # 部署位置: .claude/skills/chat-record
+    get_project_root() / '.claude' / 'skills' / 'chat-record',
+    # 源码位置: chat-record/skills/chat-record
+    Path(__file__).resolve().parent.parent / 'skills' / 'chat-record',
+):
+    if _skill_dir.exists() and str(_skill_dir) not in sys.path:
+        sys.path.append(str(_skill_dir))
+
+# 未部署 chat-record skill 时回退到简单实现：不归档冷数据、不统计耗时、完整解析 JSON
+try:
+    import cold_storage
+except ImportError:
+    cold_storage = None
+
+try:
+    from hook_metrics import HookMetrics
+except ImportError:
+    HookMetrics = None
+
+try:
+    from hook_payload import LazyPayload
+except ImportError:
+    LazyPayload = None
+
+
+# 超过该天数的会话总结和历史对话片段转入冷存储
+COLD_STORAGE_DAYS = 7
+
+
 CONFIG = {
     "conversation_file": None,
     "modify_log_file": None,
@@ -32,6 +66,32 @@ CONFIG = {
 }
 
 
+class _NullMetrics:
+    """hook_metrics 模块不可用时的空实现"""
+
+    def span(self, name):
+        return nullcontext()
+
+    def add_bytes(self, direction, count):
+        pass
+
+    def count_error(self, count=1):
+        pass
+
+    def set_event(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+
+def create_metrics():
+    """创建耗时与 I/O 统计（通过 CCSCAFFOLD_HOOK_METRICS 开启）"""
+    if HookMetrics is None:
+        return _NullMetrics()
+    return HookMetrics('session_end_summary', get_project_root())
+
+
 def init_config():
     """初始化配置，设置绝对路径"""
     project_root = get_project_root()
@@ -69,6 +129,18 @@ def read_file_content(file_path):
     return content
 
 
+def archive_cold_data():
+    """将过期的会话总结和对话片段压缩归档"""
+    if cold_storage is None:
+        return
+    summary_file = Path(CONFIG["session_summary_file"])
+    try:
+        cold_storage.archive_cold_data(summary_file.parent, summary_file, COLD_STORAGE_DAYS)
+    except Exception as e:
+        # 归档失败不影响会话总结
+        sys.stderr.write(f"[Session Summary] 归档失败: {e}\n")
+
+
 def get_file_modifications():
     """获取文件修改记录"""
     modify_logs = read_file_content(CONFIG["modify_log_file"])
@@ -221,50 +293,102 @@ def clear_conversation():
         conversation_file.write_text('', encoding='utf-8')
 
 
+def parse_hook_data(raw_data):
+    """解析 stdin 的 hook 数据，只按需解码用到的字段（Stop 事件只需要 hook_event_name）"""
+    if LazyPayload is None:
+        return json.loads(raw_data.decode('utf-8', errors='replace'))
+    return LazyPayload(raw_data)
+
+
 def main():
     """主函数"""
-    # 初始化配置
-    init_config()
-
     # 设置 stderr 的编码为 UTF-8
     if sys.platform == 'win32':
         import io
         sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
+    # 初始化配置
+    init_config()
+    metrics = create_metrics()
+
+    try:
+        run(metrics)
+    except SystemExit:
+        raise
+    except Exception as e:
+        metrics.count_error()
+        sys.stderr.write(f"[Session Summary Error] {e}\n")
+    finally:
+        metrics.flush()
+
+    sys.exit(0)
+
+
+def handle_hook(data):
+    """处理已解析的 hook 数据（hook_dispatcher 在同一进程内直接调用）"""
+    init_config()
+    metrics = create_metrics()
+    try:
+        process_event(data, metrics)
+    except Exception as e:
+        metrics.count_error()
+        sys.stderr.write(f"[Session Summary Error] {e}\n")
+    finally:
+        metrics.flush()
+
+
+def run(metrics):
+    """读取 hook 数据并处理"""
     # 从环境变量或 stdin 读取 hook 数据
     hook_data = None
 
-    # 尝试从环境变量读取
-    if "CLAUDE_HOOK_DATA" in os.environ:
-        try:
-            hook_data = json.loads(os.environ["CLAUDE_HOOK_DATA"])
-        except:
-            pass
+    with metrics.span('parse'):
+        # 尝试从环境变量读取
+        if "CLAUDE_HOOK_DATA" in os.environ:
+            try:
+                hook_data = json.loads(os.environ["CLAUDE_HOOK_DATA"])
+            except:
+                pass
+
+        # 如果环境变量没有，尝试从 stdin 读取
+        if hook_data is None:
+            try:
+                data = sys.stdin.buffer.read()
+                metrics.add_bytes('read', len(data))
+                if data:
+                    hook_data = parse_hook_data(data)
+            except:
+                pass
+
+    if hook_data is None:
+        # 没有 hook 数据，直接退出
+        return
 
-    # 如果环境变量没有，尝试从 stdin 读取
-    if not hook_data:
-        try:
-            data = sys.stdin.read()
-            if data:
-                hook_data = json.loads(data)
-        except:
-            pass
+    process_event(hook_data, metrics)
 
-    if not hook_data:
-        # 没有 hook 数据，直接退出
-        sys.exit(0)
 
+def process_event(hook_data, metrics):
+    """处理 Stop 事件：生成总结、归档冷数据并清空会话记录"""
     # 检查是否是 Stop 事件（会话结束）
     hook_event_name = hook_data.get("hook_event_name", "")
+    metrics.set_event(hook_event_name)
 
     if hook_event_name != "Stop":
-        sys.exit(0)
+        return
 
     # 生成会话总结
-    summary = generate_session_summary()
+    with metrics.span('summarize'):
+        summary = generate_session_summary()
 
     # 保存总结
-    save_summary(summary)
+    if summary:
+        with metrics.span('write'):
+            save_summary(summary)
+        metrics.add_bytes('written', len(summary.encode('utf-8')))
+
+    # 归档过期数据，控制磁盘占用
+    with metrics.span('archive'):
+        archive_cold_data()
 
     # 清空会话记录
     clear_conversation()
@@ -274,8 +398,6 @@ def main():
     sys.stderr.write(f"会话总结已保存到: {CONFIG['session_summary_file']}\n")
     sys.stderr.write("下次会话开始时，你可以使用 /loadLastSession 命令加载上一次会话的内容。\n")
 
-    sys.exit(0)
-
 
 if __name__ == "__main__":
     main()
@@ -28,10 +28,14 @@ READ_ONLY_TOOLS = {
 import json
 import sys
 import os
-import re
 from datetime import datetime
 from pathlib import Path
 
+from conversation_tail import trim_to_last_messages
+from hook_io import echo_stdin, read_stdin
+from hook_payload import LazyPayload
+from hook_metrics import HookMetrics
+
 
 # 配置
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB，超过则清空重新开始
@@ -48,6 +52,10 @@ def get_project_root():
     return script_dir.parent.parent.parent
 
 
+# 单次调用的耗时与 I/O 统计（通过 CCSCAFFOLD_HOOK_METRICS 开启）
+metrics = HookMetrics('chat_recorder', get_project_root())
+
+
 def get_conversation_file():
     """获取会话文件路径（固定为 conversation.txt）"""
     project_root = get_project_root()
@@ -96,13 +104,6 @@ def check_and_reset():
             conv_file.write_text('', encoding='utf-8')
 
 
-def count_messages(content):
-    """计算消息条数（以时间戳开头的行）"""
-    import re
-    pattern = r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} (user|claude)>'
-    return len(re.findall(pattern, content, re.MULTILINE))
-
-
 def write_message(role, content):
     """写入消息到会话文件，只保留最近 MAX_MESSAGES 条消息"""
     try:
@@ -110,48 +111,26 @@ def write_message(role, content):
 
         conv_file = get_conversation_file()
 
-        # 读取现有内容
-        existing_content = ""
-        if conv_file.exists():
-            existing_content = conv_file.read_text(encoding='utf-8')
-
         # 生成新消息
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        clean_content = sanitize_text(content)
-        clean_role = sanitize_text(role)
+        with metrics.span('sanitize'):
+            clean_content = sanitize_text(content)
+            clean_role = sanitize_text(role)
         new_message = f"{timestamp} {clean_role}> {clean_content}\n"
 
-        # 合并新消息
-        all_content = existing_content + new_message
-
-        # 如果超过最大消息数，只保留最近 MAX_MESSAGES 条
-        message_count = count_messages(all_content)
-        if message_count > MAX_MESSAGES:
-            # 按消息分割，保留最近 MAX_MESSAGES 条
-            messages = []
-            current_msg = []
-
-            for line in all_content.split('\n'):
-                # 检测是否是新消息的开始（时间戳行）
-                if line and line[0].isdigit():
-                    if current_msg:
-                        messages.append('\n'.join(current_msg))
-                    current_msg = [line]
-                else:
-                    if current_msg or line.strip():
-                        current_msg.append(line)
+        # 追加新消息，不读取已有内容
+        with metrics.span('write'):
+            with open(conv_file, 'a', encoding='utf-8') as f:
+                f.write(new_message)
+        if metrics.enabled:
+            metrics.add_bytes('written', len(new_message.encode('utf-8')))
 
-            if current_msg:
-                messages.append('\n'.join(current_msg))
-
-            # 只保留最近 MAX_MESSAGES 条
-            messages = messages[-MAX_MESSAGES:]
-            all_content = '\n'.join(messages) + '\n'
-
-        # 写入文件
-        conv_file.write_text(all_content, encoding='utf-8')
+        # 从文件末尾定位倒数第 MAX_MESSAGES 条消息，截掉之前的内容
+        with metrics.span('trim'):
+            trim_to_last_messages(conv_file, MAX_MESSAGES)
 
     except Exception as e:
+        metrics.count_error()
         sys.stderr.write(f"[Chat Recorder Error] {str(e)}\n")
 
 
@@ -234,26 +213,12 @@ def handle_stop(data):
     pass
 
 
-def main():
-    """主函数"""
-    try:
-        # 从标准输入读取 hook 数据，处理编码问题
-        import io
-        if hasattr(sys.stdin, 'buffer'):
-            # 在Windows上使用二进制模式读取，然后解码
-            input_data = sys.stdin.buffer.read().decode('utf-8', errors='replace')
-        else:
-            input_data = sys.stdin.read()
-
-        if not input_data:
-            return
-
-        # 解析 JSON 数据
-        data = json.loads(input_data)
-
-        # 根据 hook 类型处理
-        hook_event_name = data.get('hook_event_name', '')
+def handle_hook(data):
+    """按 hook 类型处理（hook_dispatcher 在同一进程内直接调用）"""
+    hook_event_name = data.get('hook_event_name', '')
+    metrics.set_event(hook_event_name)
 
+    try:
         if hook_event_name == 'SessionStart':
             handle_session_start(data)
         elif hook_event_name == 'UserPromptSubmit':
@@ -262,25 +227,38 @@ def main():
             handle_post_tool_use(data)
         elif hook_event_name == 'Stop':
             handle_stop(data)
+    finally:
+        metrics.flush()
 
-        # 输出原始数据(Claude Code 要求)
-        # 在Windows上需要处理编码问题
-        try:
-            print(input_data, flush=True)
-        except UnicodeEncodeError:
-            # 如果直接输出失败，使用sys.stdout.buffer写入
-            if hasattr(sys.stdout, 'buffer'):
-                sys.stdout.buffer.write(input_data.encode('utf-8', errors='replace'))
-                sys.stdout.buffer.flush()
+
+def main():
+    """主函数"""
+    raw_data = b''
+    try:
+        # 以字节读取 hook 数据，回显时原样写回，不经过解码和重新编码
+        with metrics.span('read'):
+            raw_data = read_stdin()
+        metrics.add_bytes('read', len(raw_data))
+
+        if not raw_data:
+            return
+
+        # 按需解析：读命令事件只解码 hook_event_name 和 tool_name，
+        # 工具输出在真正需要记录时才解码
+        with metrics.span('parse'):
+            data = LazyPayload(raw_data)
+
+        # 根据 hook 类型处理
+        handle_hook(data)
 
     except Exception as e:
         # 出错时不影响 Claude Code 正常运行
+        metrics.count_error()
         sys.stderr.write(f"[Chat Recorder Error] {str(e)}\n")
-        try:
-            print(input_data if 'input_data' in locals() else '', flush=True)
-        except:
-            if 'input_data' in locals() and hasattr(sys.stdout, 'buffer'):
-                sys.stdout.buffer.write(input_data.encode('utf-8', errors='replace'))
+    finally:
+        # 输出原始数据(Claude Code 要求)
+        echo_stdin(raw_data)
+        metrics.flush()
 
 
 if __name__ == '__main__':
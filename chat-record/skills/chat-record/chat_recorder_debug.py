@@ -2,12 +2,17 @@
 # -*- coding: utf-8 -*-
 """
 临时调试脚本 - 避免会话退出时报错
+只把 hook 数据从 stdin 原样复制到 stdout，不解码、不解析
 """
 
 import sys
 
 try:
-    input_data = sys.stdin.read() if hasattr(sys.stdin, 'read') else ""
-    print(input_data if input_data else "", flush=True)
+    from hook_io import passthrough
+    passthrough()
+except ImportError:
+    # 未部署 hook_io 时按字节复制
+    sys.stdout.buffer.write(sys.stdin.buffer.read())
+    sys.stdout.buffer.flush()
 except:
     pass
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude 命令行异步调用
+
+以 asyncio 子进程运行 `claude -p -`，替代阻塞的 subprocess.run：
+- stdout 增量读取，可通过回调实时处理，超时时返回已收到的部分输出
+- 分别限制首字节超时和总超时
+- 支持通过 asyncio.Event 或取消任务终止调用
+- 多个提示词可以限制并发数并行调用
+- claude 命令可通过环境变量 CCSCAFFOLD_CLAUDE_BIN 替换（如测试用的桩脚本）
+"""
+
+import asyncio
+import codecs
+import os
+import shlex
+import time
+
+
+# 替换 claude 命令的环境变量，值按 shell 规则拆分（如 "python3 stub_claude.py"）
+CLAUDE_BIN_ENV = 'CCSCAFFOLD_CLAUDE_BIN'
+
+# 调用结果状态
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_FIRST_BYTE_TIMEOUT = 'first_byte_timeout'
+STATUS_TIMEOUT = 'timeout'
+STATUS_CANCELLED = 'cancelled'
+STATUS_NOT_FOUND = 'not_found'
+
+# 默认超时（秒）
+DEFAULT_FIRST_BYTE_TIMEOUT = 60
+DEFAULT_TOTAL_TIMEOUT = 120
+
+READ_CHUNK_SIZE = 4096
+
+
+class ClaudeResult:
+    """单次调用的结果
+
+    Attributes:
+        status: 结果状态（STATUS_*）
+        output: stdout 输出，超时或取消时为已收到的部分
+        stderr: stderr 输出
+        returncode: 进程退出码，被终止时为 None
+        elapsed: 耗时（秒）
+    """
+
+    __slots__ = ('status', 'output', 'stderr', 'returncode', 'elapsed')
+
+    def __init__(self, status, output='', stderr='', returncode=None, elapsed=0.0):
+        self.status = status
+        self.output = output
+        self.stderr = stderr
+        self.returncode = returncode
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"ClaudeResult(status={self.status!r}, output={len(self.output)} chars, "
+                f"returncode={self.returncode!r}, elapsed={self.elapsed:.2f})")
+
+    @property
+    def ok(self):
+        return self.status == STATUS_OK
+
+    @property
+    def partial(self):
+        """未正常完成但已收到部分输出"""
+        return not self.ok and bool(self.output)
+
+
+def get_claude_command():
+    """claude 命令，CCSCAFFOLD_CLAUDE_BIN 可替换为其他程序"""
+    override = os.environ.get(CLAUDE_BIN_ENV, '').strip()
+    if override:
+        return shlex.split(override, posix=os.name != 'nt')
+    return ['claude']
+
+
+async def _kill(process):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+async def _write_prompt(process, data):
+    try:
+        process.stdin.write(data)
+        await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # 进程提前退出，错误由退出码体现
+        pass
+    finally:
+        process.stdin.close()
+
+
+async def run_claude_async(prompt, args=('-p', '-'), first_byte_timeout=DEFAULT_FIRST_BYTE_TIMEOUT,
+                           total_timeout=DEFAULT_TOTAL_TIMEOUT, on_chunk=None, cancel_event=None,
+                           command=None, cwd=None):
+    """调用 claude，流式读取输出
+
+    Args:
+        prompt: 通过 stdin 传入的提示词
+        args: 命令参数
+        first_byte_timeout: 等待第一个输出字节的最长秒数
+        total_timeout: 整个调用的最长秒数
+        on_chunk: 每收到一段输出时调用，参数为解码后的文本
+        cancel_event: asyncio.Event，被设置时终止调用并返回已收到的输出
+        command: claude 命令，默认 get_claude_command()
+        cwd: 工作目录
+
+    Returns:
+        ClaudeResult
+    """
+    start = time.monotonic()
+    argv = list(command or get_claude_command()) + list(args)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd
+        )
+    except FileNotFoundError:
+        return ClaudeResult(STATUS_NOT_FOUND, elapsed=time.monotonic() - start)
+
+    writer = asyncio.ensure_future(_write_prompt(process, prompt.encode('utf-8')))
+    stderr_reader = asyncio.ensure_future(process.stderr.read())
+    cancel_waiter = asyncio.ensure_future(cancel_event.wait()) if cancel_event is not None else None
+
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    chunks = []
+    received = False
+    status = None
+
+    try:
+        while True:
+            elapsed = time.monotonic() - start
+            timeout = total_timeout - elapsed
+            timeout_status = STATUS_TIMEOUT
+            if not received and first_byte_timeout - elapsed < timeout:
+                timeout = first_byte_timeout - elapsed
+                timeout_status = STATUS_FIRST_BYTE_TIMEOUT
+            if timeout <= 0:
+                status = timeout_status
+                break
+
+            reader = asyncio.ensure_future(process.stdout.read(READ_CHUNK_SIZE))
+            waiting = {reader} if cancel_waiter is None else {reader, cancel_waiter}
+            done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if reader not in done:
+                reader.cancel()
+                status = STATUS_CANCELLED if cancel_waiter in done else timeout_status
+                break
+
+            data = reader.result()
+            if not data:
+                break
+            received = True
+            text = decoder.decode(data)
+            if text:
+                chunks.append(text)
+                if on_chunk is not None:
+                    on_chunk(text)
+    except asyncio.CancelledError:
+        # 调用方取消任务时终止子进程后继续向上传递
+        await _kill(process)
+        raise
+    finally:
+        if cancel_waiter is not None:
+            cancel_waiter.cancel()
+
+    if status is not None:
+        await _kill(process)
+    else:
+        await process.wait()
+    writer.cancel()
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        chunks.append(tail)
+    stderr = (await stderr_reader).decode('utf-8', errors='replace')
+
+    if status is None:
+        status = STATUS_OK if process.returncode == 0 else STATUS_ERROR
+    return ClaudeResult(status, ''.join(chunks), stderr,
+                        process.returncode if status in (STATUS_OK, STATUS_ERROR) else None,
+                        time.monotonic() - start)
+
+
+def run_claude(prompt, **kwargs):
+    """同步调用 claude，参数同 run_claude_async"""
+    return asyncio.run(run_claude_async(prompt, **kwargs))
+
+
+async def run_many_async(prompts, concurrency=2, **kwargs):
+    """并行调用多个提示词，最多同时运行 concurrency 个进程
+
+    Returns:
+        与 prompts 顺序一致的 ClaudeResult 列表
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(prompt):
+        async with semaphore:
+            return await run_claude_async(prompt, **kwargs)
+
+    return list(await asyncio.gather(*(run_one(prompt) for prompt in prompts)))
+
+
+def run_claude_many(prompts, concurrency=2, **kwargs):
+    """同步接口：并行调用多个提示词"""
+    return asyncio.run(run_many_async(prompts, concurrency, **kwargs))
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话数据冷存储
+
+将超过 N 天的会话总结和历史对话片段压缩归档：
+- 每次归档生成一个压缩块，追加写入 archive/<stream>.chunks
+- archive/index.json 记录每个块的偏移、长度、时间范围和块内记录位置
+- 读取时按索引 seek 到对应块解压，无需解压整个归档
+- 优先使用 zstd（需安装 zstandard），否则使用标准库 gzip
+
+用法:
+    python3.9 cold_storage.py archive [--days 7]
+    python3.9 cold_storage.py cat summaries [--since 2026-01-01]
+    python3.9 cold_storage.py list
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# 配置
+DEFAULT_COLD_DAYS = 7  # 超过该天数的数据转入冷存储
+ARCHIVE_DIR_NAME = 'archive'
+INDEX_FILE_NAME = 'index.json'
+INDEX_VERSION = 1
+SUMMARY_STREAM = 'summaries'
+SEGMENT_STREAM = 'segments'
+SEGMENT_GLOB = 'conversation-*.txt'  # 历史对话片段文件
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 会话总结记录头: "# 2026-02-09 12:00:00"
+SUMMARY_HEADER_PATTERN = re.compile(r'^# (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s*$', re.MULTILINE)
+
+
+def get_default_codec():
+    """获取默认压缩算法"""
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def compress_bytes(data, codec):
+    """按指定算法压缩"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd 压缩需要安装 zstandard 包")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    # mtime=0 保证相同内容生成相同的压缩结果
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def decompress_bytes(data, codec):
+    """按指定算法解压"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 归档需要安装 zstandard 包")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return gzip.decompress(data)
+
+
+class ColdStorage:
+    """压缩块归档存储
+
+    每个 stream（如 summaries、segments）对应一个 .chunks 数据文件，
+    由若干独立压缩块首尾相接组成，块位置记录在 index.json 中。
+    """
+
+    def __init__(self, archive_dir, codec=None):
+        self.archive_dir = Path(archive_dir)
+        self.index_file = self.archive_dir / INDEX_FILE_NAME
+        self.codec = codec or get_default_codec()
+
+    def _load_index(self):
+        """加载索引文件"""
+        if not self.index_file.exists():
+            return {'version': INDEX_VERSION, 'streams': {}}
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_index(self, index):
+        """原子写入索引文件"""
+        tmp_file = self.index_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def _data_file(self, stream):
+        return self.archive_dir / f'{stream}.chunks'
+
+    def list_chunks(self, stream):
+        """列出指定 stream 的所有块"""
+        return self._load_index().get('streams', {}).get(stream, [])
+
+    def append_chunk(self, stream, records):
+        """将一组记录压缩为一个块追加到归档
+
+        Args:
+            stream: 归档流名称
+            records: [(key, name, text)]，key 为时间戳字符串
+
+        Returns:
+            写入的记录条数
+        """
+        if not records:
+            return 0
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+
+        # 拼接记录并记录每条记录在块内的位置
+        payload = bytearray()
+        entries = []
+        for key, name, text in records:
+            data = text.encode('utf-8')
+            entries.append({'key': key, 'name': name, 'start': len(payload), 'size': len(data)})
+            payload.extend(data)
+
+        blob = compress_bytes(bytes(payload), self.codec)
+
+        # 先写数据再写索引，中途失败只会留下未被索引的字节
+        with open(self._data_file(stream), 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+
+        keys = [key for key, _, _ in records]
+        index = self._load_index()
+        index.setdefault('streams', {}).setdefault(stream, []).append({
+            'offset': offset,
+            'length': len(blob),
+            'codec': self.codec,
+            'first': min(keys),
+            'last': max(keys),
+            'raw_size': len(payload),
+            'records': entries
+        })
+        self._save_index(index)
+        return len(records)
+
+    def read_chunk(self, stream, chunk):
+        """读取并解压单个块"""
+        with open(self._data_file(stream), 'rb') as f:
+            f.seek(chunk['offset'])
+            blob = f.read(chunk['length'])
+        return decompress_bytes(blob, chunk['codec'])
+
+    def iter_records(self, stream, since=None, until=None):
+        """按时间顺序遍历归档记录
+
+        Args:
+            since: 起始时间戳（含），只解压时间范围有交集的块
+            until: 结束时间戳（含）
+
+        Yields:
+            (key, name, text)
+        """
+        chunks = sorted(self.list_chunks(stream), key=lambda c: c['first'])
+        for chunk in chunks:
+            if since and chunk['last'] < since:
+                continue
+            if until and chunk['first'] > until:
+                continue
+            payload = self.read_chunk(stream, chunk)
+            for entry in chunk['records']:
+                if since and entry['key'] < since:
+                    continue
+                if until and entry['key'] > until:
+                    continue
+                data = payload[entry['start']:entry['start'] + entry['size']]
+                yield entry['key'], entry['name'], data.decode('utf-8', errors='replace')
+
+    def read_stream(self, stream, since=None, until=None):
+        """读取归档流的全部文本"""
+        return ''.join(text for _, _, text in self.iter_records(stream, since, until))
+
+
+def get_archive_dir(conversations_dir):
+    """获取归档目录"""
+    return Path(conversations_dir) / ARCHIVE_DIR_NAME
+
+
+def split_summary_records(content):
+    """按记录头拆分会话总结
+
+    Returns:
+        (前导内容, [(timestamp, text)])
+    """
+    matches = list(SUMMARY_HEADER_PATTERN.finditer(content))
+    if not matches:
+        return content, []
+
+    records = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        records.append((match.group(1), content[match.start():end]))
+    return content[:matches[0].start()], records
+
+
+def get_cutoff(days, now=None):
+    """计算冷数据的时间分界"""
+    now = now or datetime.now()
+    return (now - timedelta(days=days)).strftime(TIMESTAMP_FORMAT)
+
+
+def archive_summaries(summary_file, storage, days=DEFAULT_COLD_DAYS):
+    """将超过 days 天的会话总结移入冷存储
+
+    Returns:
+        归档的记录条数
+    """
+    summary_file = Path(summary_file)
+    if not summary_file.exists():
+        return 0
+
+    content = summary_file.read_text(encoding='utf-8', errors='replace')
+    preamble, records = split_summary_records(content)
+    cutoff = get_cutoff(days)
+
+    cold = [(ts, 'session_summary', text) for ts, text in records if ts < cutoff]
+    if not cold:
+        return 0
+
+    storage.append_chunk(SUMMARY_STREAM, cold)
+
+    # 只保留热数据，原子替换
+    hot = preamble + ''.join(text for ts, text in records if ts >= cutoff)
+    tmp_file = summary_file.with_suffix(summary_file.suffix + '.tmp')
+    tmp_file.write_text(hot, encoding='utf-8')
+    os.replace(tmp_file, summary_file)
+    return len(cold)
+
+
+def archive_segments(conversations_dir, storage, days=DEFAULT_COLD_DAYS):
+    """将超过 days 天未修改的历史对话片段移入冷存储
+
+    Returns:
+        归档的片段数量
+    """
+    conversations_dir = Path(conversations_dir)
+    if not conversations_dir.exists():
+        return 0
+
+    cutoff = get_cutoff(days)
+    cold = []
+    for segment in sorted(conversations_dir.glob(SEGMENT_GLOB)):
+        modified = datetime.fromtimestamp(segment.stat().st_mtime).strftime(TIMESTAMP_FORMAT)
+        if modified < cutoff:
+            text = segment.read_text(encoding='utf-8', errors='replace')
+            cold.append((modified, segment.name, text, segment))
+
+    if not cold:
+        return 0
+
+    storage.append_chunk(SEGMENT_STREAM, [(key, name, text) for key, name, text, _ in cold])
+    for _, _, _, segment in cold:
+        segment.unlink()
+    return len(cold)
+
+
+def archive_cold_data(conversations_dir, summary_file, days=DEFAULT_COLD_DAYS, codec=None):
+    """归档会话总结和历史对话片段
+
+    Returns:
+        {'summaries': n, 'segments': m}
+    """
+    storage = ColdStorage(get_archive_dir(conversations_dir), codec)
+    return {
+        SUMMARY_STREAM: archive_summaries(summary_file, storage, days),
+        SEGMENT_STREAM: archive_segments(conversations_dir, storage, days)
+    }
+
+
+def read_summaries(summary_file, since=None):
+    """读取会话总结，透明合并冷存储中的历史记录"""
+    summary_file = Path(summary_file)
+    storage = ColdStorage(get_archive_dir(summary_file.parent))
+
+    archived = storage.read_stream(SUMMARY_STREAM, since=since)
+    current = ''
+    if summary_file.exists():
+        current = summary_file.read_text(encoding='utf-8', errors='replace')
+        if since:
+            preamble, records = split_summary_records(current)
+            current = ''.join(text for ts, text in records if ts >= since)
+    return archived + current
+
+
+def get_default_conversations_dir():
+    """获取默认会话目录"""
+    # 脚本位置: .claude/skills/chat-record/cold_storage.py
+    project_root = Path(__file__).resolve().parent.parent.parent.parent
+    return project_root / '.claude' / 'conversations'
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='会话数据冷存储')
+    parser.add_argument('--dir', type=str, help='会话目录（默认 .claude/conversations）')
+    subparsers = parser.add_subparsers(dest='command')
+
+    archive_parser = subparsers.add_parser('archive', help='归档冷数据')
+    archive_parser.add_argument('--days', type=int, default=DEFAULT_COLD_DAYS, help='归档超过多少天的数据')
+
+    cat_parser = subparsers.add_parser('cat', help='输出归档内容（会话总结包含未归档部分）')
+    cat_parser.add_argument('stream', choices=[SUMMARY_STREAM, SEGMENT_STREAM])
+    cat_parser.add_argument('--since', type=str, help='起始时间，如 2026-01-01')
+
+    subparsers.add_parser('list', help='列出归档块')
+
+    args = parser.parse_args()
+    conversations_dir = Path(args.dir) if args.dir else get_default_conversations_dir()
+    summary_file = conversations_dir / 'session_summary.txt'
+
+    if args.command == 'archive':
+        result = archive_cold_data(conversations_dir, summary_file, args.days)
+        print(f"已归档会话总结 {result[SUMMARY_STREAM]} 条, 对话片段 {result[SEGMENT_STREAM]} 个")
+    elif args.command == 'cat':
+        if args.stream == SUMMARY_STREAM:
+            text = read_summaries(summary_file, args.since)
+        else:
+            storage = ColdStorage(get_archive_dir(conversations_dir))
+            text = ''.join(
+                f"# {name} ({key})\n{body}\n"
+                for key, name, body in storage.iter_records(SEGMENT_STREAM, since=args.since)
+            )
+        sys.stdout.write(text)
+    elif args.command == 'list':
+        storage = ColdStorage(get_archive_dir(conversations_dir))
+        for stream in (SUMMARY_STREAM, SEGMENT_STREAM):
+            for chunk in storage.list_chunks(stream):
+                print(f"{stream}: {chunk['first']} ~ {chunk['last']}, "
+                      f"{len(chunk['records'])} 条, {chunk['length']} 字节 ({chunk['codec']})")
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
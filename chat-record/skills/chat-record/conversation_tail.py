@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话文件尾部读取
+
+从文件末尾按块向前扫描，定位倒数第 N 条消息的起始位置：
+- 仅以精确的时间戳前缀 "YYYY-MM-DD HH:MM:SS role>" 作为消息边界
+- 续行（包括以数字开头的续行）不会被误判为新消息
+- 扫描和截断的开销只与最近 N 条消息的大小有关，与文件总大小无关
+"""
+
+import os
+import re
+from pathlib import Path
+
+
+# 每次向前读取的块大小
+BLOCK_SIZE = 64 * 1024
+
+# 消息起始行前缀，与 chat_recorder.write_message 写入格式一致
+MESSAGE_PREFIX = re.compile(rb'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} \w+>')
+
+# 判断前缀所需的最大字节数（时间戳 19 字节 + 空格 + 角色名 + '>'）
+PREFIX_PROBE_SIZE = 64
+
+
+def find_message_offset(f, count, block_size=BLOCK_SIZE):
+    """从文件末尾向前扫描，查找倒数第 count 条消息的起始偏移
+
+    Args:
+        f: 以二进制模式打开的文件对象
+        count: 需要保留的消息条数
+        block_size: 每次读取的块大小
+
+    Returns:
+        倒数第 count 条消息的字节偏移；消息不足 count 条时返回 None
+    """
+    if count <= 0:
+        return None
+
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    found = 0
+    # 上一块开头尚未确认行首的部分，只保留判断前缀所需的字节
+    carry = b''
+
+    while pos > 0:
+        read_size = min(block_size, pos)
+        pos -= read_size
+        f.seek(pos)
+        buf = f.read(read_size) + carry
+
+        # 从后向前检查块内每个换行符之后的行首
+        idx = buf.rfind(b'\n')
+        while idx != -1:
+            line_start = idx + 1
+            if MESSAGE_PREFIX.match(buf, line_start):
+                found += 1
+                if found == count:
+                    return pos + line_start
+            idx = buf.rfind(b'\n', 0, idx)
+
+        # 块开头到第一个换行符之间属于更早开始的行，留到下一块拼接
+        first_newline = buf.find(b'\n')
+        head_end = first_newline if first_newline != -1 else len(buf)
+        carry = buf[:min(head_end, PREFIX_PROBE_SIZE)]
+
+    # 文件第一行
+    if MESSAGE_PREFIX.match(carry):
+        found += 1
+        if found == count:
+            return 0
+    return None
+
+
+def trim_to_last_messages(file_path, count, block_size=BLOCK_SIZE):
+    """只保留文件中最近 count 条消息
+
+    Returns:
+        是否进行了截断
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return False
+
+    with open(file_path, 'rb') as f:
+        offset = find_message_offset(f, count, block_size)
+        if not offset:
+            # 消息不足 count 条，或文件开头就是第 count 条消息
+            return False
+        f.seek(offset)
+        tail = f.read()
+
+    # 一次性写入尾部并原子替换，丢弃头部
+    tmp_file = file_path.with_suffix(file_path.suffix + '.tmp')
+    with open(tmp_file, 'wb') as f:
+        f.write(tail)
+    os.replace(tmp_file, file_path)
+    return True
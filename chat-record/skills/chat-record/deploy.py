@@ -12,6 +12,23 @@ import shutil
 from pathlib import Path
 
 
+# chat_recorder.py 依赖的同目录共享模块，以及作为 hook 入口的分发器
+SHARED_MODULES = [
+    'claude_runner.py',
+    'cold_storage.py',
+    'conversation_tail.py',
+    'hook_dispatcher.py',
+    'hook_io.py',
+    'hook_metrics.py',
+    'hook_payload.py',
+    'prompt_budget.py',
+]
+
+# Stop 事件分发器的超时（秒），需覆盖 hook_dispatcher.DISPATCH_BUDGET；
+# 与 ccscaffold.utils.STOP_HOOK_TIMEOUT 保持一致（本脚本随 skill 单独分发，不依赖 ccscaffold 包）
+STOP_HOOK_TIMEOUT = 120
+
+
 def get_python_command():
     """检测系统的Python命令"""
     import platform
@@ -70,10 +87,18 @@ def deploy_chat_recorder(target_project_path):
         print(f"复制文件时出错: {e}")
         return False
 
+    # 复制共享模块
+    for module_name in SHARED_MODULES:
+        module_source = current_dir / module_name
+        module_target = target_skills_dir / module_name
+        if module_source.exists() and module_source.resolve() != module_target.resolve():
+            shutil.copy2(module_source, module_target)
+            print(f"已复制: {module_target}")
+
     # 获取合适的Python命令
     python_cmd = get_python_command()
 
-    # 创建或更新 settings.json
+    # 创建或更新 settings.json，hook 统一由 hook_dispatcher 分发给 chat_recorder 等处理器
     settings_file = target_path / '.claude' / 'settings.json'
 
     hooks_config = {
@@ -84,7 +109,7 @@ def deploy_chat_recorder(target_project_path):
                     "hooks": [
                         {
                             "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
+                            "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py"
                         }
                     ],
                     "description": "创建新对话记录文件"
@@ -96,7 +121,7 @@ def deploy_chat_recorder(target_project_path):
                     "hooks": [
                         {
                             "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
+                            "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py"
                         }
                     ],
                     "description": "记录用户输入"
@@ -108,7 +133,7 @@ def deploy_chat_recorder(target_project_path):
                     "hooks": [
                         {
                             "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
+                            "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py"
                         }
                     ],
                     "description": "记录AI工具调用"
@@ -120,7 +145,8 @@ def deploy_chat_recorder(target_project_path):
                     "hooks": [
                         {
                             "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
+                            "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py",
+                            "timeout": STOP_HOOK_TIMEOUT
                         }
                     ],
                     "description": "清理空文件，记录结束时间"
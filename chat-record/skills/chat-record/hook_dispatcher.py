@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hook 分发器
+
+settings.json 中每个事件只注册这一个命令，一次 Python 进程内完成所有处理：
+- stdin 只读取一次，字段按需解析并在处理器之间共享，按事件调用已注册的处理器
+- 处理器脚本提供 handle_hook(data) 时在同一进程内调用；
+  未提供的旧脚本回退为子进程执行，原始数据通过 stdin 传入
+- 每个处理器有独立的时限，所有处理器共享一次分发的总时限（低于 settings.json 中 Stop 的 120 秒）；
+  进程内处理器超时后不再等待，但它仍在后台运行（可能还在读 conversation.txt），
+  因此跳过同一事件后面的处理器，避免会话总结在它读取时清空文件
+- 单个处理器失败不影响其他处理器，最后原样输出 hook 数据(Claude Code 要求)
+
+用法（settings.json）:
+    python3.9 .claude/skills/chat-record/hook_dispatcher.py
+"""
+
+import importlib.util
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from hook_io import echo_stdin, read_stdin
+from hook_payload import LazyPayload
+from hook_metrics import HookMetrics
+
+
+# 已注册的处理器: (名称, 候选脚本路径（相对项目根目录，取第一个存在的）, 处理的事件, 时限秒数)
+# 同一事件按注册顺序依次调用。持续学习必须在会话总结之前：会话总结最后会清空 conversation.txt
+HANDLERS = [
+    ('chat_recorder',
+     ['.claude/skills/chat-record/chat_recorder.py'],
+     ('SessionStart', 'UserPromptSubmit', 'PostToolUse', 'Stop'), 10),
+    ('continuous_learning',
+     ['.claude/scripts/hooks/continuous-learning/session_end_continuous_learning.py',
+      '.claude/skills/continuous-learning/scripts/session_end_hook.py'],
+     ('Stop',), 75),
+    ('session_end_summary',
+     ['.claude/scripts/hooks/chat-record/session_end_summary.py',
+      '.claude-hooks/session_end_summary.py'],
+     ('Stop',), 15),
+    ('console_cleaner',
+     ['.claude/scripts/hooks/console-cleaner/clean_console_log.py'],
+     ('Stop',), 30),
+]
+
+# 一次分发的总时限（秒），留出余量，低于安装脚本为 Stop 事件设置的 120 秒超时
+# （ccscaffold.utils.STOP_HOOK_TIMEOUT），调整时两处需同步
+DISPATCH_BUDGET = 110
+
+
+def get_project_root():
+    """获取项目根目录"""
+    # 脚本位置: .claude/skills/chat-record/hook_dispatcher.py
+    return Path(__file__).resolve().parent.parent.parent.parent
+
+
+# 单次调用的耗时统计，每个处理器一个阶段（通过 CCSCAFFOLD_HOOK_METRICS 开启）
+metrics = HookMetrics('hook_dispatcher', get_project_root())
+
+
+def find_handler_script(candidates):
+    """返回第一个存在的处理器脚本"""
+    project_root = get_project_root()
+    for candidate in candidates:
+        script = project_root / candidate
+        if script.exists():
+            return script
+    return None
+
+
+def supports_in_process(script):
+    """脚本是否定义了 handle_hook
+
+    先检查源码再导入：没有 __main__ 保护的旧脚本在导入时就会执行，不能用导入来探测。
+    """
+    with open(script, 'rb') as f:
+        return b'\ndef handle_hook(' in f.read()
+
+
+def load_handler_module(name, script):
+    """按路径加载处理器模块，脚本所在目录加入 sys.path 以便导入其同目录模块"""
+    script_dir = str(script.parent)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    spec = importlib.util.spec_from_file_location(f'ccscaffold_hook_{name}', script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_in_subprocess(script, raw_data, timeout):
+    """回退方式：以子进程运行不支持进程内调用的旧脚本"""
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        input=raw_data,
+        stdout=subprocess.DEVNULL,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        metrics.count_error()
+
+
+def run_with_deadline(func, timeout):
+    """在守护线程中运行 func，最多等待 timeout 秒
+
+    超时后不再等待，线程随进程退出结束（调用方需跳过依赖它的后续处理）；
+    func 抛出的异常在调用线程中重新抛出。
+
+    Returns:
+        是否在时限内完成
+    """
+    errors = []
+
+    def target():
+        try:
+            func()
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        return False
+    if errors:
+        raise errors[0]
+    return True
+
+
+def dispatch(data, raw_data):
+    """按事件调用已注册的处理器"""
+    event = data.get('hook_event_name', '')
+    metrics.set_event(event)
+    deadline = time.monotonic() + DISPATCH_BUDGET
+
+    # 处理器的输出不能混入 stdout，stdout 只用于回显 hook 数据（回显直接写文件描述符）；
+    # 有处理器超时时它可能仍在输出，不再恢复 sys.stdout
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    timed_out = False
+    try:
+        for name, candidates, events, timeout in HANDLERS:
+            if event not in events:
+                continue
+            script = find_handler_script(candidates)
+            if script is None:
+                continue
+            if timed_out:
+                metrics.count_error()
+                sys.stderr.write(f"[Hook Dispatcher] 前面的处理器仍在运行，跳过 {name}\n")
+                continue
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                metrics.count_error()
+                sys.stderr.write(f"[Hook Dispatcher] 已超过总时限，跳过 {name}\n")
+                continue
+            with metrics.span(name):
+                try:
+                    if supports_in_process(script):
+                        module = load_handler_module(name, script)
+                        finished = run_with_deadline(lambda: module.handle_hook(data), timeout)
+                    else:
+                        # 子进程超时由 subprocess.run 终止，抛出 TimeoutExpired
+                        run_in_subprocess(script, raw_data, timeout)
+                        finished = True
+                    if not finished:
+                        timed_out = True
+                        metrics.count_error()
+                        sys.stderr.write(f"[Hook Dispatcher] {name} 超过 {timeout:.0f} 秒未完成，不再等待\n")
+                except (Exception, SystemExit) as e:
+                    metrics.count_error()
+                    sys.stderr.write(f"[Hook Dispatcher] {name} 处理失败: {e}\n")
+    finally:
+        if not timed_out:
+            sys.stdout = stdout
+
+
+def main():
+    """主函数"""
+    raw_data = b''
+    try:
+        with metrics.span('read'):
+            raw_data = read_stdin()
+        metrics.add_bytes('read', len(raw_data))
+        if not raw_data:
+            return
+
+        with metrics.span('parse'):
+            data = LazyPayload(raw_data)
+        dispatch(data, raw_data)
+    except Exception as e:
+        # 出错时不影响 Claude Code 正常运行
+        metrics.count_error()
+        sys.stderr.write(f"[Hook Dispatcher Error] {e}\n")
+    finally:
+        # 原样输出 hook 数据
+        echo_stdin(raw_data)
+        metrics.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hook 标准输入输出透传
+
+Claude Code 要求 hook 把收到的数据原样输出，工具调用数据可能有数 MB：
+- stdin 以字节读取，原样写回 stdout，不经过 str 解码、print 和重新编码
+- stdin 为普通文件（重定向）时用 os.sendfile 在内核中直接复制
+- 只透传不解析时，Linux 上 stdin、stdout 均为管道则用 os.splice（Python 3.10+），
+  否则按块读写，不在内存中保留完整数据
+"""
+
+import json
+import os
+import stat
+import sys
+
+
+STDIN_FD = 0
+STDOUT_FD = 1
+
+# 按块透传时每次读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+
+def _fd_mode(fd):
+    try:
+        return os.fstat(fd).st_mode
+    except OSError:
+        return 0
+
+
+def _is_regular_file(fd):
+    return stat.S_ISREG(_fd_mode(fd))
+
+
+def _is_pipe(fd):
+    return stat.S_ISFIFO(_fd_mode(fd))
+
+
+def read_stdin():
+    """以字节读取全部 stdin"""
+    if hasattr(sys.stdin, 'buffer'):
+        return sys.stdin.buffer.read()
+    # stdin 被替换为文本流时（如嵌入调用）回退
+    return sys.stdin.read().encode('utf-8', errors='replace')
+
+
+def parse_json(raw_data):
+    """解析 hook 数据，直接对字节解析，不单独解码为 str
+
+    数据不是合法 UTF-8 时按替换字符解码后再解析，与之前的行为一致。
+    """
+    try:
+        return json.loads(raw_data)
+    except UnicodeDecodeError:
+        return json.loads(raw_data.decode('utf-8', errors='replace'))
+
+
+def _write_all(fd, data):
+    """写入全部字节，处理部分写入"""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _sendfile_stdin(size):
+    """stdin 为普通文件时从头复制到 stdout，返回已复制的字节数"""
+    if not hasattr(os, 'sendfile') or not _is_regular_file(STDIN_FD):
+        return 0
+    offset = 0
+    try:
+        while offset < size:
+            sent = os.sendfile(STDOUT_FD, STDIN_FD, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    except OSError:
+        # 部分平台不支持输出到管道，剩余部分由调用方用普通写入补齐
+        pass
+    return offset
+
+
+def echo_stdin(raw_data):
+    """把已读取的 hook 数据原样写回 stdout"""
+    if not raw_data:
+        return
+    sys.stdout.flush()
+    try:
+        sent = _sendfile_stdin(len(raw_data))
+        _write_all(STDOUT_FD, memoryview(raw_data)[sent:])
+    except OSError:
+        # stdout 不是真实文件描述符时（如被替换为内存流）回退
+        if hasattr(sys.stdout, 'buffer'):
+            sys.stdout.buffer.write(raw_data)
+            sys.stdout.buffer.flush()
+
+
+def passthrough():
+    """不解析，直接把 stdin 复制到 stdout
+
+    Returns:
+        复制的字节数
+    """
+    sys.stdout.flush()
+    total = 0
+
+    if hasattr(os, 'splice') and _is_pipe(STDIN_FD) and _is_pipe(STDOUT_FD):
+        while True:
+            moved = os.splice(STDIN_FD, STDOUT_FD, CHUNK_SIZE)
+            if moved == 0:
+                return total
+            total += moved
+
+    if hasattr(os, 'sendfile') and _is_regular_file(STDIN_FD):
+        size = os.fstat(STDIN_FD).st_size
+        offset = os.lseek(STDIN_FD, 0, os.SEEK_CUR)
+        try:
+            while offset < size:
+                sent = os.sendfile(STDOUT_FD, STDIN_FD, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+                total += sent
+            return total
+        except OSError:
+            os.lseek(STDIN_FD, offset, os.SEEK_SET)
+
+    while True:
+        chunk = os.read(STDIN_FD, CHUNK_SIZE)
+        if not chunk:
+            return total
+        _write_all(STDOUT_FD, chunk)
+        total += len(chunk)
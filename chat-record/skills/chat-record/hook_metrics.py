@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hook 耗时与 I/O 统计
+
+可选的 hook 埋点，由 chat_recorder、session_end_summary、session_end_hook 共用：
+- 每次调用记录各阶段耗时（parse/sanitize/write/trim 等）、读写字节数和错误数
+- 通过环境变量 CCSCAFFOLD_HOOK_METRICS 开启，取值 jsonl、prom 或 jsonl,prom
+- 数据写入 .claude/tmp/metrics/ 目录，未开启时所有接口均为空操作
+
+用法:
+    python3.9 hook_metrics.py stats [--file .claude/tmp/metrics/hook_metrics.jsonl]
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，prom 文件更新退化为无锁
+    fcntl = None
+
+
+METRICS_ENV = 'CCSCAFFOLD_HOOK_METRICS'
+METRICS_DIR_ENV = 'CCSCAFFOLD_HOOK_METRICS_DIR'
+SUPPORTED_FORMATS = ('jsonl', 'prom')
+JSONL_FILE_NAME = 'hook_metrics.jsonl'
+PROM_FILE_NAME = 'hook_metrics.prom'
+METRIC_PREFIX = 'ccscaffold_hook'
+PERCENTILES = (50, 90, 99)
+
+PROM_LINE_PATTERN = re.compile(r'^([a-zA-Z_:][\w:]*)(\{[^}]*\})?\s+(\S+)$')
+
+
+def get_enabled_formats():
+    """从环境变量读取启用的输出格式"""
+    value = os.environ.get(METRICS_ENV, '').strip().lower()
+    if value in ('', '0', 'off', 'false'):
+        return ()
+    if value in ('1', 'on', 'true'):
+        return ('jsonl',)
+    formats = (fmt.strip() for fmt in value.split(','))
+    return tuple(fmt for fmt in formats if fmt in SUPPORTED_FORMATS)
+
+
+def get_metrics_dir(project_root):
+    """获取统计文件目录"""
+    if os.environ.get(METRICS_DIR_ENV):
+        return Path(os.environ[METRICS_DIR_ENV])
+    return Path(project_root) / '.claude' / 'tmp' / 'metrics'
+
+
+class HookMetrics:
+    """单次 hook 调用的统计数据"""
+
+    def __init__(self, hook, project_root=None, formats=None):
+        self.hook = hook
+        self.formats = get_enabled_formats() if formats is None else tuple(formats)
+        self.metrics_dir = get_metrics_dir(project_root or Path.cwd())
+        self.event = ''
+        self.spans = {}
+        self.bytes = {'read': 0, 'written': 0}
+        self.errors = 0
+        self._started = time.perf_counter()
+        self._flushed = False
+
+    @property
+    def enabled(self):
+        return bool(self.formats)
+
+    def set_event(self, event):
+        """记录触发的 hook 事件名"""
+        self.event = event or ''
+
+    @contextmanager
+    def span(self, name):
+        """统计代码块耗时，同名阶段累加"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed_ms
+
+    def add_bytes(self, direction, count):
+        """累加读写字节数，direction 为 read 或 written"""
+        if self.enabled and count:
+            self.bytes[direction] = self.bytes.get(direction, 0) + count
+
+    def count_error(self, count=1):
+        """累加错误数"""
+        self.errors += count
+
+    def to_record(self):
+        """生成单次调用的统计记录"""
+        return {
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'hook': self.hook,
+            'event': self.event,
+            'total_ms': round((time.perf_counter() - self._started) * 1000, 3),
+            'spans': {name: round(ms, 3) for name, ms in self.spans.items()},
+            'bytes': self.bytes,
+            'errors': self.errors
+        }
+
+    def flush(self):
+        """写入统计文件，每次调用只写一次，失败时静默忽略"""
+        if not self.enabled or self._flushed:
+            return
+        self._flushed = True
+        try:
+            self.metrics_dir.mkdir(parents=True, exist_ok=True)
+            record = self.to_record()
+            if 'jsonl' in self.formats:
+                self._append_jsonl(record)
+            if 'prom' in self.formats:
+                self._update_prom(record)
+        except Exception as e:
+            sys.stderr.write(f"[Hook Metrics] 写入统计失败: {e}\n")
+
+    def _append_jsonl(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with open(self.metrics_dir / JSONL_FILE_NAME, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def _update_prom(self, record):
+        """累加到 Prometheus textfile 格式的计数器"""
+        prom_file = self.metrics_dir / PROM_FILE_NAME
+        lock_file = self.metrics_dir / (PROM_FILE_NAME + '.lock')
+        with open(lock_file, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            values = read_prom_file(prom_file)
+            for key, delta in build_prom_deltas(record):
+                values[key] = values.get(key, 0.0) + delta
+            write_prom_file(prom_file, values)
+
+
+def format_labels(**labels):
+    """生成 Prometheus 标签字符串"""
+    return '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}'
+
+
+def build_prom_deltas(record):
+    """将单次调用记录转换为计数器增量 [((name, labels), delta)]"""
+    hook = record['hook']
+    deltas = [
+        ((f'{METRIC_PREFIX}_invocations_total', format_labels(hook=hook)), 1),
+        ((f'{METRIC_PREFIX}_errors_total', format_labels(hook=hook)), record['errors']),
+        ((f'{METRIC_PREFIX}_duration_seconds_sum', format_labels(hook=hook)), record['total_ms'] / 1000),
+        ((f'{METRIC_PREFIX}_duration_seconds_count', format_labels(hook=hook)), 1),
+    ]
+    for span, ms in record['spans'].items():
+        labels = format_labels(hook=hook, span=span)
+        deltas.append(((f'{METRIC_PREFIX}_span_seconds_sum', labels), ms / 1000))
+        deltas.append(((f'{METRIC_PREFIX}_span_seconds_count', labels), 1))
+    for direction, count in record['bytes'].items():
+        labels = format_labels(hook=hook, direction=direction)
+        deltas.append(((f'{METRIC_PREFIX}_bytes_total', labels), count))
+    return deltas
+
+
+def read_prom_file(prom_file):
+    """读取 textfile 中的样本值"""
+    values = {}
+    if not prom_file.exists():
+        return values
+    with open(prom_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = PROM_LINE_PATTERN.match(line.strip())
+            if match:
+                values[(match.group(1), match.group(2) or '')] = float(match.group(3))
+    return values
+
+
+def write_prom_file(prom_file, values):
+    """原子写入 textfile，供 node_exporter textfile collector 读取"""
+    lines = []
+    declared = set()
+    for (name, labels), value in sorted(values.items()):
+        if name.endswith('_total'):
+            family, metric_type = name, 'counter'
+        else:
+            family, metric_type = re.sub(r'_(sum|count)$', '', name), 'summary'
+        if family not in declared:
+            lines.append(f'# TYPE {family} {metric_type}')
+            declared.add(family)
+        lines.append(f'{name}{labels} {value!r}')
+    tmp_file = prom_file.with_suffix('.prom.tmp')
+    tmp_file.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    os.replace(tmp_file, prom_file)
+
+
+def percentile(sorted_values, pct):
+    """计算百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+def aggregate_records(records):
+    """按 hook 和阶段汇总耗时分布、字节数和错误数"""
+    stats = {}
+    for record in records:
+        hook_stats = stats.setdefault(record['hook'], {
+            'invocations': 0, 'errors': 0, 'bytes': {}, 'timings': {}
+        })
+        hook_stats['invocations'] += 1
+        hook_stats['errors'] += record.get('errors', 0)
+        for direction, count in record.get('bytes', {}).items():
+            hook_stats['bytes'][direction] = hook_stats['bytes'].get(direction, 0) + count
+        hook_stats['timings'].setdefault('total', []).append(record.get('total_ms', 0.0))
+        for span, ms in record.get('spans', {}).items():
+            hook_stats['timings'].setdefault(span, []).append(ms)
+
+    for hook_stats in stats.values():
+        summary = {}
+        for span, values in hook_stats['timings'].items():
+            values.sort()
+            summary[span] = {f'p{pct}': percentile(values, pct) for pct in PERCENTILES}
+            summary[span]['max'] = values[-1]
+            summary[span]['count'] = len(values)
+        hook_stats['timings'] = summary
+    return stats
+
+
+def load_records(jsonl_file):
+    """读取 JSONL 统计记录，跳过损坏的行"""
+    records = []
+    with open(jsonl_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def print_stats(stats):
+    """打印汇总结果"""
+    for hook, hook_stats in sorted(stats.items()):
+        print(f"\n[{hook}] 调用 {hook_stats['invocations']} 次, 错误 {hook_stats['errors']} 次")
+        byte_info = ', '.join(f"{d} {c} 字节" for d, c in sorted(hook_stats['bytes'].items()))
+        if byte_info:
+            print(f"  I/O: {byte_info}")
+        print(f"  {'阶段':<12}{'次数':>8}{'p50(ms)':>12}{'p90(ms)':>12}{'p99(ms)':>12}{'max(ms)':>12}")
+        for span, summary in sorted(hook_stats['timings'].items()):
+            print(f"  {span:<12}{summary['count']:>8}{summary['p50']:>12.2f}"
+                  f"{summary['p90']:>12.2f}{summary['p99']:>12.2f}{summary['max']:>12.2f}")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='Hook 耗时与 I/O 统计')
+    subparsers = parser.add_subparsers(dest='command')
+    stats_parser = subparsers.add_parser('stats', help='汇总耗时百分位')
+    stats_parser.add_argument('--file', type=str, help='JSONL 统计文件路径')
+    stats_parser.add_argument('--hook', type=str, help='只统计指定 hook')
+
+    args = parser.parse_args()
+    if args.command != 'stats':
+        parser.print_help()
+        return 1
+
+    if args.file:
+        jsonl_file = Path(args.file)
+    else:
+        # 脚本位置: .claude/skills/chat-record/hook_metrics.py
+        project_root = Path(__file__).resolve().parent.parent.parent.parent
+        jsonl_file = get_metrics_dir(project_root) / JSONL_FILE_NAME
+
+    if not jsonl_file.exists():
+        print(f"未找到统计文件: {jsonl_file}")
+        print(f"请设置环境变量 {METRICS_ENV}=jsonl 开启统计")
+        return 1
+
+    records = load_records(jsonl_file)
+    if args.hook:
+        records = [r for r in records if r.get('hook') == args.hook]
+    print(f"统计文件: {jsonl_file} (共 {len(records)} 条记录)")
+    print_stats(aggregate_records(records))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
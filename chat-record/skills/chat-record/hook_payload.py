@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hook 数据按需解析
+
+hook 处理器通常只用到 hook_event_name、tool_name、prompt 等少数顶层字段，
+而 tool_response 可能是数 MB 的命令输出：
+- 只扫描顶层键，找到需要的键就停止，不继续扫描后面的内容
+- 跳过的值不解码：字符串用正则直接定位结束引号，对象和数组只匹配括号
+- 字段值在第一次访问时才用 json.loads 解码，并缓存结果
+"""
+
+import re
+from collections.abc import Mapping
+
+from hook_io import parse_json
+
+
+_WHITESPACE = re.compile(rb'[ \t\r\n]*')
+# 完整的 JSON 字符串（含转义），展开写法避免逐字符回溯
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# 对象和数组内需要关注的字符：括号和字符串开始
+_STRUCTURAL = re.compile(rb'[\[\]{}"]')
+# 数字、true、false、null
+_SCALAR = re.compile(rb'[^,}\]\s]+')
+
+_OPEN_BRACKETS = (ord('{'), ord('['))
+_QUOTE = ord('"')
+
+
+def _skip_whitespace(raw, pos):
+    return _WHITESPACE.match(raw, pos).end()
+
+
+def _decode_key(token):
+    """解码键名，只有包含转义时才交给 json 解析"""
+    if b'\\' in token:
+        return parse_json(token)
+    return token[1:-1].decode('utf-8', errors='replace')
+
+
+def _skip_value(raw, pos):
+    """返回从 pos 开始的 JSON 值的结束位置，不解码内容"""
+    first = raw[pos:pos + 1]
+    if first == b'"':
+        match = _STRING.match(raw, pos)
+        if match is None:
+            raise ValueError(f"位置 {pos} 处的字符串未结束")
+        return match.end()
+
+    if first in (b'{', b'['):
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(raw, pos)
+            if match is None:
+                raise ValueError(f"位置 {pos} 处的对象或数组未结束")
+            char = raw[match.start()]
+            if char == _QUOTE:
+                string = _STRING.match(raw, match.start())
+                if string is None:
+                    raise ValueError(f"位置 {match.start()} 处的字符串未结束")
+                pos = string.end()
+                continue
+            depth += 1 if char in _OPEN_BRACKETS else -1
+            pos = match.end()
+            if depth == 0:
+                return pos
+
+    match = _SCALAR.match(raw, pos)
+    if match is None:
+        raise ValueError(f"位置 {pos} 处缺少值")
+    return match.end()
+
+
+class LazyPayload(Mapping):
+    """按需解析的 hook 数据，可以像 dict 一样使用 get、in 和 []
+
+    Args:
+        raw_data: stdin 读取的原始字节
+
+    Raises:
+        ValueError: 数据不是 JSON 对象；扫描过程中遇到的格式错误在访问字段时抛出
+    """
+
+    def __init__(self, raw_data):
+        self.raw_data = raw_data
+        pos = _skip_whitespace(raw_data, 0)
+        if raw_data[pos:pos + 1] != b'{':
+            raise ValueError("hook 数据不是 JSON 对象")
+        self._pos = pos + 1
+        self._done = False
+        self._spans = {}
+        self._values = {}
+
+    def _scan_next(self):
+        """扫描下一个顶层键值对，记录值的位置，返回键名；扫描结束返回 None"""
+        if self._done:
+            return None
+        raw = self.raw_data
+        pos = _skip_whitespace(raw, self._pos)
+        if raw[pos:pos + 1] == b'}' and not self._spans:
+            self._done = True
+            return None
+
+        match = _STRING.match(raw, pos)
+        if match is None:
+            raise ValueError(f"位置 {pos} 处应为键名")
+        key = _decode_key(match.group())
+        pos = _skip_whitespace(raw, match.end())
+        if raw[pos:pos + 1] != b':':
+            raise ValueError(f"位置 {pos} 处应为冒号")
+
+        start = _skip_whitespace(raw, pos + 1)
+        end = _skip_value(raw, start)
+        # 重复的键以第一次出现为准
+        self._spans.setdefault(key, (start, end))
+
+        pos = _skip_whitespace(raw, end)
+        separator = raw[pos:pos + 1]
+        if separator == b',':
+            pos += 1
+        elif separator == b'}':
+            self._done = True
+        else:
+            raise ValueError(f"位置 {pos} 处应为逗号或右花括号")
+        self._pos = pos
+        return key
+
+    def _find(self, key):
+        """扫描到 key 为止，返回值的位置；不存在返回 None"""
+        while key not in self._spans:
+            if self._scan_next() is None:
+                return None
+        return self._spans[key]
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        span = self._find(key)
+        if span is None:
+            raise KeyError(key)
+        value = parse_json(self.raw_data[span[0]:span[1]])
+        self._values[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._values or self._find(key) is not None
+
+    def __iter__(self):
+        while self._scan_next() is not None:
+            pass
+        return iter(list(self._spans))
+
+    def __len__(self):
+        while self._scan_next() is not None:
+            pass
+        return len(self._spans)
+
+    def __bool__(self):
+        return bool(self._spans) or self._scan_next() is not None
+
+    def to_dict(self):
+        """完整解析为 dict"""
+        return parse_json(self.raw_data)
+
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词预算
+
+把对话片段压缩到给定的 token 预算内，用于技能生成和会话总结的提示词：
+- 按字符类别估算 token 数（中日韩字符约 1 个 token，其他字符约 4 个字符 1 个 token）
+- 工具调用记录只保留工具名、截断后的输入和输出中的关键行（错误、失败、文件路径等）
+- 去掉重复的片段（规范化文本哈希）和近似重复的片段（与最近的片段比较字符二元组 Jaccard 相似度）
+- 按与问题关键词的相关度排序，依次放入直到预算用完，最终仍按原顺序输出
+"""
+
+import re
+from collections import deque
+
+
+# 估算 token 数：中日韩字符、全角标点按 1 个 token，其他字符按 4 个字符 1 个 token
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+# conversation.txt 中的消息行: "2026-01-01 10:00:00 user> ..."
+_MESSAGE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} \w+>', re.MULTILINE)
+
+# 工具输出中需要保留的关键行
+_KEY_LINE_PATTERN = re.compile(
+    r'error|exception|traceback|fail|warning|denied|not found|错误|失败|异常|警告|filePath|"file',
+    re.IGNORECASE
+)
+
+# 近似重复的判定阈值，以及近似重复比较的最近片段数
+DEDUPE_THRESHOLD = 0.8
+DEDUPE_WINDOW = 50
+# 工具输入、单个关键行的最大字符数
+MAX_TOOL_INPUT_CHARS = 200
+MAX_KEY_LINE_CHARS = 200
+# 每条工具输出最多保留的关键行数
+MAX_KEY_LINES = 5
+# 被截断的内容的标记
+TRUNCATED = '...(已截断)'
+
+
+def estimate_tokens(text):
+    """估算文本的 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text, budget):
+    """把文本截断到约 budget 个 token"""
+    if estimate_tokens(text) <= budget:
+        return text
+    # 二分查找满足预算的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) + estimate_tokens(TRUNCATED) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + TRUNCATED
+
+
+def _shorten(text, limit):
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit] + TRUNCATED
+
+
+def collapse_tool_output(text):
+    """压缩片段中的工具调用记录
+
+    chat_recorder 记录的格式为 "Tool: 名称" 后接 "  Input: ..." 和 "  Output: ..."：
+    输入截断到 MAX_TOOL_INPUT_CHARS，输出只保留关键行；不含工具调用的文本原样返回。
+    """
+    if 'Tool:' not in text:
+        return text
+
+    lines = []
+    section = None
+    key_lines = 0
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('Input:'):
+            section = 'input'
+            lines.append('  ' + _shorten(stripped, MAX_TOOL_INPUT_CHARS))
+        elif stripped.startswith('Output:'):
+            section = 'output'
+            key_lines = 0
+            body = stripped[len('Output:'):].strip()
+            # 输出通常是一整行 JSON，按转义换行拆分后查找关键行
+            candidates = [part for part in re.split(r'\\n|\n', body) if part.strip()]
+            keep = [part for part in candidates if _KEY_LINE_PATTERN.search(part)][:MAX_KEY_LINES]
+            summary = ' | '.join(_shorten(part, MAX_KEY_LINE_CHARS) for part in keep)
+            lines.append(f"  Output: {summary or _shorten(body, MAX_KEY_LINE_CHARS)}")
+            key_lines = len(keep)
+        elif section == 'output' and line[:1] in (' ', '\t') and stripped:
+            # 输出的续行只保留关键行
+            if key_lines < MAX_KEY_LINES and _KEY_LINE_PATTERN.search(stripped):
+                lines.append('    ' + _shorten(stripped, MAX_KEY_LINE_CHARS))
+                key_lines += 1
+        elif section == 'input' and line[:1] in (' ', '\t') and stripped:
+            continue
+        else:
+            section = None
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def _normalize(text):
+    return ''.join(text.lower().split())
+
+
+def _bigrams(normalized):
+    if len(normalized) < 2:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+
+
+def dedupe_snippets(snippets, threshold=DEDUPE_THRESHOLD, window=DEDUPE_WINDOW):
+    """去掉重复和近似重复的片段，保留最后出现的一个
+
+    完全相同（忽略大小写和空白）的片段按哈希去重；近似重复只与最近保留的 window 个片段比较，
+    反复出现的消息通常相隔不远，这样整段对话的去重是线性的。
+
+    Returns:
+        保留的片段下标（升序）
+    """
+    kept = []
+    seen = set()
+    recent = deque(maxlen=window)
+    for index in range(len(snippets) - 1, -1, -1):
+        normalized = _normalize(snippets[index])
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        grams = _bigrams(normalized)
+        duplicate = False
+        for other in recent:
+            # 大小相差过多的集合相似度不可能达到阈值
+            if min(len(grams), len(other)) < threshold * max(len(grams), len(other)):
+                continue
+            union = grams | other
+            if union and len(grams & other) / len(union) >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(index)
+            recent.append(grams)
+    return sorted(kept)
+
+
+def relevance(text, keywords):
+    """片段与关键词的相关度：命中的关键词数，出现次数作为次要因素"""
+    lowered = text.lower()
+    hits = [lowered.count(keyword.lower()) for keyword in keywords if keyword]
+    return sum(1 for count in hits if count) + min(sum(hits), 20) / 100
+
+
+def fit_snippets(snippets, keywords, budget, recency_weight=0.0):
+    """在预算内选择片段
+
+    Args:
+        snippets: 片段列表（按时间顺序）
+        keywords: 问题关键词，相关度高的片段优先
+        budget: token 预算
+        recency_weight: 越新的片段额外加分的权重，0 表示只按相关度排序
+
+    Returns:
+        选中的片段，保持原有顺序；第一个选中的片段超出预算时截断后放入
+    """
+    compacted = [collapse_tool_output(snippet) for snippet in snippets]
+    indexes = dedupe_snippets(compacted)
+    if not indexes:
+        return []
+
+    last = max(len(compacted) - 1, 1)
+    ranked = sorted(
+        indexes,
+        key=lambda i: (relevance(compacted[i], keywords) + recency_weight * i / last, i),
+        reverse=True
+    )
+
+    selected = {}
+    remaining = budget
+    for index in ranked:
+        cost = estimate_tokens(compacted[index])
+        if cost <= remaining:
+            selected[index] = compacted[index]
+            remaining -= cost
+        elif not selected:
+            selected[index] = truncate_to_tokens(compacted[index], remaining)
+            remaining = 0
+        if remaining <= 0:
+            break
+    return [selected[index] for index in sorted(selected)]
+
+
+def split_messages(conversation):
+    """按消息行把 conversation.txt 的内容拆分为消息（含续行）"""
+    starts = [match.start() for match in _MESSAGE_PATTERN.finditer(conversation)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts[1:] + [len(conversation)]
+    messages = [conversation[start:end].rstrip('\n') for start, end in zip(starts, bounds)]
+    return [message for message in messages if message.strip()]
+
+
+def compact_conversation(conversation, budget, keywords=()):
+    """把整段对话压缩到预算内，优先保留最近的消息和与关键词相关的消息
+
+    Returns:
+        压缩后的对话文本，消息保持原有顺序
+    """
+    if estimate_tokens(conversation) <= budget:
+        return conversation
+    messages = split_messages(conversation)
+    return '\n'.join(fit_snippets(messages, keywords, budget, recency_weight=1.0))
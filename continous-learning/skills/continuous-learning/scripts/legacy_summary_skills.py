@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Summary Skills Command - 持续学习功能
+Summary Skills Command - 持续学习功能（兼容入口）
 
 当用户输入 /summary-skills 时:
 1. 读取 .claude/conversations/current_session 对应的 conversation-xxx.txt
@@ -10,102 +10,87 @@ Summary Skills Command - 持续学习功能
 4. 根据AI_TOOL_USE的回复，总结出规律和触发点
 5. 生成新的 skill 文件并保存到 skills/learns 目录
 6. 更新状态文件,记录已处理的行数
+
+对话读取、问题分析和状态存储使用模块化脚本
+（ccscaffold/continuous-learning/skills/continuous-learning/scripts）中的
+ConversationReader、IssueAnalyzer 和 StateStore；工具调用由 tool_usage 从 chat-record 记录的
+"Tool: 名称" 行统计，不再用正则扫描 AI 回复。
+
+部署：先部署模块化持续学习脚本（.claude/skills/continuous-learning/scripts），再把本文件复制到同一目录。
+本文件不能命名为 summary_skills.py，否则会覆盖模块化脚本的同名入口。
 """
 
 import sys
-import os
-import json
 import re
 from datetime import datetime
 from pathlib import Path
 
 
-class StateManager:
+def _add_modular_scripts_path():
+    """把模块化持续学习脚本目录加入 Python 路径"""
+    script_path = Path(__file__).resolve()
+    candidates = [
+        # 部署位置: 与模块化脚本位于同一目录
+        script_path.parent,
+        # 从项目根目录运行: .claude/skills/continuous-learning/scripts
+        Path.cwd() / '.claude' / 'skills' / 'continuous-learning' / 'scripts',
+    ]
+    if len(script_path.parents) > 4:
+        # 源码位置: ccscaffold/continuous-learning/skills/continuous-learning/scripts
+        candidates.append(script_path.parents[4] / 'ccscaffold' / 'continuous-learning' / 'skills'
+                          / 'continuous-learning' / 'scripts')
+    for scripts_dir in candidates:
+        if (scripts_dir / 'issue_analyzer.py').exists():
+            if str(scripts_dir) not in sys.path:
+                sys.path.insert(0, str(scripts_dir))
+            return
+
+
+_add_modular_scripts_path()
+
+try:
+    from config import get_config
+    from conversation_reader import ConversationReader
+    from issue_analyzer import IssueAnalyzer
+    from state_store import StateStore
+    from tool_usage import ToolUsage, entry_failed, tool_name
+except ImportError as e:
+    print(f"错误: 未找到持续学习模块化脚本: {e}")
+    print("请先部署 ccscaffold/continuous-learning/skills/continuous-learning/scripts 到 "
+          ".claude/skills/continuous-learning/scripts，并把本文件复制到同一目录")
+    sys.exit(1)
+
+
+# AI 回复中的错误标记
+ERROR_MARKERS = ('error', '错误', '失败', '异常', 'warning')
+
+
+class StateManager(StateStore):
     """状态管理器 - 跟踪已处理的对话行数"""
 
     def __init__(self, project_dir):
         self.project_dir = Path(project_dir)
-        self.state_file = self.project_dir / 'skills' / 'continuous-learning' / 'state.json'
-        self.state = self._load_state()
-
-    def _load_state(self):
-        """加载状态文件"""
-        if self.state_file.exists():
-            try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"警告: 无法加载状态文件: {e}")
-                return {}
-
-        # 初始化状态
-        self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        return {}
+        super().__init__(self.project_dir / 'skills' / 'continuous-learning' / 'state.json')
 
     def get_last_processed_line(self, conversation_file_name):
         """获取指定对话文件上次处理的行数"""
-        return self.state.get(conversation_file_name, {}).get('last_line', 0)
+        return self.get_last_line(conversation_file_name)
 
     def update_last_processed_line(self, conversation_file_name, line_number, skill_name):
-        """
-        更新指定对话文件的处理行数
-
-        Args:
-            conversation_file_name: 对话文件名
-            line_number: 已处理的行数
-            skill_name: 生成的 skill 名称
-        """
-        if conversation_file_name not in self.state:
-            self.state[conversation_file_name] = {
-                'last_line': line_number,
-                'skills_generated': [],
-                'first_analyzed': datetime.now().isoformat(),
-                'last_analyzed': datetime.now().isoformat()
-            }
-        else:
-            self.state[conversation_file_name]['last_line'] = line_number
-            self.state[conversation_file_name]['last_analyzed'] = datetime.now().isoformat()
-
-        # 记录生成的 skill
-        if skill_name:
-            self.state[conversation_file_name]['skills_generated'].append({
-                'name': skill_name,
-                'generated_at': datetime.now().isoformat(),
-                'processed_line': line_number
-            })
-
-        self._save_state()
-
-    def _save_state(self):
-        """保存状态到文件"""
-        try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"警告: 无法保存状态文件: {e}")
-
-    def get_summary(self):
-        """获取状态摘要"""
-        summary = {
-            'total_conversations': len(self.state),
-            'total_skills': sum(
-                len(conv.get('skills_generated', []))
-                for conv in self.state.values()
-            )
-        }
-        return summary
+        """更新指定对话文件的处理行数"""
+        self.update(conversation_file_name, line_number, skill_name)
 
 
 class ConversationAnalyzer:
-    """对话分析器"""
+    """对话分析器（兼容接口）"""
 
     def __init__(self, conversation_file, state_manager):
         self.conversation_file = Path(conversation_file)
         self.state_manager = state_manager
-        self.conversation_text = ""
+        self.entries = []
         self.start_line = 0
-        self.total_lines = 0
-        self.retry_threshold = 3
+        self.config = get_config()
+        self.retry_threshold = self.config.retry_threshold
 
     def load_conversation(self):
         """加载对话记录,从上次处理的行数开始"""
@@ -117,181 +102,81 @@ class ConversationAnalyzer:
         conv_name = self.conversation_file.name
         self.start_line = self.state_manager.get_last_processed_line(conv_name)
 
-        with open(self.conversation_file, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
-
-        self.total_lines = len(all_lines)
-
-        # 从上次处理的行数开始读取
-        if self.start_line > 0:
-            print(f"从第 {self.start_line} 行开始读取(共 {self.total_lines} 行)")
-            self.conversation_text = ''.join(all_lines[self.start_line:])
-        else:
-            print(f"读取完整对话文件(共 {self.total_lines} 行)")
-            self.conversation_text = ''.join(all_lines)
-
+        reader = ConversationReader(self.conversation_file, sys.maxsize)
+        self.entries = reader.read_latest(self.start_line)
         print(f"已加载对话文件: {self.conversation_file}")
 
         # 检查是否有新内容
-        if self.start_line >= self.total_lines:
+        if not self.entries:
             print("没有新的对话内容需要分析")
             return False
 
-        new_lines = self.total_lines - self.start_line
-        print(f"新增 {new_lines} 行需要分析")
-
         return True
 
     def get_line_number_of_last_user_message(self):
         """获取最后一个用户消息在文件中的行号"""
-        if not self.conversation_text:
-            return self.start_line
-
-        lines = self.conversation_text.split('\n')
-        last_user_line = 0
-
-        for i, line in enumerate(lines):
-            if line.strip().startswith('user>'):
-                last_user_line = i
-
-        # 返回绝对行号
-        return self.start_line + last_user_line + 1
+        for entry in reversed(self.entries):
+            if entry.sender == 'user':
+                return entry.line_number
+        return self.start_line
 
     def analyze_retry_patterns(self):
         """
         分析反复修改的模式
 
-        检测用户反复要求修复同一个问题的情况(>=3次)
+        检测用户反复要求修复同一个问题的情况(>=3次)，每条用户消息附带其后的 AI 回复和工具调用
         """
-        lines = self.conversation_text.split('\n')
-
-        # 提取用户消息和AI响应
-        user_messages = []
-        ai_responses = []
-
-        current_user_msg = None
-        current_ai_response = []
-        in_ai_response = False
-
-        for line in lines:
-            if line.strip().startswith('user>'):
-                # 保存之前的AI响应
-                if current_user_msg and current_ai_response:
-                    ai_responses.append({
-                        'user_msg': current_user_msg,
-                        'ai_response': '\n'.join(current_ai_response)
-                    })
-
-                current_user_msg = line.split('user>', 1)[1].strip()
-                current_ai_response = []
-                in_ai_response = False
-            elif line.strip().startswith('assistant>') or line.strip().startswith('ai>'):
-                in_ai_response = True
-                content = line.split('>', 1)[1].strip() if '>' in line else ''
-                if content:
-                    current_ai_response.append(content)
-            elif in_ai_response:
-                current_ai_response.append(line)
-
-        # 保存最后一个AI响应
-        if current_user_msg and current_ai_response:
-            ai_responses.append({
-                'user_msg': current_user_msg,
-                'ai_response': '\n'.join(current_ai_response)
-            })
+        analyzer = IssueAnalyzer(self.retry_threshold, self.config.keywords)
+        patterns = analyzer.analyze(self.entries)
 
-        # 检测反复修复的模式
-        retry_patterns = []
+        # 用户消息在条目列表中的位置，用于找到其后的 AI 回复
+        positions = {id(entry): i for i, entry in enumerate(self.entries)}
 
-        # 查找包含修复关键词的用户消息
-        retry_keywords = [
-            r'修复', r'修正', r'解决', r'还是不行', r'还是有问题',
-            r'继续', r'再试', r'再次', r'仍然', r'fix', r'error',
-            r'失败', r'不正确', r'错误', r'问题'
-        ]
-
-        for i, response in enumerate(ai_responses):
-            user_msg = response['user_msg']
-
-            # 检查是否包含修复关键词
-            is_retry = any(re.search(keyword, user_msg, re.IGNORECASE)
-                          for keyword in retry_keywords)
-
-            if is_retry:
-                # 查找之前是否有相关的修复尝试
-                retry_count = 1
-                context_messages = []
-
-                # 向前查找相关的修复尝试
-                for j in range(i - 1, max(0, i - 10), -1):
-                    prev_user_msg = ai_responses[j]['user_msg']
-                    if any(re.search(keyword, prev_user_msg, re.IGNORECASE)
-                          for keyword in retry_keywords):
-                        retry_count += 1
-                        context_messages.insert(0, ai_responses[j])
-                    else:
+        retry_patterns = []
+        for pattern in patterns:
+            messages = []
+            for user_entry in pattern.user_messages:
+                replies, usage = [], ToolUsage()
+                for entry in self.entries[positions[id(user_entry)] + 1:]:
+                    if entry.sender == 'user':
                         break
-
-                # 如果修复次数达到阈值
-                if retry_count >= self.retry_threshold:
-                    context_messages.append(response)
-                    retry_patterns.append({
-                        'retry_count': retry_count,
-                        'messages': context_messages,
-                        'issue_topic': self._extract_issue_topic(user_msg)
-                    })
+                    name = tool_name(entry)
+                    if name is not None:
+                        usage.add(name, entry_failed(entry))
+                    else:
+                        replies.append(entry.content)
+                messages.append({
+                    'user_msg': user_entry.content,
+                    'ai_response': '\n'.join(replies),
+                    'tools': usage.sequence,
+                    'tool_usage': usage
+                })
+            retry_patterns.append({
+                'retry_count': pattern.occurrences,
+                'messages': messages,
+                'issue_topic': pattern.topic
+            })
 
         return retry_patterns
 
-    def _extract_issue_topic(self, message):
-        """提取问题主题"""
-        # 移除常见的修复关键词,提取核心问题
-        clean_msg = re.sub(
-            r'(修复|修正|解决|还是|仍然|继续|再次|仍有|还有|请|帮我|能不能)',
-            '',
-            message,
-            flags=re.IGNORECASE
-        )
-        return clean_msg.strip()[:100]
-
     def analyze_ai_tool_use(self, retry_pattern):
         """
         分析 AI_TOOL_USE 的回复,总结规律和触发点
         """
-        messages = retry_pattern['messages']
-
-        # 分析所有AI响应,查找工具使用模式
         tool_patterns = []
 
-        for msg in messages:
-            ai_response = msg['ai_response']
-
-            # 查找工具调用模式
-            tool_calls = re.findall(
-                r'(\w+)\s*\(.*?\)',
-                ai_response,
-                re.DOTALL
-            )
-
-            # 查找错误模式
-            error_patterns = re.findall(
-                r'(error|错误|失败|异常|warning)',
-                ai_response,
-                re.IGNORECASE
-            )
-
-            # 查找文件操作模式
-            file_operations = re.findall(
-                r'(Read|Write|Edit|Grep|Glob)\s*\([^)]+\)',
-                ai_response
-            )
-
-            if tool_calls or file_operations:
-                tool_patterns.append({
-                    'tools': tool_calls,
-                    'errors': error_patterns,
-                    'file_ops': file_operations
-                })
+        for msg in retry_pattern['messages']:
+            usage = msg.get('tool_usage')
+            if not usage:
+                continue
+            response = msg['ai_response'].lower()
+            errors = [marker for marker in ERROR_MARKERS if marker in response]
+            errors.extend(f"{name} 失败" for name in usage.failures)
+            tool_patterns.append({
+                'tools': usage.sequence,
+                'errors': errors,
+                'file_ops': usage.file_operations()
+            })
 
         return tool_patterns
 
@@ -457,7 +342,7 @@ tags: [auto-generated, fix-pattern, retry-{retry_count}]
 
         if not retry_patterns:
             print("\n未检测到需要总结的反复修复模式")
-            print("需要用户反复要求修复同一个问题 >= 3 次才会触发")
+            print(f"需要用户反复要求修复同一个问题 >= {self.retry_threshold} 次才会触发")
             return 0
 
         # 为每个模式生成 skill
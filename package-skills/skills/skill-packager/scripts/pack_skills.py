@@ -6,10 +6,12 @@ Claude Code 组件打包工具
 """
 
 import argparse
+import hashlib
 import json
 import os
 import shutil
 import sys
+import zipfile
 from pathlib import Path
 from typing import List, Dict, Optional
 
@@ -23,6 +25,19 @@ from ccscaffold.utils import (
 )
 
 
+# 包内由打包工具生成的文件，不参与增量同步
+GENERATED_FILES = {"manifest.json", "install.py"}
+
+
+def file_sha256(path: Path) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 class ComponentPackager:
     """Claude Code 组件打包器"""
 
@@ -355,8 +370,20 @@ class ComponentPackager:
                 print("\n[信息] 已取消")
                 return []
 
-    def create_package(self, components: List[Dict], output_name: str = None) -> Optional[Path]:
-        """创建打包文件"""
+    def create_package(self, components: List[Dict], output_name: str = None,
+                       incremental: bool = True, bundle_format: str = "dir") -> Optional[Path]:
+        """创建打包文件
+
+        Args:
+            components: 要打包的组件
+            output_name: 输出包名称
+            incremental: 增量构建，只复制内容变化的文件并删除多余文件；
+                为 False 时清空包目录后全量复制
+            bundle_format: dir 输出包目录；zip 额外生成可直接运行安装的单文件包
+
+        Returns:
+            包目录，zip 格式时返回单文件包路径
+        """
         if not components:
             print("[错误] 没有选择任何组件")
             return None
@@ -378,39 +405,19 @@ class ComponentPackager:
         package_dir = self.dist_dir / output_name
         package_dir.mkdir(exist_ok=True)
 
-        # 清空包目录
-        for item in package_dir.iterdir():
-            if item.is_dir():
-                shutil.rmtree(item)
-            else:
-                item.unlink()
-
-        # 按类型复制组件
-        for comp in components:
-            comp_type = comp.get('type', self.component_type)
-
-            # 检查是否是单个文件（如 hook 文件）
-            if comp.get('is_file'):
-                # 单个文件直接复制
-                dest_dir = package_dir / ".claude-hooks"
-                dest_dir.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(comp['path'], dest_dir / comp['path'].name)
-            elif comp.get('is_config'):
-                # 配置类型（如 commands），不需要复制文件
-                pass
-            else:
-                # 目录类型的组件
-                type_dir = comp_type if comp_type in self.COMPONENT_TYPES else self.component_type
-                dest_dir = package_dir / type_dir / comp['name']
-                dest_dir.mkdir(parents=True, exist_ok=True)
+        if not incremental:
+            # 清空包目录
+            for item in package_dir.iterdir():
+                if item.is_dir():
+                    shutil.rmtree(item)
+                else:
+                    item.unlink()
 
-                # 复制所有文件
-                if comp.get('path'):
-                    for item in comp['path'].iterdir():
-                        if item.is_dir():
-                            shutil.copytree(item, dest_dir / item.name, dirs_exist_ok=True)
-                        else:
-                            shutil.copy2(item, dest_dir / item.name)
+        # 按类型同步组件文件
+        previous = self._load_manifest(package_dir)
+        files = self._sync_package_files(
+            package_dir, self._collect_package_files(components), previous.get("files", {})
+        )
 
         # 创建清单文件
         manifest = {
@@ -426,34 +433,171 @@ class ComponentPackager:
                 }
                 for c in components
             ],
-            "install_command": f"{self.python_command} {output_name}/install.py"
+            "install_command": f"{self.python_command} {output_name}/install.py",
+            "files": files
         }
 
-        manifest_file = package_dir / "manifest.json"
-        with open(manifest_file, "w", encoding="utf-8") as f:
-            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        # 内容未变时不重写清单，保持无改动重打包只有 stat 开销
+        if manifest != previous:
+            manifest_file = package_dir / "manifest.json"
+            with open(manifest_file, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
 
         # 创建安装脚本
         self._create_install_script(package_dir)
 
-        print(f"\n[成功] 包已创建: {package_dir}")
+        if bundle_format == "zip":
+            bundle = self.dist_dir / f"{output_name}.zip"
+            if manifest != previous or not bundle.exists():
+                self._create_bundle(package_dir, manifest, bundle)
+            print(f"\n[成功] 单文件包已创建: {bundle}")
+        else:
+            print(f"\n[成功] 包已创建: {package_dir}")
         print(f"       共包含 {len(components)} 个组件")
         print(f"       Python命令: {self.python_command}")
 
-        return package_dir
+        return bundle if bundle_format == "zip" else package_dir
+
+    def _collect_package_files(self, components: List[Dict]) -> Dict[str, str]:
+        """列出包内每个文件的相对路径及其源文件路径"""
+        files = {}
+        for comp in components:
+            comp_type = comp.get('type', self.component_type)
+
+            # 检查是否是单个文件（如 hook 文件）
+            if comp.get('is_file'):
+                files[f".claude-hooks/{comp['path'].name}"] = str(comp['path'])
+            elif comp.get('is_config'):
+                # 配置类型（如 commands），不需要复制文件
+                pass
+            elif comp.get('path'):
+                # 目录类型的组件
+                type_dir = comp_type if comp_type in self.COMPONENT_TYPES else self.component_type
+                prefix = f"{type_dir}/{comp['name']}/"
+                comp_dir = str(comp['path'])
+                for dirpath, dirnames, filenames in os.walk(comp_dir):
+                    dirnames.sort()
+                    rel_dir = os.path.relpath(dirpath, comp_dir).replace(os.sep, "/")
+                    rel_dir = "" if rel_dir == "." else rel_dir + "/"
+                    for filename in sorted(filenames):
+                        files[prefix + rel_dir + filename] = os.path.join(dirpath, filename)
+        return files
+
+    def _load_manifest(self, package_dir: Path) -> Dict:
+        """读取上次打包生成的清单"""
+        manifest_file = package_dir / "manifest.json"
+        if not manifest_file.exists():
+            return {}
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _sync_package_files(self, package_dir: Path, files: Dict[str, str],
+                            previous: Dict[str, Dict]) -> Dict[str, Dict]:
+        """将源文件同步到包目录
+
+        大小和修改时间都与上次记录一致的文件直接跳过，不读取内容；
+        其余文件计算哈希，内容未变时只更新记录，变化时才复制。
+        包目录中不再属于任何组件的文件会被删除。
+
+        Args:
+            files: {包内相对路径: 源文件路径}
+            previous: 上次清单中的文件记录
+
+        Returns:
+            文件清单 {相对路径: {"sha256", "size", "mtime"}}
+        """
+        manifest = {}
+        copied = unchanged = removed = 0
+
+        for rel_path, src in files.items():
+            dest = os.path.join(package_dir, rel_path)
+            src_stat = os.stat(src)
+            record = previous.get(rel_path)
+            try:
+                dest_stat = os.stat(dest)
+            except OSError:
+                dest_stat = None
+            # 目标与上次记录一致，说明包内文件未被改动过
+            dest_intact = bool(record and dest_stat and os.path.isfile(dest)
+                               and dest_stat.st_size == record["size"]
+                               and dest_stat.st_mtime == record["mtime"])
+
+            if dest_intact and src_stat.st_size == record["size"] and src_stat.st_mtime == record["mtime"]:
+                manifest[rel_path] = record
+                unchanged += 1
+                continue
+
+            digest = file_sha256(src)
+            if dest_intact and record["sha256"] == digest:
+                # 内容未变（如仅 touch 过），同步修改时间
+                shutil.copystat(src, dest)
+                unchanged += 1
+            else:
+                if os.path.isdir(dest):
+                    shutil.rmtree(dest)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                shutil.copy2(src, dest)
+                copied += 1
+            manifest[rel_path] = {"sha256": digest, "size": src_stat.st_size, "mtime": src_stat.st_mtime}
+
+        # 删除不再需要的文件和空目录
+        root = str(package_dir)
+        for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+            rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+            rel_dir = "" if rel_dir == "." else rel_dir + "/"
+            for filename in filenames:
+                rel_path = rel_dir + filename
+                if rel_path not in files and rel_path not in GENERATED_FILES:
+                    os.unlink(os.path.join(dirpath, filename))
+                    removed += 1
+            if rel_dir and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+        print(f"[信息] 复制 {copied} 个文件, 未变化 {unchanged} 个, 删除 {removed} 个")
+        return manifest
+
+    def _create_bundle(self, package_dir: Path, manifest: Dict, bundle: Path) -> None:
+        """生成 zip 单文件包
+
+        manifest.json 为第一个条目，随后是安装入口 __main__.py 和各组件文件，
+        安装时按顺序流式读取即可，可通过 `python <包>.zip` 直接安装。
+        """
+        bundle_manifest = dict(manifest, install_command=f"{self.python_command} {bundle.name}")
+        tmp_bundle = bundle.with_name(bundle.name + ".tmp")
+        with zipfile.ZipFile(tmp_bundle, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("manifest.json", json.dumps(bundle_manifest, ensure_ascii=False, indent=2))
+            zf.writestr("__main__.py", self._build_install_script())
+            for rel_path in sorted(manifest["files"]):
+                zf.write(package_dir / rel_path, rel_path)
+        os.replace(tmp_bundle, bundle)
 
     def _create_install_script(self, package_dir: Path) -> None:
         """创建安装脚本"""
         install_script = package_dir / "install.py"
+        script_content = self._build_install_script()
+        if not install_script.exists() or install_script.read_text(encoding="utf-8") != script_content:
+            install_script.write_text(script_content, encoding="utf-8")
 
-        script_content = f'''#!/usr/bin/env python3
+    def _build_install_script(self) -> str:
+        """生成安装脚本内容，包目录中的 install.py 和 zip 包的 __main__.py 共用"""
+        return f'''#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Claude Code 组件包安装脚本"""
+"""Claude Code 组件包安装脚本
+
+用法:
+    python <包目录>/install.py
+    python <包>.zip
+"""
 
+import hashlib
 import json
 import os
 import shutil
 import sys
+import zipfile
 from pathlib import Path
 
 
@@ -461,16 +605,103 @@ from pathlib import Path
 PYTHON_COMMAND = "{self.python_command}"
 
 
+class PackageSource:
+    """包内容来源：包目录或 zip 单文件包"""
+
+    def __init__(self, package_path):
+        self.package_path = package_path
+        self.archive = zipfile.ZipFile(package_path) if package_path.is_file() else None
+
+    def read_manifest(self):
+        """读取清单"""
+        if self.archive is not None:
+            return json.loads(self.archive.read("manifest.json").decode("utf-8"))
+        with open(self.package_path / "manifest.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def list_files(self, manifest, prefix):
+        """列出包内指定前缀下的文件 {{相对路径: 文件记录}}"""
+        files = manifest.get("files")
+        if files is None:
+            # 旧版本清单没有文件记录，扫描包目录
+            files = {{
+                path.relative_to(self.package_path).as_posix(): {{}}
+                for path in self.package_path.rglob("*") if path.is_file()
+            }}
+        return {{rel: record for rel, record in sorted(files.items()) if rel.startswith(prefix)}}
+
+    def open(self, rel_path):
+        """以二进制流打开包内文件"""
+        if self.archive is not None:
+            return self.archive.open(rel_path)
+        return open(self.package_path / rel_path, "rb")
+
+
+def file_sha256(path):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_up_to_date(dest, record):
+    """目标文件与包内记录的大小和哈希一致时无需重新写入"""
+    if not record or not dest.is_file():
+        return False
+    if dest.stat().st_size != record.get("size"):
+        return False
+    return file_sha256(dest) == record.get("sha256")
+
+
+def extract_file(source, rel_path, dest, record):
+    """流式写入单个文件，先写临时文件再原子替换"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = dest.with_name(dest.name + ".tmp")
+    with source.open(rel_path) as src, open(tmp_file, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp_file, dest)
+    if record.get("mtime"):
+        os.utime(dest, (record["mtime"], record["mtime"]))
+
+
+def sync_component(source, files, prefix, dest_dir):
+    """将包内 prefix 下的文件同步到 dest_dir，删除旧版本遗留的文件
+
+    Returns:
+        (写入文件数, 跳过文件数)
+    """
+    written = skipped = 0
+    expected = set()
+    for rel_path, record in files.items():
+        sub_path = rel_path[len(prefix):]
+        expected.add(sub_path)
+        dest = dest_dir / sub_path
+        if is_up_to_date(dest, record):
+            skipped += 1
+            continue
+        extract_file(source, rel_path, dest, record)
+        written += 1
+
+    for path in sorted(dest_dir.rglob("*"), reverse=True):
+        if path.is_dir():
+            if not any(path.iterdir()):
+                path.rmdir()
+        elif path.relative_to(dest_dir).as_posix() not in expected:
+            path.unlink()
+    return written, skipped
+
+
 def install():
     """安装组件到当前项目"""
     project_dir = Path.cwd()
     claude_dir = project_dir / ".claude"
     settings_file = claude_dir / "settings.json"
 
-    # 读取清单
-    manifest_file = Path(__file__).parent / "manifest.json"
-    with open(manifest_file, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
+    # 作为 zip 包运行时 __file__ 为 <包>.zip/__main__.py
+    source = PackageSource(Path(os.path.abspath(__file__)).parent)
+    manifest = source.read_manifest()
 
     print("=" * 70)
     print(f"安装包: {{manifest['package']}}")
@@ -497,28 +728,23 @@ def install():
 
         if comp_type == 'skills':
             dest_dir = claude_dir / "skills" / comp_name
-            src_dir = Path(__file__).parent / "skills" / comp_name
         elif comp_type == 'hooks':
             # hooks 可能在 .claude-hooks 目录
-            dest_dir = project_dir / ".claude-hooks"
-            src_file = Path(__file__).parent / ".claude-hooks" / f"{{comp_name}}.py"
-            if src_file.exists():
-                dest_dir.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(src_file, dest_dir / src_file.name)
-                # 更新settings.json以注册hooks
-                if "hooks" not in settings:
-                    settings["hooks"] = {{}}
+            rel_path = f".claude-hooks/{{comp_name}}.py"
+            files = source.list_files(manifest, rel_path)
+            if rel_path in files:
+                dest_file = project_dir / rel_path
+                if not is_up_to_date(dest_file, files[rel_path]):
+                    extract_file(source, rel_path, dest_file, files[rel_path])
                 # 这里需要根据实际的hook类型来配置
                 # 简化处理：提示用户手动配置
                 print(f"[安装] {{comp_type}}: {{comp_name}} -> .claude-hooks/")
                 print(f"[提示] 请手动在 settings.json 中配置此hook")
-                continue
             else:
-                print(f"[跳过] 源文件不存在: {{src_file}}")
-                continue
+                print(f"[跳过] 源文件不存在: {{rel_path}}")
+            continue
         elif comp_type == 'agents':
             dest_dir = claude_dir / "agents" / comp_name
-            src_dir = Path(__file__).parent / "agents" / comp_name
         elif comp_type == 'commands':
             # commands通常是skill的一部分，跳过
             print(f"[信息] {{comp_type}}: {{comp_name}} (已包含在skill配置中)")
@@ -527,17 +753,15 @@ def install():
             print(f"[跳过] 未知类型: {{comp_type}}")
             continue
 
-        if not src_dir.exists():
-            print(f"[警告] 源目录不存在: {{src_dir}}")
+        prefix = f"{{comp_type}}/{{comp_name}}/"
+        files = source.list_files(manifest, prefix)
+        if not files:
+            print(f"[警告] 包内不存在组件文件: {{prefix}}")
             continue
 
-        # 删除旧版本
-        if dest_dir.exists():
-            shutil.rmtree(dest_dir)
-
-        # 复制组件
-        shutil.copytree(src_dir, dest_dir)
-        print(f"[安装] {{comp_type}}: {{comp_name}}")
+        # 只写入内容有变化的文件
+        written, skipped = sync_component(source, files, prefix, dest_dir)
+        print(f"[安装] {{comp_type}}: {{comp_name}} (写入 {{written}} 个文件, 跳过 {{skipped}} 个未变化文件)")
 
         # 更新settings（如果是skill）
         if comp_type == 'skills':
@@ -569,7 +793,7 @@ def install():
 
     # 保存settings
     with open(settings_file, "w", encoding="utf-8") as f:
-        json.dump(settings, ensure_ascii=False, indent=2)
+        json.dump(settings, f, ensure_ascii=False, indent=2)
 
     print("\\n" + "=" * 70)
     print("[成功] 组件安装完成!")
@@ -582,15 +806,16 @@ if __name__ == "__main__":
     install()
 '''
 
-        install_script.write_text(script_content, encoding="utf-8")
-
-    def get_install_command(self, package_dir: Path, target_project: str = ".") -> str:
+    def get_install_command(self, package_dir: Path, target_project: str = ".",
+                            python_cmd: str = "python") -> str:
         """获取安装命令"""
         relative_path = package_dir.relative_to(self.project_dir)
+        # zip 单文件包可直接运行
+        install_target = relative_path if package_dir.suffix == ".zip" else f"{relative_path}/install.py"
         if target_project == ".":
-            return f"python {relative_path}/install.py"
+            return f"{python_cmd} {install_target}"
         else:
-            return f"cd {target_project} && python ../{relative_path}/install.py"
+            return f"cd {target_project} && {python_cmd} ../{install_target}"
 
 
 def parse_arguments():
@@ -631,6 +856,17 @@ def parse_arguments():
         "-o", "--output",
         help="输出包名称"
     )
+    parser.add_argument(
+        "--format",
+        choices=["dir", "zip"],
+        default="dir",
+        help="输出格式: dir 包目录（默认），zip 可直接运行安装的单文件包"
+    )
+    parser.add_argument(
+        "--clean",
+        action="store_true",
+        help="清空包目录后全量重新打包（默认增量打包，只复制变化的文件）"
+    )
     parser.add_argument(
         "--non-interactive",
         action="store_true",
@@ -696,7 +932,8 @@ def main():
         output_name = args.output or f"ccscaffold-function-{function_key}"
 
         # 创建包
-        package_dir = packager.create_package(components, output_name)
+        package_dir = packager.create_package(components, output_name, incremental=not args.clean,
+                                               bundle_format=args.format)
         if package_dir:
             print("\n" + "=" * 80)
             print("打包完成!".center(80))
@@ -704,9 +941,9 @@ def main():
             print(f"\n功能: {function_name} ({function_key})")
             print(f"Python命令: {python_cmd}")
             print("\n安装命令:")
-            print(f"  {python_cmd} {package_dir.relative_to(project_dir)}/install.py")
+            print(f"  {packager.get_install_command(package_dir, python_cmd=python_cmd)}")
             print("\n或复制到其他项目后运行:")
-            print(f"  {python_cmd} <package>/install.py")
+            print(f"  {python_cmd} {'<package>.zip' if args.format == 'zip' else '<package>/install.py'}")
             print("=" * 80)
 
     else:
@@ -755,16 +992,17 @@ def main():
         packager.set_python_command(python_cmd)
 
         # 创建包
-        package_dir = packager.create_package(selected, args.output)
+        package_dir = packager.create_package(selected, args.output, incremental=not args.clean,
+                                               bundle_format=args.format)
         if package_dir:
             print("\n" + "=" * 80)
             print("打包完成!".center(80))
             print("=" * 80)
             print(f"\nPython命令: {python_cmd}")
             print("\n安装命令:")
-            print(f"  {python_cmd} {package_dir.relative_to(project_dir)}/install.py")
+            print(f"  {packager.get_install_command(package_dir, python_cmd=python_cmd)}")
             print("\n或复制到其他项目后运行:")
-            print(f"  {python_cmd} <package>/install.py")
+            print(f"  {python_cmd} {'<package>.zip' if args.format == 'zip' else '<package>/install.py'}")
             print("=" * 80)
 
     return 0
@@ -12,6 +12,32 @@ import json
 import subprocess
 from pathlib import Path
 
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ccscaffold.utils import (
+    STOP_HOOK_TIMEOUT,
+    SourceCache,
+    apply_settings,
+    expand_targets,
+    latest_snapshot_name,
+    new_snapshot_name,
+    print_fleet_report,
+    rollback,
+    run_fleet,
+    staged_install,
+)
+
+
+# 以暂存方式部署并保留快照的目录（相对目标项目根目录）
+DEPLOY_DIRS = [
+    ('.claude', 'skills', 'chat-record'),
+    ('.claude', 'skills', 'continuous-learning'),
+    ('.claude', 'scripts', 'hooks', 'chat-record'),
+    ('.claude', 'scripts', 'hooks', 'continuous-learning'),
+    ('.claude', 'scripts', 'hooks', 'console-cleaner'),
+]
+
 
 def get_ccscaffold_root():
     """获取 CC-Scaffold 根目录"""
@@ -74,8 +100,86 @@ def select_python_command():
             print("请输入数字")
 
 
-def deploy_to_target(target_dir, python_cmd=None):
-    """部署功能到目标目录"""
+def deploy_dir(sources, src, dst, snapshot_name, finalize=None):
+    """将源目录暂存同步到目标目录
+
+    先在同级暂存目录中同步并执行 finalize 后处理，内容有变化时再整体切换，
+    被替换的版本以硬链接快照保留，可通过 --rollback 恢复。
+    """
+    def populate(staging):
+        stats = sources.tree(src).sync_to(staging)
+        if finalize is not None:
+            finalize(staging)
+        return stats
+
+    return staged_install(dst, populate, snapshot_name=snapshot_name)
+
+
+def fix_skill_json(skill_dir, python_cmd):
+    """修复 skill.json 中的 handler 路径，写临时文件后替换，不改动共享的硬链接文件"""
+    skill_json = skill_dir / 'skill.json'
+    if not skill_json.exists():
+        return
+    with open(skill_json, 'r', encoding='utf-8') as f:
+        skill_config = json.load(f)
+    # 修复 handler 路径
+    if 'commands' in skill_config:
+        for cmd in skill_config['commands']:
+            if 'handler' in cmd:
+                # 将 ${PROJECT_DIR}/skills 替换为实际路径
+                cmd['handler'] = cmd['handler'].replace(
+                    'python3 ${PROJECT_DIR}/skills/',
+                    f'{python_cmd} .claude/skills/'
+                )
+    tmp_file = skill_json.with_name('skill.json.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(skill_config, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, skill_json)
+
+
+def build_settings_config(python_cmd):
+    """CC-Scaffold 需要写入 settings.json 的 hooks 配置（使用用户选择的 Python 命令）
+
+    每个事件只注册 hook_dispatcher，由它在同一进程内调用会话记录、会话总结、
+    持续学习和 console 清理等处理器，每次工具调用只启动一个 Python 进程。
+    """
+    dispatcher = {
+        "type": "command",
+        "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py"
+    }
+    return {
+        "hooks": {
+            "SessionStart": [
+                {"matcher": "*", "hooks": [dispatcher], "description": "创建新对话记录文件"}
+            ],
+            "UserPromptSubmit": [
+                {"matcher": "*", "hooks": [dispatcher], "description": "记录用户输入"}
+            ],
+            "PostToolUse": [
+                {"matcher": "*", "hooks": [dispatcher], "description": "记录AI工具调用"}
+            ],
+            "Stop": [
+                {
+                    "matcher": "*",
+                    "hooks": [dict(dispatcher, timeout=STOP_HOOK_TIMEOUT)],
+                    "description": "会话结束处理：总结、持续学习、清理console.log"
+                }
+            ]
+        }
+    }
+
+
+def deploy_to_target(target_dir, python_cmd=None, sources=None):
+    """部署功能到目标目录
+
+    Args:
+        target_dir: 目标项目目录
+        python_cmd: Python 命令，未指定时交互选择
+        sources: 源文件缓存，批量部署时多个目标共享，避免重复读取源文件
+    """
+    if sources is None:
+        sources = SourceCache()
+    snapshot_name = new_snapshot_name()
     ccscaffold_root = get_ccscaffold_root()
     target_root = Path(target_dir).resolve()
 
@@ -109,37 +213,19 @@ def deploy_to_target(target_dir, python_cmd=None):
     chat_recorder_src = ccscaffold_root / '.claude' / 'skills' / 'chat-record'
     chat_recorder_dst = target_skills / 'chat-record'
 
-    if chat_recorder_dst.exists():
-        shutil.rmtree(chat_recorder_dst)
-    shutil.copytree(chat_recorder_src, chat_recorder_dst)
-    print(f"   ✓ chat-record skill 已部署")
+    stats = deploy_dir(sources, chat_recorder_src, chat_recorder_dst, snapshot_name)
+    print(f"   ✓ chat-record skill 已部署 ({stats})")
 
     # 2. 部署 continuous-learning skill
     print("2. 部署持续学习功能...")
     continuous_learning_src = ccscaffold_root / '.claude' / 'skills' / 'continuous-learning'
     continuous_learning_dst = target_skills / 'continuous-learning'
 
-    if continuous_learning_dst.exists():
-        shutil.rmtree(continuous_learning_dst)
-    shutil.copytree(continuous_learning_src, continuous_learning_dst)
-
-    # 修复 skill.json 中的 handler 路径
-    skill_json = continuous_learning_dst / 'skill.json'
-    if skill_json.exists():
-        with open(skill_json, 'r', encoding='utf-8') as f:
-            skill_config = json.load(f)
-        # 修复 handler 路径
-        if 'commands' in skill_config:
-            for cmd in skill_config['commands']:
-                if 'handler' in cmd:
-                    # 将 ${PROJECT_DIR}/skills 替换为实际路径
-                    cmd['handler'] = cmd['handler'].replace(
-                        'python3 ${PROJECT_DIR}/skills/',
-                        f'{python_cmd} .claude/skills/'
-                    )
-        with open(skill_json, 'w', encoding='utf-8') as f:
-            json.dump(skill_config, f, ensure_ascii=False, indent=2)
-    print(f"   ✓ continuous-learning skill 已部署")
+    cl_stats = deploy_dir(
+        sources, continuous_learning_src, continuous_learning_dst, snapshot_name,
+        finalize=lambda staging: fix_skill_json(staging, python_cmd)
+    )
+    print(f"   ✓ continuous-learning skill 已部署 ({cl_stats})")
 
     # 3. 部署 hooks
     print("3. 部署 hooks...")
@@ -147,29 +233,23 @@ def deploy_to_target(target_dir, python_cmd=None):
     hooks_src = ccscaffold_root / '.claude' / 'scripts' / 'hooks' / 'chat-record'
     hooks_dst = target_scripts_hooks / 'chat-record'
 
-    if hooks_dst.exists():
-        shutil.rmtree(hooks_dst)
-    shutil.copytree(hooks_src, hooks_dst)
-    print(f"   ✓ chat-record hooks 已部署")
+    stats = deploy_dir(sources, hooks_src, hooks_dst, snapshot_name)
+    print(f"   ✓ chat-record hooks 已部署 ({stats})")
 
     # 部署 continuous-learning hooks
     cl_hooks_src = ccscaffold_root / '.claude' / 'scripts' / 'hooks' / 'continuous-learning'
     cl_hooks_dst = target_scripts_hooks / 'continuous-learning'
 
-    if cl_hooks_dst.exists():
-        shutil.rmtree(cl_hooks_dst)
-    shutil.copytree(cl_hooks_src, cl_hooks_dst)
-    print(f"   ✓ continuous-learning hooks 已部署")
+    stats = deploy_dir(sources, cl_hooks_src, cl_hooks_dst, snapshot_name)
+    print(f"   ✓ continuous-learning hooks 已部署 ({stats})")
 
     # 部署 console-cleaner hooks
     console_hooks_src = ccscaffold_root / '.claude' / 'scripts' / 'hooks' / 'console-cleaner'
     console_hooks_dst = target_scripts_hooks / 'console-cleaner'
 
     if console_hooks_src.exists():
-        if console_hooks_dst.exists():
-            shutil.rmtree(console_hooks_dst)
-        shutil.copytree(console_hooks_src, console_hooks_dst)
-        print(f"   ✓ console-cleaner hooks 已部署")
+        stats = deploy_dir(sources, console_hooks_src, console_hooks_dst, snapshot_name)
+        print(f"   ✓ console-cleaner hooks 已部署 ({stats})")
 
     # 4. 部署命令
     print("4. 部署命令...")
@@ -177,9 +257,7 @@ def deploy_to_target(target_dir, python_cmd=None):
     command_src = ccscaffold_root / '.claude' / 'commands' / 'loadLastSession.md'
     command_dst = target_commands / 'loadLastSession.md'
 
-    if command_dst.exists():
-        command_dst.unlink()
-    shutil.copy2(command_src, command_dst)
+    sources.file(command_src).sync_to(command_dst)
     print(f"   ✓ loadLastSession 命令已部署")
 
     # 部署 summary-skills 命令
@@ -187,9 +265,7 @@ def deploy_to_target(target_dir, python_cmd=None):
     summary_cmd_dst = target_commands / 'summary-skills.md'
 
     if summary_cmd_src.exists():
-        if summary_cmd_dst.exists():
-            summary_cmd_dst.unlink()
-        shutil.copy2(summary_cmd_src, summary_cmd_dst)
+        sources.file(summary_cmd_src).sync_to(summary_cmd_dst)
         print(f"   ✓ summary-skills 命令已部署")
 
     # 5. 部署 agent
@@ -197,107 +273,27 @@ def deploy_to_target(target_dir, python_cmd=None):
     agent_src = ccscaffold_root / '.claude' / 'agents' / 'speckitAgent.md'
     agent_dst = target_agents / 'speckitAgent.md'
 
-    if agent_dst.exists():
-        agent_dst.unlink()
-    shutil.copy2(agent_src, agent_dst)
+    sources.file(agent_src).sync_to(agent_dst)
     print(f"   ✓ speckitAgent 已部署")
 
     # 6. 更新或创建 settings.json
     print("6. 配置 settings.json...")
     settings_file = target_root / '.claude' / 'settings.json'
 
-    # 新的配置（使用用户选择的 Python 命令）
-    new_config = {
-        "hooks": {
-            "SessionStart": [
-                {
-                    "matcher": "*",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        }
-                    ],
-                    "description": "创建新对话记录文件"
-                }
-            ],
-            "UserPromptSubmit": [
-                {
-                    "matcher": "*",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        }
-                    ],
-                    "description": "记录用户输入"
-                }
-            ],
-            "PostToolUse": [
-                {
-                    "matcher": "*",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        }
-                    ],
-                    "description": "记录AI工具调用"
-                }
-            ],
-            "Stop": [
-                {
-                    "matcher": "*",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        },
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/scripts/hooks/chat-record/session_end_summary.py",
-                            "timeout": 10
-                        },
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/scripts/hooks/continuous-learning/session_end_continuous_learning.py",
-                            "timeout": 60
-                        },
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/scripts/hooks/console-cleaner/clean_console_log.py",
-                            "timeout": 30
-                        }
-                    ],
-                    "description": "会话结束处理：总结、持续学习、清理console.log"
-                }
-            ]
-        }
-    }
-
-    # 如果已有配置，需要合并
+    # 合并前备份，回滚时与组件目录一起恢复
+    backup_file = settings_file.with_name(f'settings.json.bak.{snapshot_name}')
     if settings_file.exists():
-        try:
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                existing_config = json.load(f)
-
-            # 合并 hooks
-            if 'hooks' in existing_config:
-                for event, hooks_list in new_config['hooks'].items():
-                    if event not in existing_config['hooks']:
-                        existing_config['hooks'][event] = []
-                    existing_config['hooks'][event] = hooks_list
-
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"   ! 合并配置失败，使用新配置: {e}")
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(new_config, f, indent=2, ensure_ascii=False)
-    else:
-        with open(settings_file, 'w', encoding='utf-8') as f:
-            json.dump(new_config, f, indent=2, ensure_ascii=False)
-
+        shutil.copy2(settings_file, backup_file)
+    try:
+        changed, _ = apply_settings(settings_file, build_settings_config(python_cmd))
+    except ValueError as e:
+        # 已有配置无法解析，已备份，使用新配置
+        print(f"   ! 合并配置失败，使用新配置: {e}")
+        changed, _ = apply_settings(settings_file, build_settings_config(python_cmd), base={})
+
+    # 配置没有变化时不保留备份
+    if not changed and backup_file.exists():
+        backup_file.unlink()
     print(f"   ✓ settings.json 已更新")
 
     print()
@@ -322,10 +318,109 @@ def deploy_to_target(target_dir, python_cmd=None):
     return True
 
 
+def preview_settings(target_dir, python_cmd=None):
+    """只显示部署后 settings.json 的变化，不修改任何文件"""
+    settings_file = Path(target_dir).resolve() / '.claude' / 'settings.json'
+    if python_cmd is None:
+        python_cmd = select_python_command()
+    try:
+        changed, diff = apply_settings(settings_file, build_settings_config(python_cmd), dry_run=True)
+    except ValueError as e:
+        print(f"错误: 无法解析 {settings_file}: {e}")
+        return False
+    print(diff if changed else f"{settings_file} 无需修改")
+    return True
+
+
+def rollback_target(target_dir):
+    """回滚目标项目最近一次部署: 恢复组件目录快照和 settings.json 备份"""
+    target_root = Path(target_dir).resolve()
+    deploy_dirs = [target_root.joinpath(*parts) for parts in DEPLOY_DIRS]
+    snapshot_name = latest_snapshot_name(deploy_dirs)
+    if snapshot_name is None:
+        print(f"没有可回滚的部署快照: {target_root}")
+        return False
+
+    print(f"回滚 {target_root} 到部署 {snapshot_name} 之前的版本...")
+    for deploy_dir_path in deploy_dirs:
+        if rollback(deploy_dir_path, snapshot_name):
+            print(f"   ✓ {deploy_dir_path.relative_to(target_root)}")
+
+    settings_file = target_root / '.claude' / 'settings.json'
+    backup_file = settings_file.with_name(f'settings.json.bak.{snapshot_name}')
+    if backup_file.exists():
+        os.replace(backup_file, settings_file)
+        print(f"   ✓ settings.json <- {backup_file.name}")
+    return True
+
+
+def deploy_fleet(patterns, python_cmd=None, workers=None):
+    """批量部署到多个目标项目
+
+    源文件只读取一次，Python 命令只选择一次，各目标并发部署，最后汇总耗时和结果。
+
+    Args:
+        patterns: 目标目录、通配符或 @列表文件
+        python_cmd: Python 命令，未指定时交互选择一次
+        workers: 并发部署的目标数
+    """
+    targets = expand_targets(patterns)
+    if not targets:
+        print("错误: 没有匹配的目标目录")
+        return False
+
+    print(f"批量部署到 {len(targets)} 个目标项目")
+    if python_cmd is None:
+        python_cmd = select_python_command()
+
+    sources = SourceCache()
+    results = run_fleet(
+        targets,
+        lambda target: deploy_to_target(target, python_cmd, sources=sources),
+        workers
+    )
+    print_fleet_report(results)
+    return all(result.ok for result in results)
+
+
+def fleet_main(argv):
+    """批量部署命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='deploy_functions.py --fleet',
+        description='批量部署 CC-Scaffold 功能到多个项目'
+    )
+    parser.add_argument('targets', nargs='+', help='目标目录、通配符（需加引号）或 @列表文件')
+    parser.add_argument('--python', dest='python_cmd', help='Python 命令，不指定则提示选择')
+    parser.add_argument('--workers', type=int, default=None, help='并发部署的目标数')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("CC-Scaffold 功能批量部署")
+    print("=" * 60)
+
+    success = deploy_fleet(args.targets, args.python_cmd, args.workers)
+    sys.exit(0 if success else 1)
+
+
 def main():
     """主函数"""
+    if len(sys.argv) > 1 and sys.argv[1] == '--fleet':
+        fleet_main(sys.argv[2:])
+
+    if len(sys.argv) > 2 and sys.argv[1] == '--rollback':
+        sys.exit(0 if rollback_target(sys.argv[2]) else 1)
+
+    if len(sys.argv) > 2 and sys.argv[1] == '--dry-run':
+        python_cmd = sys.argv[3] if len(sys.argv) > 3 else None
+        sys.exit(0 if preview_settings(sys.argv[2], python_cmd) else 1)
+
     if len(sys.argv) < 2:
         print("用法: python deploy_functions.py <目标目录> [Python命令]")
+        print("      python deploy_functions.py --rollback <目标目录>")
+        print("      python deploy_functions.py --dry-run <目标目录> [Python命令]")
+        print("      python deploy_functions.py --fleet <目标目录或通配符>... [--python 命令] [--workers N]")
         print()
         print("参数:")
         print("  目标目录   - 要部署到的项目目录")
@@ -336,6 +431,7 @@ def main():
         print("  python deploy_functions.py /path/to/target/project")
         print("  python deploy_functions.py /path/to/target/project python3.9")
         print("  python deploy_functions.py . python3")
+        print("  python deploy_functions.py --fleet '~/work/*' @targets.txt --python python3.9")
         sys.exit(1)
 
     target_dir = sys.argv[1]
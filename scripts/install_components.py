@@ -7,15 +7,18 @@ CC-Scaffold 组件安装脚本
 
 import os
 import sys
-import shutil
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from ccscaffold.utils import (
+    STOP_HOOK_TIMEOUT,
+    apply_settings,
     detect_available_python_commands,
-    interactive_python_command_selection
+    interactive_python_command_selection,
+    sync_file,
+    sync_tree
 )
 
 
@@ -43,17 +46,15 @@ def install_chat_record(target_project_root):
     # 复制 skill
     chat_recorder_src = ccscaffold_root / 'chat-record' / 'skills' / 'chat-record'
     chat_recorder_dst = target_skills / 'chat-record'
-    if chat_recorder_dst.exists():
-        shutil.rmtree(chat_recorder_dst)
-    shutil.copytree(chat_recorder_src, chat_recorder_dst)
-    print(f"  ✓ 已复制 chat-record skill")
+    stats = sync_tree(chat_recorder_src, chat_recorder_dst)
+    print(f"  ✓ 已复制 chat-record skill ({stats})")
 
     # 复制 hooks
     hooks = ['session_end_summary.py']
     for hook in hooks:
         src = ccscaffold_root / 'chat-record' / 'hooks' / hook
         dst = target_hooks / hook
-        shutil.copy2(src, dst)
+        sync_file(src, dst)
         print(f"  ✓ 已复制 {hook}")
 
     # 复制命令
@@ -61,7 +62,7 @@ def install_chat_record(target_project_root):
     for cmd in commands:
         src = ccscaffold_root / 'chat-record' / 'commands' / cmd
         dst = target_commands / cmd
-        shutil.copy2(src, dst)
+        sync_file(src, dst)
         print(f"  ✓ 已复制 {cmd}")
 
     print("会话记录功能安装完成！")
@@ -81,7 +82,7 @@ def install_speckit_agent(target_project_root):
     # 复制 agent
     src = ccscaffold_root / 'speckitAgent' / 'agents' / 'speckitAgent.md'
     dst = target_agents / 'speckitAgent.md'
-    shutil.copy2(src, dst)
+    sync_file(src, dst)
     print(f"  ✓ 已复制 speckitAgent")
 
     print("SpecKit Agent 安装完成！")
@@ -94,58 +95,29 @@ def update_settings_json(target_project_root, python_cmd):
 
     print("更新 settings.json...")
 
-    # 新的配置
+    # 每个事件只注册 hook_dispatcher，由它在同一进程内调用会话记录和会话总结
+    dispatcher = {
+        "type": "command",
+        "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py"
+    }
     new_config = {
         "hooks": {
             "UserPromptSubmit": [
-                {
-                    "matcher": "*",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        }
-                    ],
-                    "description": "记录用户输入"
-                }
+                {"matcher": "*", "hooks": [dispatcher], "description": "记录用户输入"}
             ],
             "PostToolUse": [
-                {
-                    "matcher": "*",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        }
-                    ],
-                    "description": "记录AI工具调用"
-                }
+                {"matcher": "*", "hooks": [dispatcher], "description": "记录AI工具调用"}
             ],
             "Stop": [
-                {
-                    "matcher": "*",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        },
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude-hooks/session_end_summary.py",
-                            "timeout": 10
-                        }
-                    ],
-                    "description": "生成会话总结"
-                }
+                {"matcher": "*", "hooks": [dict(dispatcher, timeout=STOP_HOOK_TIMEOUT)], "description": "生成会话总结"}
             ]
         }
     }
 
-    import json
-    with open(settings_file, 'w', encoding='utf-8') as f:
-        json.dump(new_config, f, indent=2, ensure_ascii=False)
+    # 与已有配置合并，重复的 hook 不会再次追加
+    changed, _ = apply_settings(settings_file, new_config)
 
-    print(f"  ✓ 已更新 {settings_file}")
+    print(f"  ✓ 已更新 {settings_file}" if changed else f"  ✓ {settings_file} 无需修改")
     print("settings.json 更新完成！")
 
 
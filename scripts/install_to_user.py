@@ -3,14 +3,40 @@
 """
 CC-Scaffold 用户级别安装脚本
 将组件安装到用户级别的 ~/.claude/ 目录
+
+用法:
+    python install_to_user.py             # 安装
+    python install_to_user.py --rollback  # 回滚到上一次安装前的版本
+    python install_to_user.py --dry-run   # 只显示 settings.json 将发生的变化
 """
 
 import os
 import sys
 import json
+import filecmp
 import shutil
 from pathlib import Path
-from datetime import datetime
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ccscaffold.utils import (
+    CCSCAFFOLD_HOOK_MARKERS,
+    STOP_HOOK_TIMEOUT,
+    apply_settings,
+    latest_snapshot_name,
+    new_snapshot_name,
+    rollback,
+    staged_install,
+    sync_file,
+    sync_tree,
+)
+
+# 本脚本管理的 hook: CC-Scaffold 脚本以及一同配置的修改日志、会话开始脚本
+USER_HOOK_MARKERS = CCSCAFFOLD_HOOK_MARKERS + ('post_tool_use_logger.py', 'session_start_reader.py')
+
+# 本次安装的快照名称，所有组件目录和 settings.json 备份使用同一名称，回滚时整体回退
+INSTALL_SNAPSHOT = new_snapshot_name()
 
 
 def get_user_claude_dir():
@@ -24,30 +50,58 @@ def get_source_root():
     return Path(__file__).resolve().parent.parent
 
 
+def get_install_dirs(user_claude_dir):
+    """安装脚本管理的组件目录，这些目录以暂存方式安装并保留快照"""
+    return [
+        user_claude_dir / 'skills' / 'chat-record',
+        user_claude_dir / 'skills' / 'continuous-learning',
+        user_claude_dir / 'scripts' / 'hooks' / 'chat-record',
+        user_claude_dir / 'scripts' / 'hooks' / 'continuous-learning',
+        user_claude_dir / 'scripts' / 'hooks' / 'console-cleaner',
+    ]
+
+
 def backup_settings(user_claude_dir):
     """备份现有的 settings.json"""
     settings_file = user_claude_dir / 'settings.json'
     if settings_file.exists():
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = user_claude_dir / f'settings.json.bak.{timestamp}'
+        backup_file = user_claude_dir / f'settings.json.bak.{INSTALL_SNAPSHOT}'
         shutil.copy2(settings_file, backup_file)
         print(f"  [OK] 已备份 settings.json -> {backup_file.name}")
         return True
     return False
 
 
-def copy_dir(src, dst, label=""):
-    """复制目录, 如果目标存在则先删除"""
-    if dst.exists():
-        shutil.rmtree(dst)
-    shutil.copytree(src, dst)
-    print(f"  [OK] {label}: {dst.relative_to(get_user_claude_dir())}")
+def discard_unchanged_backup(user_claude_dir):
+    """settings.json 没有变化时删除本次备份"""
+    settings_file = user_claude_dir / 'settings.json'
+    backup_file = user_claude_dir / f'settings.json.bak.{INSTALL_SNAPSHOT}'
+    if backup_file.exists() and filecmp.cmp(backup_file, settings_file, shallow=False):
+        backup_file.unlink()
+
+
+def copy_dir(src, dst, label="", ignore=None, finalize=None):
+    """同步目录, 只复制有变化的文件并删除目标中多余的文件
+
+    先同步到暂存目录再整体切换, 中断时不会留下安装了一半的目录;
+    被替换的版本保留为快照, 可通过 --rollback 恢复。
+
+    Args:
+        finalize: 可选, 同步完成后对暂存目录做后处理（如改写配置文件）
+    """
+    def populate(staging):
+        stats = sync_tree(src, staging, ignore=ignore)
+        if finalize is not None:
+            finalize(staging)
+        return stats
+
+    stats = staged_install(dst, populate, snapshot_name=INSTALL_SNAPSHOT)
+    print(f"  [OK] {label}: {dst.relative_to(get_user_claude_dir())} ({stats})")
 
 
 def copy_file(src, dst, label=""):
-    """复制文件"""
-    dst.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(src, dst)
+    """复制文件, 目标已相同时跳过"""
+    sync_file(src, dst)
     print(f"  [OK] {label}: {dst.relative_to(get_user_claude_dir())}")
 
 
@@ -80,14 +134,12 @@ def install_continuous_learning(source_root, user_claude_dir):
     # 1. 复制 skills/continuous-learning (包含 scripts 子目录)
     src = source_root / '.claude' / 'skills' / 'continuous-learning'
     dst = user_claude_dir / 'skills' / 'continuous-learning'
-    # 复制时排除 __pycache__ 和 state.json
-    if dst.exists():
-        shutil.rmtree(dst)
-    shutil.copytree(
-        src, dst,
-        ignore=shutil.ignore_patterns('__pycache__', '*.pyc', 'state.json')
+    # 复制时排除 __pycache__ 和 state.json（已有的 state.json 保留）
+    copy_dir(
+        src, dst, "skill",
+        ignore=shutil.ignore_patterns('__pycache__', '*.pyc', 'state.json'),
+        finalize=update_config_paths
     )
-    print(f"  [OK] skill: skills/continuous-learning")
 
     # 2. 复制 scripts/hooks/continuous-learning
     src = source_root / '.claude' / 'scripts' / 'hooks' / 'continuous-learning'
@@ -140,8 +192,18 @@ def create_directories(user_claude_dir):
         print(f"  [OK] {d.relative_to(user_claude_dir)}/")
 
 
-def merge_settings(user_claude_dir, python_cmd):
-    """合并 settings.json 配置"""
+def merge_settings(user_claude_dir, python_cmd, dry_run=False):
+    """合并 settings.json 配置
+
+    hook 条目按 (事件, matcher, command) 去重, 本脚本管理的旧条目先移除再写入,
+    重复安装不会追加重复的 hook。
+
+    Args:
+        dry_run: 只打印合并前后的差异, 不写入
+
+    Returns:
+        settings.json 是否有变化
+    """
     print("\n合并 settings.json...")
 
     settings_file = user_claude_dir / 'settings.json'
@@ -160,30 +222,26 @@ def merge_settings(user_claude_dir, python_cmd):
             if key != 'hooks':
                 existing.setdefault(key, current[key])
 
-    # 保留现有的关键配置
-    env = existing.get('env', {})
-    permissions = existing.get('permissions', {})
-    plugins = existing.get('enabledPlugins', {})
-    always_thinking = existing.get('alwaysThinkingEnabled', True)
-
     # 获取现有的 hooks
     existing_hooks = existing.get('hooks', {})
 
     # --- 构建新的 hooks 配置 ---
 
+    # CC-Scaffold 的会话记录、会话总结和持续学习由 hook_dispatcher 在同一进程内处理,
+    # 每个事件只注册一次
+    dispatcher = {
+        "type": "command",
+        "command": (
+            f"{python_cmd} "
+            '"%USERPROFILE%\\.claude\\skills\\chat-record\\hook_dispatcher.py"'
+        )
+    }
+
     # UserPromptSubmit: chat-record 记录用户输入
     user_prompt_hooks = [
         {
             "matcher": "*",
-            "hooks": [
-                {
-                    "type": "command",
-                    "command": (
-                        f"{python_cmd} "
-                        '"%USERPROFILE%\\.claude\\skills\\chat-record\\chat_recorder.py"'
-                    )
-                }
-            ],
+            "hooks": [dispatcher],
             "description": "chat-record: 记录用户输入"
         }
     ]
@@ -193,13 +251,7 @@ def merge_settings(user_claude_dir, python_cmd):
         {
             "matcher": "*",
             "hooks": [
-                {
-                    "type": "command",
-                    "command": (
-                        f"{python_cmd} "
-                        '"%USERPROFILE%\\.claude\\skills\\chat-record\\chat_recorder.py"'
-                    )
-                },
+                dispatcher,
                 {
                     "type": "command",
                     "command": (
@@ -212,34 +264,12 @@ def merge_settings(user_claude_dir, python_cmd):
         }
     ]
 
-    # Stop: chat-record + session_end_summary + continuous-learning + windows-notification(现有)
+    # Stop: chat-record + session_end_summary + continuous-learning(分发器) + windows-notification(现有)
     stop_hooks = [
         {
             "matcher": "*",
             "hooks": [
-                {
-                    "type": "command",
-                    "command": (
-                        f"{python_cmd} "
-                        '"%USERPROFILE%\\.claude\\skills\\chat-record\\chat_recorder.py"'
-                    )
-                },
-                {
-                    "type": "command",
-                    "command": (
-                        f"{python_cmd} "
-                        '"%USERPROFILE%\\.claude\\scripts\\hooks\\chat-record\\session_end_summary.py"'
-                    ),
-                    "timeout": 15
-                },
-                {
-                    "type": "command",
-                    "command": (
-                        f"{python_cmd} "
-                        '"%USERPROFILE%\\.claude\\scripts\\hooks\\continuous-learning\\session_end_continuous_learning.py"'
-                    ),
-                    "timeout": 60
-                },
+                dict(dispatcher, timeout=STOP_HOOK_TIMEOUT),
                 {
                     "type": "command",
                     "command": (
@@ -308,10 +338,10 @@ def merge_settings(user_claude_dir, python_cmd):
             }
         ]
 
-    # 组装完整配置
-    new_settings = {
-        "env": env,
-        "permissions": permissions,
+    # 组装需要合并的配置, 用户已有的其他配置项保持不变
+    updates = {
+        "env": {},
+        "permissions": {},
         "hooks": {
             "SessionStart": session_start_hooks,
             "UserPromptSubmit": user_prompt_hooks,
@@ -319,22 +349,27 @@ def merge_settings(user_claude_dir, python_cmd):
             "Stop": stop_hooks,
             "Notification": notification_hooks
         },
-        "enabledPlugins": plugins,
-        "alwaysThinkingEnabled": always_thinking
+        "enabledPlugins": {},
+        "alwaysThinkingEnabled": True
     }
 
-    # 写入
-    with open(settings_file, 'w', encoding='utf-8') as f:
-        json.dump(new_settings, f, indent=2, ensure_ascii=False)
+    changed, diff = apply_settings(
+        settings_file, updates, owned_markers=USER_HOOK_MARKERS, dry_run=dry_run, base=existing
+    )
+    if dry_run:
+        print(diff if changed else "  settings.json 无需修改")
+        return changed
 
-    print(f"  [OK] settings.json 已更新")
+    print(f"  [OK] settings.json 已更新" if changed else "  [OK] settings.json 无需修改")
+    return changed
 
 
-def update_config_paths(user_claude_dir):
-    """更新 continuous-learning 的 config.json 路径为用户级别"""
-    print("\n更新配置文件路径...")
+def update_config_paths(skill_dir):
+    """更新 continuous-learning 的 config.json 路径为用户级别
 
-    config_file = user_claude_dir / 'skills' / 'continuous-learning' / 'config.json'
+    在暂存目录中调用, 先写临时文件再替换, 不改动与已安装版本共享的硬链接文件。
+    """
+    config_file = skill_dir / 'config.json'
     if config_file.exists():
         with open(config_file, 'r', encoding='utf-8') as f:
             config = json.load(f)
@@ -345,10 +380,12 @@ def update_config_paths(user_claude_dir):
         config['skills_output_dir'] = '.claude/skills/learn'
         config['state_file'] = '.claude/skills/continuous-learning/state.json'
 
-        with open(config_file, 'w', encoding='utf-8') as f:
+        tmp_file = config_file.with_name(config_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, config_file)
 
-        print(f"  [OK] continuous-learning/config.json")
+        print(f"  [OK] continuous-learning/config.json 路径已更新")
 
 
 def print_summary(user_claude_dir):
@@ -378,12 +415,42 @@ def print_summary(user_claude_dir):
     print()
 
 
+def rollback_install(user_claude_dir):
+    """回滚最近一次安装: 恢复组件目录快照和 settings.json 备份"""
+    install_dirs = get_install_dirs(user_claude_dir)
+    snapshot_name = latest_snapshot_name(install_dirs)
+    if snapshot_name is None:
+        print("没有可回滚的安装快照")
+        return False
+
+    print(f"\n回滚到安装 {snapshot_name} 之前的版本...")
+    for install_dir in install_dirs:
+        if rollback(install_dir, snapshot_name):
+            print(f"  [OK] {install_dir.relative_to(user_claude_dir)}")
+
+    backup_file = user_claude_dir / f'settings.json.bak.{snapshot_name}'
+    if backup_file.exists():
+        os.replace(backup_file, user_claude_dir / 'settings.json')
+        print(f"  [OK] settings.json <- {backup_file.name}")
+
+    print("\n回滚完成, 请重启 Claude Code 以使更改生效。")
+    return True
+
+
 def main():
     """主函数"""
     print("=" * 60)
     print("CC-Scaffold 用户级别安装脚本")
     print("=" * 60)
 
+    if '--rollback' in sys.argv[1:]:
+        sys.exit(0 if rollback_install(get_user_claude_dir()) else 1)
+
+    if '--dry-run' in sys.argv[1:]:
+        # 只预览 settings.json 的变化
+        merge_settings(get_user_claude_dir(), 'python39', dry_run=True)
+        return
+
     source_root = get_source_root()
     user_claude_dir = get_user_claude_dir()
     python_cmd = 'python39'
@@ -406,11 +473,9 @@ def main():
 
     # 4. 合并 settings.json
     merge_settings(user_claude_dir, python_cmd)
+    discard_unchanged_backup(user_claude_dir)
 
-    # 5. 更新配置路径
-    update_config_paths(user_claude_dir)
-
-    # 6. 打印总结
+    # 5. 打印总结
     print_summary(user_claude_dir)
 
 
@@ -8,10 +8,29 @@ CC-Scaffold 功能部署脚本
 
 import os
 import sys
-import shutil
 import json
 from pathlib import Path
 
+# 添加 CC-Scaffold 根目录到路径，以便导入 ccscaffold.utils
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ccscaffold.utils import STOP_HOOK_TIMEOUT, SourceCache, expand_targets, print_fleet_report, run_fleet
+
+
+# chat-record skill 目录下需要部署的脚本
+CHAT_RECORD_SCRIPTS = [
+    'chat_recorder.py',
+    'chat_recorder_debug.py',
+    'claude_runner.py',
+    'cold_storage.py',
+    'conversation_tail.py',
+    'hook_dispatcher.py',
+    'hook_io.py',
+    'hook_metrics.py',
+    'hook_payload.py',
+    'prompt_budget.py',
+]
+
 
 def get_python_command():
     """检测系统的Python命令"""
@@ -32,7 +51,29 @@ def get_python_command():
         return 'python39'
 
 
-def deploy_chat_record(target_path, python_cmd='python3.9'):
+def copy_source_file(source_file, target_file, sources=None):
+    """复制单个文件，源文件通过 sources 缓存读取，目标已相同时跳过
+
+    Args:
+        source_file: 源文件
+        target_file: 目标文件
+        sources: 源文件缓存，批量部署时多个目标共享；为 None 时只用于本次复制
+    """
+    try:
+        if source_file.resolve() == target_file.resolve():
+            print(f"跳过（源文件和目标文件相同）: {target_file}")
+            return
+        if sources is None:
+            sources = SourceCache()
+        if sources.file(source_file).sync_to(target_file):
+            print(f"已复制: {target_file}")
+        else:
+            print(f"跳过（内容未变化）: {target_file}")
+    except Exception as e:
+        print(f"警告：复制文件时出错: {e}")
+
+
+def deploy_chat_record(target_path, python_cmd='python3.9', sources=None):
     """部署 chat-record 功能"""
     print(f"\n{'='*60}")
     print("部署 Chat Record 功能")
@@ -44,38 +85,15 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
     target_skills_dir = target_path / '.claude' / 'skills' / 'chat-record'
     target_skills_dir.mkdir(parents=True, exist_ok=True)
 
-    # 复制 chat_recorder.py
-    source_file = Path(__file__).parent.parent / '.claude' / 'skills' / 'chat-record' / 'chat_recorder.py'
-    target_file = target_skills_dir / 'chat_recorder.py'
-
-    if source_file.exists():
-        try:
-            source_resolved = source_file.resolve()
-            target_resolved = target_file.resolve()
-            if source_resolved != target_resolved:
-                shutil.copy2(source_file, target_file)
-                print(f"已复制: {target_file}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {target_file}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
-    else:
-        print(f"警告：找不到源文件: {source_file}")
-
-    # 复制 debug 脚本
-    debug_source = Path(__file__).parent.parent / '.claude' / 'skills' / 'chat-record' / 'chat_recorder_debug.py'
-    debug_target = target_skills_dir / 'chat_recorder_debug.py'
-    if debug_source.exists():
-        try:
-            debug_resolved = debug_source.resolve()
-            debug_target_resolved = debug_target.resolve()
-            if debug_resolved != debug_target_resolved:
-                shutil.copy2(debug_source, debug_target)
-                print(f"已复制: {debug_target}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {debug_target}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
+    # 复制 chat-record 脚本（chat_recorder.py、调试脚本及共享模块）
+    source_skill_dir = Path(__file__).parent.parent / '.claude' / 'skills' / 'chat-record'
+    for script_name in CHAT_RECORD_SCRIPTS:
+        source_file = source_skill_dir / script_name
+        target_file = target_skills_dir / script_name
+        if not source_file.exists():
+            print(f"警告：找不到源文件: {source_file}")
+            continue
+        copy_source_file(source_file, target_file, sources)
 
     # 复制 session_end_summary.py
     hooks_dir = target_path / '.claude' / 'scripts' / 'hooks' / 'chat-record'
@@ -84,16 +102,7 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
     summary_source = Path(__file__).parent.parent / '.claude' / 'scripts' / 'hooks' / 'chat-record' / 'session_end_summary.py'
     summary_target = hooks_dir / 'session_end_summary.py'
     if summary_source.exists():
-        try:
-            summary_resolved = summary_source.resolve()
-            summary_target_resolved = summary_target.resolve()
-            if summary_resolved != summary_target_resolved:
-                shutil.copy2(summary_source, summary_target)
-                print(f"已复制: {summary_target}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {summary_target}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
+        copy_source_file(summary_source, summary_target, sources)
 
     # 复制 console-cleaner 钩子
     console_cleaner_dir = target_path / '.claude' / 'scripts' / 'hooks' / 'console-cleaner'
@@ -103,31 +112,13 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
     cleaner_script_source = Path(__file__).parent.parent / '.claude' / 'scripts' / 'hooks' / 'console-cleaner' / 'clean_console_log.py'
     cleaner_script_target = console_cleaner_dir / 'clean_console_log.py'
     if cleaner_script_source.exists():
-        try:
-            cleaner_resolved = cleaner_script_source.resolve()
-            cleaner_target_resolved = cleaner_script_target.resolve()
-            if cleaner_resolved != cleaner_target_resolved:
-                shutil.copy2(cleaner_script_source, cleaner_script_target)
-                print(f"已复制: {cleaner_script_target}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {cleaner_script_target}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
+        copy_source_file(cleaner_script_source, cleaner_script_target, sources)
 
     # 复制 console cleaner 配置
     cleaner_config_source = Path(__file__).parent.parent / '.claude' / 'scripts' / 'hooks' / 'console-cleaner' / 'config.json'
     cleaner_config_target = console_cleaner_dir / 'config.json'
     if cleaner_config_source.exists():
-        try:
-            config_resolved = cleaner_config_source.resolve()
-            config_target_resolved = cleaner_config_target.resolve()
-            if config_resolved != config_target_resolved:
-                shutil.copy2(cleaner_config_source, cleaner_config_target)
-                print(f"已复制: {cleaner_config_target}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {cleaner_config_target}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
+        copy_source_file(cleaner_config_source, cleaner_config_target, sources)
 
     # 复制命令文件
     commands_dir = target_path / '.claude' / 'commands'
@@ -136,18 +127,9 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
     load_session_source = Path(__file__).parent.parent / '.claude' / 'commands' / 'loadLastSession.md'
     load_session_target = commands_dir / 'loadLastSession.md'
     if load_session_source.exists():
-        try:
-            load_resolved = load_session_source.resolve()
-            load_target_resolved = load_session_target.resolve()
-            if load_resolved != load_target_resolved:
-                shutil.copy2(load_session_source, load_session_target)
-                print(f"已复制: {load_session_target}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {load_session_target}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
+        copy_source_file(load_session_source, load_session_target, sources)
 
-    # 更新 settings.json
+    # 更新 settings.json，每个事件只注册 hook_dispatcher，由它在同一进程内调用各处理器
     settings_file = target_path / '.claude' / 'settings.json'
 
     hooks_config = {
@@ -158,7 +140,7 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
                     "hooks": [
                         {
                             "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
+                            "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py"
                         }
                     ],
                     "description": "记录用户输入"
@@ -170,7 +152,7 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
                     "hooks": [
                         {
                             "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
+                            "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py"
                         }
                     ],
                     "description": "记录AI工具调用（过滤读命令）"
@@ -182,17 +164,8 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
                     "hooks": [
                         {
                             "type": "command",
-                            "command": f"{python_cmd} .claude/skills/chat-record/chat_recorder.py"
-                        },
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/scripts/hooks/chat-record/session_end_summary.py",
-                            "timeout": 10
-                        },
-                        {
-                            "type": "command",
-                            "command": f"{python_cmd} .claude/scripts/hooks/console-cleaner/clean_console_log.py",
-                            "timeout": 30
+                            "command": f"{python_cmd} .claude/skills/chat-record/hook_dispatcher.py",
+                            "timeout": STOP_HOOK_TIMEOUT
                         }
                     ],
                     "description": "会话结束处理：记录、总结、清理console.log"
@@ -222,7 +195,7 @@ def deploy_chat_record(target_path, python_cmd='python3.9'):
     print(f"已创建/更新配置: {settings_file}")
 
 
-def deploy_continuous_learning(target_path, python_cmd='python3.9'):
+def deploy_continuous_learning(target_path, python_cmd='python3.9', sources=None):
     """部署 continuous-learning 功能"""
     print(f"\n{'='*60}")
     print("部署 Continuous Learning 功能")
@@ -241,31 +214,13 @@ def deploy_continuous_learning(target_path, python_cmd='python3.9'):
         for script_file in source_scripts_dir.glob('*.py'):
             target_file = target_skills_dir / 'scripts' / script_file.name
             target_skills_dir.joinpath('scripts').mkdir(exist_ok=True)
-            try:
-                source_resolved = script_file.resolve()
-                target_resolved = target_file.resolve()
-                if source_resolved != target_resolved:
-                    shutil.copy2(script_file, target_file)
-                    print(f"已复制: {target_file}")
-                else:
-                    print(f"跳过（源文件和目标文件相同）: {target_file}")
-            except Exception as e:
-                print(f"警告：复制文件时出错: {e}")
+            copy_source_file(script_file, target_file, sources)
 
     # 复制配置文件
     config_source = Path(__file__).parent.parent / '.claude' / 'skills' / 'continuous-learning' / 'config.json'
     config_target = target_skills_dir / 'config.json'
     if config_source.exists():
-        try:
-            config_resolved = config_source.resolve()
-            config_target_resolved = config_target.resolve()
-            if config_resolved != config_target_resolved:
-                shutil.copy2(config_source, config_target)
-                print(f"已复制: {config_target}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {config_target}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
+        copy_source_file(config_source, config_target, sources)
 
     # 复制命令文件
     commands_dir = target_path / '.claude' / 'commands'
@@ -274,16 +229,7 @@ def deploy_continuous_learning(target_path, python_cmd='python3.9'):
     summary_source = Path(__file__).parent.parent / '.claude' / 'commands' / 'summary-skills.md'
     summary_target = commands_dir / 'summary-skills.md'
     if summary_source.exists():
-        try:
-            summary_resolved = summary_source.resolve()
-            summary_target_resolved = summary_target.resolve()
-            if summary_resolved != summary_target_resolved:
-                shutil.copy2(summary_source, summary_target)
-                print(f"已复制: {summary_target}")
-            else:
-                print(f"跳过（源文件和目标文件相同）: {summary_target}")
-        except Exception as e:
-            print(f"警告：复制文件时出错: {e}")
+        copy_source_file(summary_source, summary_target, sources)
 
     # 创建输出目录
     output_dir = target_path / '.claude' / 'skills' / 'learn'
@@ -296,7 +242,7 @@ def deploy_continuous_learning(target_path, python_cmd='python3.9'):
     print(f"  /summary-skills 帮我总结最近关于分时图的修改经验")
 
 
-def deploy_all(target_project_path):
+def deploy_all(target_project_path, python_cmd=None, sources=None):
     """部署所有功能到目标项目"""
     target_path = Path(target_project_path).resolve()
 
@@ -304,7 +250,8 @@ def deploy_all(target_project_path):
         print(f"错误：目标路径不存在: {target_path}")
         return False
 
-    python_cmd = get_python_command()
+    if python_cmd is None:
+        python_cmd = get_python_command()
 
     print(f"{'='*60}")
     print(f"部署 CC-Scaffold 功能到: {target_path}")
@@ -312,10 +259,10 @@ def deploy_all(target_project_path):
     print(f"{'='*60}")
 
     # 部署 chat-record
-    deploy_chat_record(target_path, python_cmd)
+    deploy_chat_record(target_path, python_cmd, sources)
 
     # 部署 continuous-learning
-    deploy_continuous_learning(target_path, python_cmd)
+    deploy_continuous_learning(target_path, python_cmd, sources)
 
     print(f"\n{'='*60}")
     print(f"部署完成！")
@@ -332,23 +279,43 @@ def deploy_all(target_project_path):
     return True
 
 
+def deploy_fleet(patterns, workers=None):
+    """批量部署到多个目标项目
+
+    Python 命令只检测一次，源文件只读取一次，各目标并发部署，最后汇总耗时和结果。
+    """
+    targets = expand_targets(patterns)
+    if not targets:
+        print("错误：没有匹配的目标目录")
+        return False
+
+    python_cmd = get_python_command()
+    sources = SourceCache()
+    print(f"批量部署到 {len(targets)} 个目标项目，Python 命令: {python_cmd}")
+
+    results = run_fleet(targets, lambda target: deploy_all(target, python_cmd, sources), workers)
+    print_fleet_report(results)
+    return all(result.ok for result in results)
+
+
 def main():
     """主函数"""
     if len(sys.argv) < 2:
         print("CC-Scaffold 功能部署工具")
         print("\n用法:")
-        print("  python3.9 deploy_ccscaffold_features.py <目标项目路径>")
+        print("  python3.9 deploy_ccscaffold_features.py <目标项目路径> [更多目标...]")
+        print("\n目标可以是目录、通配符（需加引号）或 @列表文件（每行一个目录）")
         print("\n示例:")
         print("  python3.9 deploy_ccscaffold_features.py /Users/ming/Work/stock_analysis")
         print("  python3.9 deploy_ccscaffold_features.py .")
+        print("  python3.9 deploy_ccscaffold_features.py '/Users/ming/Work/*' @targets.txt")
         sys.exit(1)
 
-    target_path = sys.argv[1]
+    patterns = sys.argv[1:]
+    if len(patterns) == 1 and not patterns[0].startswith('@') and not any(c in patterns[0] for c in '*?['):
+        sys.exit(0 if deploy_all(patterns[0]) else 1)
 
-    if deploy_all(target_path):
-        sys.exit(0)
-    else:
-        sys.exit(1)
+    sys.exit(0 if deploy_fleet(patterns) else 1)
 
 
 if __name__ == '__main__':